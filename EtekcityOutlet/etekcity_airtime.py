@@ -0,0 +1,146 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Keep track of how much of the time the 433 MHz channel is in use.
+
+An AirtimeAccountant remembers the airtime of each burst over a sliding
+window.  Before a burst is sent it is checked against the allowed duty
+cycle (the fraction of the window which may be used for transmission).
+A burst which does not fit is either delayed until enough old bursts 
+have left the window ("throttle") or refused with an AirtimeExceededError
+("reject").
+
+One accountant can be shared by several Transmitter objects as they all
+use the same channel.
+"""
+
+import collections
+import threading
+import time
+
+# many regulators limit 433 MHz devices to a 10% duty cycle over an hour
+DEFAULT_WINDOW_IN_SECONDS = 3600.0
+DEFAULT_MAX_DUTY_CYCLE = 0.10
+
+THROTTLE = 'throttle'
+REJECT = 'reject'
+VALID_POLICIES = [THROTTLE, REJECT]
+
+
+class AirtimeExceededError(RuntimeError):
+    """
+    Raised when a burst would take the channel over its duty cycle.  
+    retry_after is the number of seconds until the burst would fit or None
+    if it can never fit.
+    """
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AirtimeAccountant:
+    """
+    Track the channel duty cycle over a sliding window and throttle or 
+    reject bursts which would go over max_duty_cycle.
+    """
+    def __init__(self, 
+                 window=DEFAULT_WINDOW_IN_SECONDS, 
+                 max_duty_cycle=DEFAULT_MAX_DUTY_CYCLE,
+                 policy=THROTTLE):
+        if window <= 0:
+            raise ValueError('window of {} is not > 0'.format(window))
+        if max_duty_cycle <= 0 or max_duty_cycle > 1:
+            raise ValueError('max_duty_cycle of {} is not > 0 and <= 1'.format(
+                max_duty_cycle))
+        if policy not in VALID_POLICIES:
+            raise ValueError('policy of "{}" is not in {}'.format(
+                policy, VALID_POLICIES))
+        self.__window = window
+        self.__limit = window * max_duty_cycle
+        self.__policy = policy
+        self.__lock = threading.Lock()
+        # (start time, airtime in seconds) of each burst in the window
+        self.__bursts = collections.deque()
+        self.__used = 0.0
+
+    def __expire(self, now):
+        while self.__bursts and self.__bursts[0][0] + self.__window <= now:
+            self.__used -= self.__bursts.popleft()[1]
+        if not self.__bursts:
+            self.__used = 0.0
+
+    def __wait_time(self, airtime, now):
+        """
+        return seconds until airtime fits in the window
+        """
+        excess = self.__used + airtime - self.__limit
+        for start, used in self.__bursts:
+            excess -= used
+            if excess <= 0:
+                return start + self.__window - now
+        return 0.0
+
+    def used(self):
+        """
+        return the airtime in seconds used in the current window
+        """
+        with self.__lock:
+            self.__expire(time.monotonic())
+            return self.__used
+
+    def duty_cycle(self):
+        """
+        return the fraction of the current window used for transmission
+        """
+        return self.used() / self.__window
+
+    def reserve(self, airtime):
+        """
+        Account for a burst of airtime seconds which is about to be sent.
+        
+        Depending on the policy this either waits until the burst fits or
+        raises AirtimeExceededError.  A burst larger than the whole
+        allowance always raises AirtimeExceededError.
+        """
+        if airtime > self.__limit:
+            raise AirtimeExceededError(
+                'burst of {:.3f} s is more than the {:.3f} s allowed in '
+                '{} s'.format(airtime, self.__limit, self.__window))
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__expire(now)
+                if self.__used + airtime <= self.__limit:
+                    self.__bursts.append((now, airtime))
+                    self.__used += airtime
+                    return
+                wait = self.__wait_time(airtime, now)
+            if REJECT == self.__policy:
+                raise AirtimeExceededError(
+                    'burst of {:.3f} s would exceed the duty cycle'.format(
+                        airtime),
+                    retry_after=wait)
+            time.sleep(wait)
@@ -28,16 +28,22 @@ Try to turn off all relays made by Etekcity using a 433 MHz transmitter
 connected to a Raspberry Pi pin.
 
 This assumes the 433 MHz transmitter is attached to the Raspberry Pi on pin 18.  
+
+If etekcity_rest_server.py is running with a command socket the command
+is sent through it, otherwise the pin is driven directly.
 """
 
 import sys
 
-from etekcity_controller import Transmitter
+import etekcity_client
 
 # change  if the transmitter connected to a different board pin
 TRANSMIT_PIN = 18
 # try increasing this if the relays never turn off
 RETRY_COUNT = 6
+# same as Transmitter.ALL_ADDRESS and Transmitter.ALL_UNIT
+ALL_ADDRESS = 85
+ALL_UNIT = 3
 
 if '__main__' == __name__:
     if len(sys.argv) > 1:
@@ -45,5 +51,20 @@ if '__main__' == __name__:
         print('    Try to turn off all devices', file=sys.stderr)
         exit(1)
     
+    try:
+        etekcity_client.send_command(TRANSMIT_PIN, 
+                                     ALL_ADDRESS, 
+                                     ALL_UNIT, 
+                                     'off', 
+                                     force=True)
+        exit(0)
+    except OSError:
+        # the server is not running
+        pass
+    except etekcity_client.CommandError as e:
+        print('server could not send command: {}'.format(e), file=sys.stderr)
+        exit(1)
+
+    from etekcity_controller import Transmitter
     ec = Transmitter(TRANSMIT_PIN, retries=RETRY_COUNT)
     ec.transmit_all_off()
@@ -0,0 +1,320 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Backends which let a Transmitter drive a pin.
+
+A backend provides:
+    setup_output(pin)    make the pin an output and set it LOW
+    output(pin, level)   set the pin HIGH (1) or LOW (0)
+    cleanup()            release all pins used by the backend
+and, for receiving, may provide:
+    setup_input(pin)     make the pin an input
+    add_edge_callback(pin, callback)
+                         call callback(time_ns, level) on every edge of
+                         the input pin, time_ns from time.perf_counter_ns()
+
+A backend with hardware_timed set instead provides:
+    play(pin, frames)    send the compiled frames and return the number of
+                         missed edges, setting the same results as 
+                         TimingEngine.play()
+and the Transmitter hands it whole bursts rather than single edges.
+
+RPiGpioBackend uses RPi.GPIO so it only works on a Raspberry Pi.  
+RecordingBackend keeps a time stamped list of edges in memory so the
+transmit path can be tested and benchmarked on any machine.
+SpiBackend shifts the frames out of an SPI MOSI pin so the timing comes
+from the SPI clock rather than from Python.
+"""
+
+import collections
+import time
+
+
+class GpioBackend:
+    """
+    Base class for pin backends.  Subclasses must provide all methods.
+    """
+    # True if the backend times the edges itself and provides play()
+    hardware_timed = False
+
+    def setup_output(self, pin):
+        raise NotImplementedError('setup_output() not implemented')
+
+    def output(self, pin, level):
+        raise NotImplementedError('output() not implemented')
+
+    def cleanup(self):
+        raise NotImplementedError('cleanup() not implemented')
+
+    def setup_input(self, pin):
+        raise NotImplementedError('setup_input() not implemented')
+
+    def add_edge_callback(self, pin, callback):
+        raise NotImplementedError('add_edge_callback() not implemented')
+
+
+class RPiGpioBackend(GpioBackend):
+    """
+    Drive pins with RPi.GPIO using board pin numbers.
+    
+    RPi.GPIO is imported when the backend is created so this module can
+    be imported on machines which are not a Raspberry Pi.
+    """
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.__gpio = GPIO
+        GPIO.setwarnings(False)
+        GPIO.setmode(GPIO.BOARD)
+        # the timing loop calls this directly so skip a layer of calls
+        self.output = GPIO.output
+
+    def setup_output(self, pin):
+        self.__gpio.setup(pin, self.__gpio.OUT)
+        self.__gpio.output(pin, self.__gpio.LOW)
+
+    def setup_input(self, pin):
+        self.__gpio.setup(pin, self.__gpio.IN)
+
+    def add_edge_callback(self, pin, callback):
+        """
+        RPi.GPIO calls back from its own thread with only the pin so the 
+        time is taken and the level read as soon as the call arrives.
+        """
+        now = time.perf_counter_ns
+        read = self.__gpio.input
+        def on_edge(channel):
+            callback(now(), read(channel))
+        self.__gpio.add_event_detect(pin, self.__gpio.BOTH, callback=on_edge)
+
+    def cleanup(self):
+        self.__gpio.cleanup()
+
+
+class RecordingBackend(GpioBackend):
+    """
+    Keep every edge in memory as a tuple of (time_ns, pin, level) where 
+    time_ns is from time.perf_counter_ns(), the clock used for timing.
+    
+    Nothing is connected to real hardware but edge callbacks added for a
+    pin are called for each output on that pin, so a receiver and a 
+    transmitter on the same pin are looped back.
+    """
+    def __init__(self):
+        self.edges = []
+        self.pins = set()
+        self.callbacks = {}
+
+    def setup_output(self, pin):
+        self.pins.add(pin)
+
+    def setup_input(self, pin):
+        self.pins.add(pin)
+
+    def add_edge_callback(self, pin, callback):
+        self.callbacks.setdefault(pin, []).append(callback)
+
+    def output(self, pin, level):
+        edge_time = time.perf_counter_ns()
+        self.edges.append((edge_time, pin, level))
+        if self.callbacks:
+            for callback in self.callbacks.get(pin, ()):
+                callback(edge_time, level)
+
+    def clear(self):
+        """
+        Forget all recorded edges.
+        """
+        self.edges = []
+
+    def cleanup(self):
+        self.pins = set()
+        self.callbacks = {}
+
+
+class SpiBackend(GpioBackend):
+    """
+    Send frames as a bit stream on the MOSI pin of an SPI bus.  Each SPI
+    bit lasts bit_ns so with the default of 20 us a 180 us pulse is 9
+    bits and a 720 us bit time is 36 bits.  The transmitter DATA pin is
+    connected to MOSI (board pin 19 for bus 0, 38 for bus 1) which stays 
+    LOW between transfers.
+    
+    Each frame is encoded once, padded to a whole byte in its idle time, 
+    and kept.  A burst is copied in to a preallocated buffer and sent 
+    with writebytes2() calls which return when the last bit is out, so 
+    the CPU is idle while the burst is sent and the edges are exact to 
+    the SPI clock.
+    
+    The spidev driver splits a write larger than its bufsiz in to 
+    several transfers with MOSI LOW between them, which would stretch
+    whatever pulse the split falls in.  So each write holds only whole 
+    frames and is at most bufsiz bytes, the pause between writes only 
+    lengthening the idle time after a frame.  bufsiz is read from the 
+    spidev module parameters unless it is given.  A frame which is 
+    larger than bufsiz can not be sent and play() raises ValueError.
+    
+    spidev is imported when the backend is created unless spi, an object
+    with the spidev.SpiDev methods, is given.
+    """
+    hardware_timed = True
+
+    DEFAULT_BIT_NS = 20 * 1000
+    # board pin of MOSI for each SPI bus
+    MOSI_PINS = {0: 19, 1: 38}
+    # encoded frames kept, enough for the frames of any burst
+    ENCODED_CACHE_SIZE = 64
+    # largest transfer of the spidev driver unless it was loaded with 
+    # another bufsiz
+    DEFAULT_BUFSIZ = 4096
+    BUFSIZ_PATH = '/sys/module/spidev/parameters/bufsiz'
+
+    def __init__(self, bus=0, device=0, bit_ns=DEFAULT_BIT_NS, spi=None,
+                 bufsiz=None):
+        if bus not in SpiBackend.MOSI_PINS:
+            raise ValueError('bus of {} is not in {}'.format(
+                bus, list(SpiBackend.MOSI_PINS.keys())))
+        if bit_ns <= 0:
+            raise ValueError('bit_ns of {} is not > 0'.format(bit_ns))
+        if bufsiz is None:
+            bufsiz = SpiBackend.read_bufsiz()
+        if bufsiz < 1:
+            raise ValueError('bufsiz of {} is not > 0'.format(bufsiz))
+        if spi is None:
+            import spidev
+            spi = spidev.SpiDev()
+            spi.open(bus, device)
+        spi.mode = 0
+        spi.max_speed_hz = int(round(1000000000 / bit_ns))
+        self.__spi = spi
+        self.__bit_ns = bit_ns
+        self.__bufsiz = bufsiz
+        self.__mosi_pin = SpiBackend.MOSI_PINS[bus]
+        # frame bytes -> (encoded bytes, ns from start to last edge)
+        self.__encoded = collections.OrderedDict()
+        self.__buffer = bytearray()
+        # results of the most recent play()
+        self.missed_edges = 0
+        self.max_lateness_ns = 0
+        self.frame_lateness_ns = []
+        self.frame_durations_ns = []
+
+    @staticmethod
+    def read_bufsiz():
+        """
+        return the largest transfer of the loaded spidev driver
+        """
+        try:
+            with open(SpiBackend.BUFSIZ_PATH, 'r') as bufsiz_file:
+                return int(bufsiz_file.read())
+        except (OSError, ValueError):
+            return SpiBackend.DEFAULT_BUFSIZ
+
+    def setup_output(self, pin):
+        if pin != self.__mosi_pin:
+            raise ValueError('pin of {} is not the MOSI pin {}'.format(
+                pin, self.__mosi_pin))
+
+    def output(self, pin, level):
+        raise NotImplementedError('SpiBackend only sends whole frames')
+
+    def encode(self, frame):
+        """
+        Return the frame, an array of durations in ns starting HIGH, as 
+        bytes to shift out MSB first and the ns from the start of the 
+        frame to its last edge.
+        """
+        key = frame.tobytes()
+        encoded = self.__encoded.get(key)
+        if encoded is not None:
+            self.__encoded.move_to_end(key)
+            return encoded
+        value = 0
+        bits = 0
+        level = 1
+        for duration in frame:
+            count = int(round(duration / self.__bit_ns))
+            value <<= count
+            if level:
+                value |= (1 << count) - 1
+            bits += count
+            level ^= 1
+        last_edge_ns = (bits - count) * self.__bit_ns
+        # frames end LOW so the padding only stretches the idle time
+        padding = (-bits) % 8
+        value <<= padding
+        bits += padding
+        encoded = (value.to_bytes(bits // 8, 'big'), last_edge_ns)
+        self.__encoded[key] = encoded
+        if len(self.__encoded) > SpiBackend.ENCODED_CACHE_SIZE:
+            self.__encoded.popitem(last=False)
+        return encoded
+
+    def encode_burst(self, frames):
+        """
+        Encode frames in to the preallocated buffer and return a list of
+        memoryviews of it, each holding whole frames and at most bufsiz 
+        bytes.  Raises ValueError if a frame is larger than bufsiz.
+        """
+        encoded = [self.encode(frame) for frame in frames]
+        size = sum(len(data) for data, last_edge_ns in encoded)
+        if len(self.__buffer) < size:
+            self.__buffer = bytearray(size)
+        view = memoryview(self.__buffer)
+        chunks = []
+        start = 0
+        offset = 0
+        for data, last_edge_ns in encoded:
+            if len(data) > self.__bufsiz:
+                raise ValueError(
+                    'frame of {} bytes is larger than the spidev bufsiz '
+                    'of {}'.format(len(data), self.__bufsiz))
+            if offset + len(data) - start > self.__bufsiz:
+                chunks.append(view[start:offset])
+                start = offset
+            view[offset:offset + len(data)] = data
+            offset += len(data)
+        if offset > start:
+            chunks.append(view[start:offset])
+        self.frame_durations_ns = [last_edge_ns 
+                                   for data, last_edge_ns in encoded]
+        return chunks
+
+    def play(self, pin, frames):
+        """
+        Send the frames and return when the last bit has been shifted out.
+        Edges are timed by the SPI clock so none are missed.  Raises 
+        ValueError, before anything is sent, if a frame is larger than 
+        bufsiz.
+        """
+        for chunk in self.encode_burst(frames):
+            self.__spi.writebytes2(chunk)
+        self.missed_edges = 0
+        self.max_lateness_ns = 0
+        self.frame_lateness_ns = [0] * len(frames)
+        return 0
+
+    def cleanup(self):
+        self.__spi.close()
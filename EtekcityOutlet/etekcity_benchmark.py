@@ -0,0 +1,204 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Benchmark the Etekcity transmit path without a Raspberry Pi.
+
+A Transmitter is driven through a RecordingBackend and the recorded edges
+are compared against the compiled frames which follow the 720 us bit time
+with 180 us / 540 us HIGH pulses.  Reported are:
+  frames per second 
+  CPU time per frame
+  a histogram of the error of each edge compared to its ideal time 
+    measured from the start of the burst
+  a histogram of the error of each HIGH pulse width
+
+With --max_error_us the program exits with a status of 1 if the 99th
+percentile edge error is larger than the given value so it can be used
+to catch timing regressions.
+"""
+
+import argparse
+import sys
+import time
+
+from etekcity_backends import RecordingBackend
+from etekcity_controller import FrameCompiler, Transmitter
+
+DEFAULT_BURSTS = 20
+DEFAULT_ADDRESS = 21
+DEFAULT_UNIT = 1
+DEFAULT_BUCKET_US = 5
+# any valid pin, nothing is connected
+BENCHMARK_PIN = 18
+# width of the bars in the histograms
+MAX_BAR_LENGTH = 50
+
+
+def percentile(sorted_values, fraction):
+    """
+    return the value at fraction (0.0 - 1.0) of the sorted_values
+    """
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def analyze_burst(edges, frame, copies):
+    """
+    Compare the edges of one burst with the ideal times for the frame.
+    
+    Returns two lists of errors in ns:  the error of each edge time 
+    measured from the first edge and the error of each HIGH pulse width.
+    """
+    expected_count = len(frame) * copies
+    if len(edges) != expected_count:
+        raise RuntimeError('expected {} edges but recorded {}'.format(
+            expected_count, len(edges)))
+
+    edge_errors = []
+    width_errors = []
+    start = edges[0][0]
+    ideal = 0
+    for i in range(expected_count):
+        edge_errors.append((edges[i][0] - start) - ideal)
+        duration = frame[i % len(frame)]
+        if 1 == edges[i][2] and i + 1 < expected_count:
+            width_errors.append(edges[i + 1][0] - edges[i][0] - duration)
+        ideal += duration
+    return edge_errors, width_errors
+
+
+def print_histogram(title, errors_ns, bucket_us, output=sys.stdout):
+    """
+    print summary values and a text histogram of errors_ns
+    """
+    errors_us = sorted(e / 1000.0 for e in errors_ns)
+    print('{} ({} samples)'.format(title, len(errors_us)), file=output)
+    if not errors_us:
+        return
+    print('  min {:.1f} us  p50 {:.1f} us  p99 {:.1f} us  max {:.1f} us'.format(
+        errors_us[0],
+        percentile(errors_us, 0.50),
+        percentile(errors_us, 0.99),
+        errors_us[-1]),
+          file=output)
+
+    buckets = {}
+    for e in errors_us:
+        b = int(e // bucket_us)
+        buckets[b] = buckets.get(b, 0) + 1
+    largest = max(buckets.values())
+    # empty buckets are skipped to keep a few outliers from filling pages
+    for b in sorted(buckets):
+        count = buckets[b]
+        bar = '#' * ((count * MAX_BAR_LENGTH + largest - 1) // largest)
+        print('  {:>8.0f} .. {:>8.0f} us {:>7} {}'.format(
+            b * bucket_us, 
+            (b + 1) * bucket_us, 
+            count, 
+            bar),
+              file=output)
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(
+        description='benchmark the Etekcity transmit timing')
+    parser.add_argument('--bursts',
+                        default=DEFAULT_BURSTS,
+                        help='number of commands to send',
+                        type=int
+                        )
+    parser.add_argument('--copies',
+                        default=Transmitter.DEFAULT_COPIES_TO_TRANSMIT,
+                        help='copies of the frame sent for each command',
+                        type=int
+                        )
+    parser.add_argument('--address',
+                        default=DEFAULT_ADDRESS,
+                        help='address to send',
+                        type=int
+                        )
+    parser.add_argument('--unit',
+                        default=DEFAULT_UNIT,
+                        help='unit to send',
+                        type=int
+                        )
+    parser.add_argument('--bucket_us',
+                        default=DEFAULT_BUCKET_US,
+                        help='width of histogram buckets in microseconds',
+                        type=float
+                        )
+    parser.add_argument('--max_error_us',
+                        default=None,
+                        help='exit with 1 if p99 edge error is above this',
+                        type=float
+                        )
+    args = parser.parse_args()
+
+    recorder = RecordingBackend()
+    transmitter = Transmitter(BENCHMARK_PIN, 
+                              retries=args.copies, 
+                              backend=recorder)
+    frame = FrameCompiler().compile(args.address, args.unit, True)
+
+    edge_errors = []
+    width_errors = []
+    missed = 0
+    wall_time = 0
+    cpu_time = 0
+    for i in range(args.bursts):
+        recorder.clear()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        missed += transmitter.transmit_on(args.address, args.unit)
+        cpu_time += time.process_time() - cpu_start
+        wall_time += time.perf_counter() - wall_start
+        burst_edge_errors, burst_width_errors = analyze_burst(recorder.edges,
+                                                              frame,
+                                                              args.copies)
+        edge_errors.extend(burst_edge_errors)
+        width_errors.extend(burst_width_errors)
+    transmitter.close()
+
+    frames = args.bursts * args.copies
+    ideal_frame_time = sum(frame) / 1000000000.0
+    print('frames sent:          {}'.format(frames))
+    print('frames per second:    {:.2f} (ideal {:.2f})'.format(
+        frames / wall_time, 1.0 / ideal_frame_time))
+    print('CPU time per frame:   {:.3f} ms'.format(1000.0 * cpu_time / frames))
+    print('CPU busy:             {:.1f} %'.format(100.0 * cpu_time / wall_time))
+    print('missed edges:         {}'.format(missed))
+    print_histogram('edge time error', edge_errors, args.bucket_us)
+    print_histogram('HIGH pulse width error', width_errors, args.bucket_us)
+
+    if args.max_error_us is not None:
+        p99 = percentile(sorted(edge_errors), 0.99) / 1000.0
+        if p99 > args.max_error_us:
+            print('p99 edge error of {:.1f} us is above {:.1f} us'.format(
+                p99, args.max_error_us), 
+                  file=sys.stderr)
+            exit(1)
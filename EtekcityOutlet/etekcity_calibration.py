@@ -0,0 +1,320 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Measure how long this machine takes to read the clock, drive a pin and
+wake up from a short sleep, and tune the TimingEngine to match.
+
+Every edge deadline of a TimingEngine is taken from one start time so a
+constant cost for each edge moves the whole burst but does not change 
+the pulse widths.  What stretches pulses is an edge which goes out late
+because the sleep before it overran:  the engine sleeps until spin_ns 
+before a deadline and then spins.  A fast Pi wakes within a few tens of
+microseconds while a Pi Zero can overrun by much more, so one fixed 
+spin_ns either wastes CPU on the fast Pi or misses edges on the slow 
+one.  The calibration sets spin_ns from the wake up time measured on 
+this machine, plus the cost of a clock read and a pin write, and starts
+the write for each edge lead_ns, a clock read and a pin write, before 
+its deadline so the pin changes on time.  The result for each pin is 
+kept in a JSON file so a pin is only measured again when the file does
+not have it or was made on another model of machine.
+
+The pin is only ever written LOW while calibrating so nothing is 
+transmitted.
+
+Run this file to measure and report the overhead and the timing error
+which can be reached:
+  etekcity_calibration.py [board_pin] [--calibration_file FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from etekcity_benchmark import percentile
+from etekcity_controller import FrameCompiler, TimingEngine, Transmitter
+from etekcity_json_file import save_json
+
+DEFAULT_SAMPLES = 2000
+DEFAULT_SLEEP_SAMPLES = 500
+DEFAULT_TEST_FRAMES = 24
+# same scale as the sleeps taken between edges
+SLEEP_TEST_NS = 200 * 1000
+# added to the measured wake up time
+SPIN_MARGIN_NS = 20 * 1000
+MIN_SPIN_NS = 20 * 1000
+# a machine which overruns by more than this can not time edges anyway
+MAX_SPIN_NS = 1000 * 1000
+DEFAULT_CALIBRATION_FILE = '/opt/Controllers/logs/etekcity_calibration.json'
+# where the Raspberry Pi kernel names the board
+MODEL_PATH = '/proc/device-tree/model'
+
+
+def host_model():
+    """
+    return the model of this machine, e.g. "Raspberry Pi 4 Model B Rev 1.4"
+    """
+    try:
+        with open(MODEL_PATH, 'r') as model_file:
+            return model_file.read().strip('\0\n')
+    except OSError:
+        return platform.machine()
+
+
+class Calibration:
+    """
+    The measured costs, in nanoseconds, on the machine named by model 
+    driving board pin:
+      clock_ns             read of time.perf_counter_ns()
+      output_ns            median pin write
+      output_jitter_ns     99th percentile less median pin write
+      wake_ns              99th percentile overrun of a short sleep
+      wake_max_ns          largest overrun of a short sleep
+    and spin_ns, how long before each edge a TimingEngine should stop
+    sleeping, and lead_ns, how long before its deadline the write for an
+    edge should start.
+    """
+    FIELDS = ['model', 'pin', 'clock_ns', 'output_ns', 'output_jitter_ns', 
+              'wake_ns', 'wake_max_ns', 'created']
+
+    def __init__(self, model, pin, clock_ns, output_ns, output_jitter_ns, 
+                 wake_ns, wake_max_ns, created=None):
+        self.model = model
+        self.pin = pin
+        self.clock_ns = clock_ns
+        self.output_ns = output_ns
+        self.output_jitter_ns = output_jitter_ns
+        self.wake_ns = wake_ns
+        self.wake_max_ns = wake_max_ns
+        self.created = time.time() if created is None else created
+
+    @property
+    def spin_ns(self):
+        spin_ns = (self.wake_ns + self.clock_ns + self.output_ns 
+                   + self.output_jitter_ns + SPIN_MARGIN_NS)
+        return max(MIN_SPIN_NS, min(MAX_SPIN_NS, spin_ns))
+
+    @property
+    def lead_ns(self):
+        return self.clock_ns + self.output_ns
+
+    def timing_engine(self):
+        """
+        return a TimingEngine tuned for this machine
+        """
+        return TimingEngine(spin_ns=self.spin_ns, lead_ns=self.lead_ns)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*[data[name] for name in cls.FIELDS])
+
+    #
+    # end of class Calibration
+    #
+
+
+def load_calibrations(path):
+    """
+    return the Calibrations kept in path, a JSON list of them, as a 
+    dictionary keyed by pin
+    """
+    with open(path, 'r') as calibration_file:
+        calibrations = [Calibration.from_dict(data) 
+                        for data in json.load(calibration_file)]
+    return {calibration.pin: calibration for calibration in calibrations}
+
+
+def save_calibration(path, calibration):
+    """
+    keep calibration in path in place of the one for the same pin.  
+    Calibrations made on another model of machine are dropped.
+    """
+    calibrations = {}
+    if os.path.exists(path):
+        try:
+            calibrations = load_calibrations(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    calibrations[calibration.pin] = calibration
+    save_json(path, [calibrations[pin].to_dict() 
+                     for pin in sorted(calibrations)
+                     if calibration.model == calibrations[pin].model])
+
+
+def measure(output, pin, samples=DEFAULT_SAMPLES, 
+            sleep_samples=DEFAULT_SLEEP_SAMPLES):
+    """
+    Measure the costs using output(pin, level) as a TimingEngine would
+    and return a Calibration.  pin must already be set up as an output.
+    """
+    now = time.perf_counter_ns
+    sleep = time.sleep
+
+    clock_costs = []
+    for i in range(samples):
+        t0 = now()
+        t1 = now()
+        clock_costs.append(t1 - t0)
+    clock_costs.sort()
+    clock_ns = percentile(clock_costs, 0.50)
+
+    output_costs = []
+    for i in range(samples):
+        t0 = now()
+        output(pin, 0)
+        t1 = now()
+        output_costs.append(max(0, t1 - t0 - clock_ns))
+    output_costs.sort()
+    output_ns = percentile(output_costs, 0.50)
+
+    overruns = []
+    for i in range(sleep_samples):
+        t0 = now()
+        sleep(SLEEP_TEST_NS / 1000000000.0)
+        overruns.append(max(0, now() - t0 - SLEEP_TEST_NS))
+    overruns.sort()
+
+    return Calibration(host_model(),
+                       pin,
+                       clock_ns,
+                       output_ns,
+                       percentile(output_costs, 0.99) - output_ns,
+                       percentile(overruns, 0.99),
+                       overruns[-1])
+
+
+def load_or_measure(path, output, pin):
+    """
+    return the Calibration of pin kept in path if it was made on this 
+    model of machine, otherwise measure one on pin and keep it in path
+    """
+    if os.path.exists(path):
+        try:
+            calibration = load_calibrations(path).get(pin)
+            if calibration is not None and host_model() == calibration.model:
+                return calibration
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print('ignoring calibration in "{}": {}'.format(path, e),
+                  file=sys.stderr)
+    calibration = measure(output, pin)
+    save_calibration(path, calibration)
+    return calibration
+
+
+def check_timing(engine, output, pin, frames):
+    """
+    Play frames with engine while holding pin LOW and return the sorted 
+    worst lateness in nanoseconds of each frame.
+    """
+    def quiet_output(pin, level):
+        output(pin, 0)
+    engine.play(quiet_output, pin, frames)
+    return sorted(engine.frame_lateness_ns)
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(
+        description='measure the pin and clock overhead of this machine')
+    parser.add_argument('board_pin',
+                        nargs='?',
+                        default=18,
+                        help='board pin of the transmitter',
+                        type=int
+                        )
+    parser.add_argument('--calibration_file',
+                        default=None,
+                        help='keep the result in this file'
+                        )
+    parser.add_argument('--samples',
+                        default=DEFAULT_SAMPLES,
+                        help='number of clock reads and pin writes timed',
+                        type=int
+                        )
+    parser.add_argument('--frames',
+                        default=DEFAULT_TEST_FRAMES,
+                        help='number of frames in the timing check',
+                        type=int
+                        )
+    parser.add_argument('--recording',
+                        action='store_true',
+                        help='use a recording backend instead of RPi.GPIO'
+                        )
+    args = parser.parse_args()
+
+    if args.board_pin not in Transmitter.VALID_PINS:
+        print('board_pin of {} is not in {}'.format(
+            args.board_pin, Transmitter.VALID_PINS), file=sys.stderr)
+        exit(1)
+
+    if args.recording:
+        from etekcity_backends import RecordingBackend
+        backend = RecordingBackend()
+    else:
+        from etekcity_backends import RPiGpioBackend
+        backend = RPiGpioBackend()
+    backend.setup_output(args.board_pin)
+
+    calibration = measure(backend.output, args.board_pin, args.samples)
+    print('model:                {}'.format(calibration.model))
+    print('clock read:           {:.2f} us'.format(
+        calibration.clock_ns / 1000.0))
+    print('pin write:            {:.2f} us (jitter {:.2f} us)'.format(
+        calibration.output_ns / 1000.0, 
+        calibration.output_jitter_ns / 1000.0))
+    print('sleep overrun:        p99 {:.1f} us  max {:.1f} us'.format(
+        calibration.wake_ns / 1000.0, calibration.wake_max_ns / 1000.0))
+    print('spin before deadline: {:.1f} us (default {:.1f} us)'.format(
+        calibration.spin_ns / 1000.0, TimingEngine.DEFAULT_SPIN_NS / 1000.0))
+    print('write before deadline: {:.2f} us'.format(
+        calibration.lead_ns / 1000.0))
+
+    frame = FrameCompiler().compile(Transmitter.FIRST_VALID_ADDRESS,
+                                    Transmitter.FIRST_VALID_UNIT, True)
+    frames = [frame] * args.frames
+    for title, engine in [('default', TimingEngine()),
+                          ('calibrated', calibration.timing_engine())]:
+        lateness = check_timing(engine, backend.output, args.board_pin, 
+                                frames)
+        print('{:<11} worst edge of a frame:  p50 {:.1f} us  p99 {:.1f} us  '
+              'max {:.1f} us  missed edges {}'.format(
+                  title,
+                  percentile(lateness, 0.50) / 1000.0,
+                  percentile(lateness, 0.99) / 1000.0,
+                  lateness[-1] / 1000.0,
+                  engine.missed_edges))
+    # the calibrated engine was checked last
+    print('achievable edge error: {:.1f} us'.format(
+        (percentile(lateness, 0.99) + calibration.output_jitter_ns) / 1000.0))
+    backend.cleanup()
+
+    if args.calibration_file is not None:
+        save_calibration(args.calibration_file, calibration)
+        print('saved in "{}"'.format(args.calibration_file))
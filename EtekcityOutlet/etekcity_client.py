@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Thin client for the command socket of etekcity_rest_server.py.
+
+The server owns the transmitter pins so commands sent through it never
+collide with each other and do not pay for starting up the GPIO.  This 
+module only imports what it needs to talk to the socket so a one-shot
+command costs little more than starting Python.
+
+The protocol is one line per command:
+  <pin> <address> <unit> on|off [force]
+and one line per reply:
+  <status> <message>
+where status is as for HTTP, 200 when the command was sent (message 
+"ok") or was skipped as the outlet was already set (message "skipped").
+Several commands may be sent on one connection.
+
+usage:  etekcity_client.py board_pin address unit on|off [force]
+"""
+
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET_PATH = '/run/etekcity_outlet.sock'
+# how long to wait for a reply, a command can wait behind others
+DEFAULT_TIMEOUT_IN_SECONDS = 30.0
+
+OK = 'ok'
+SKIPPED = 'skipped'
+FORCE = 'force'
+
+
+class CommandError(RuntimeError):
+    """
+    Raised when the server did not send a command.  status is the HTTP 
+    style status of the reply.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def format_command(pin, address, unit, action, force=False):
+    """
+    return the protocol line for a command, action is True | False | 
+    'on' | 'off'
+    """
+    if not isinstance(action, str):
+        action = 'on' if action else 'off'
+    line = '{} {} {} {}'.format(pin, address, unit, action.lower())
+    if force:
+        line += ' ' + FORCE
+    return line + '\n'
+
+
+def parse_reply(line):
+    """
+    return the message of a reply line or raise CommandError if the 
+    status is not 200
+    """
+    status, _, message = line.strip().partition(' ')
+    try:
+        status = int(status)
+    except ValueError:
+        raise CommandError(500, 'bad reply "{}"'.format(line.strip()))
+    if 200 != status:
+        raise CommandError(status, message)
+    return message
+
+
+class Client:
+    """
+    A connection to the command socket at path, or to (host, port) if
+    address is given.  Raises OSError if the server is not running.
+    """
+    def __init__(self, path=DEFAULT_SOCKET_PATH, address=None, 
+                 timeout=DEFAULT_TIMEOUT_IN_SECONDS):
+        if address is None:
+            self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            target = path
+        else:
+            self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            target = address
+        self.__socket.settimeout(timeout)
+        try:
+            self.__socket.connect(target)
+        except OSError:
+            self.__socket.close()
+            raise
+        self.__file = self.__socket.makefile('rw', encoding='utf8', 
+                                             newline='\n')
+
+    def send(self, pin, address, unit, action, force=False):
+        """
+        Send one command and wait for it to be transmitted.  Returns OK or
+        SKIPPED.  Raises CommandError if the server could not send it.
+        """
+        try:
+            self.__file.write(format_command(pin, address, unit, action, 
+                                             force))
+            self.__file.flush()
+            line = self.__file.readline()
+        except socket.timeout:
+            # the command may still be sent so do not look like the server 
+            # is not running
+            raise CommandError(504, 'no reply from server')
+        if not line:
+            raise CommandError(500, 'connection closed by server')
+        return parse_reply(line)
+
+    def close(self):
+        self.__file.close()
+        self.__socket.close()
+
+
+def socket_path():
+    """
+    return the socket path from the ETEKCITY_SOCKET environment variable 
+    or the default
+    """
+    return os.environ.get('ETEKCITY_SOCKET', DEFAULT_SOCKET_PATH)
+
+
+def send_command(pin, address, unit, action, force=False, path=None):
+    """
+    Send one command through the server at path (default socket_path()).
+    Raises OSError if the server is not running so the caller can fall 
+    back to driving the pin itself.
+    """
+    if path is None:
+        path = socket_path()
+    client = Client(path)
+    try:
+        return client.send(pin, address, unit, action, force)
+    finally:
+        client.close()
+
+
+if '__main__' == __name__:
+    if len(sys.argv) not in (5, 6) or (6 == len(sys.argv) 
+                                       and FORCE != sys.argv[5]):
+        print('usage: etekcity_client.py board_pin address unit on|off '
+              '[force]', file=sys.stderr)
+        exit(1)
+    path = socket_path()
+    try:
+        print(send_command(sys.argv[1], sys.argv[2], sys.argv[3], 
+                           sys.argv[4], 6 == len(sys.argv), path))
+    except CommandError as e:
+        print('error {}: {}'.format(e.status, e), file=sys.stderr)
+        exit(1)
+    except OSError as e:
+        print('can not reach server at {}: {}'.format(path, e), 
+              file=sys.stderr)
+        exit(2)
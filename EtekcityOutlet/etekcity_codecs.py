@@ -0,0 +1,299 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Codec tables for the families of 433 MHz outlets which can be driven by
+a Transmitter.
+
+A family is described by a table rather than by code:
+  base_ns          length of the shortest pulse
+  symbols          symbol -> pulse lengths in base_ns, alternating HIGH 
+                   and LOW and starting with HIGH
+  preamble         pulses sent before the symbols of a frame
+  postamble        pulses sent after the symbols of a frame
+  gap_ns           idle time after each frame, added to the last LOW
+  address_bits     number of address symbols, sent MSB first
+  address_symbols  bit value -> symbol for the address
+  fields           the parts of the frame in the order they are sent,
+                   each one of 'address', 'unit', 'action', 'command' or
+                   a tuple of fixed symbols
+  units            unit -> symbols, for a 'unit' field
+  actions          True (on) / False (off) -> symbols, for an 'action' 
+                   field
+  commands         (unit, action) -> symbols, for a 'command' field used
+                   by families which have a code for each button rather
+                   than separate unit and action codes
+A Codec turns a table in to the pulse lengths of each symbol once so a
+frame of any family is compiled by joining precomputed arrays.  The 
+compiled frames have the same form as the Etekcity frames so the 
+TimingEngine, workers and backends send every family the same way.
+
+Tables for other outlets can be added to CODECS.
+"""
+
+from array import array
+
+ETEKCITY = 'etekcity'
+PT2262 = 'pt2262'
+EV1527 = 'ev1527'
+
+DEFAULT_FAMILY = ETEKCITY
+
+# measured on Etekcity outlets, see etekcity_controller.Transmitter
+ETEKCITY_TABLE = {
+    'base_ns': 180 * 1000,
+    'symbols': {0: (1, 3), 
+                1: (3, 1)},
+    'preamble': (),
+    'postamble': (),
+    'gap_ns': 5000 * 1000,
+    'address_bits': 8,
+    'address_symbols': {0: 0, 1: 1},
+    'fields': ('address', 'unit', 'action', (0,)),
+    # these appear to be stable across units 
+    'units': {1: (0, 1, 0, 1, 0, 1, 0, 1, 0, 0, 1, 1),
+              2: (0, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0, 0),
+              3: (0, 1, 0, 1, 0, 1, 1, 1, 0, 0, 0, 0),
+              4: (0, 1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0),
+              5: (0, 1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 0),
+              },
+    'actions': {True: (0, 0, 1, 1),
+                False: (1, 1, 0, 0)},
+    }
+
+# PT2262 tri-state encoder as used by outlets with a 10 switch DIP block:
+# 5 switches for the address (house code) and 5 for the unit, a switch 
+# which is on is sent as '0' and one which is off as 'F'.  The frame ends
+# with a sync of 1 HIGH and 31 LOW.
+PT2262_TABLE = {
+    'base_ns': 350 * 1000,
+    'symbols': {'0': (1, 3, 1, 3),
+                '1': (3, 1, 3, 1),
+                'F': (1, 3, 3, 1)},
+    'preamble': (),
+    'postamble': (1, 31),
+    'gap_ns': 0,
+    'address_bits': 5,
+    'address_symbols': {0: 'F', 1: '0'},
+    'fields': ('address', 'unit', 'action'),
+    'units': {1: ('0', 'F', 'F', 'F', 'F'),
+              2: ('F', '0', 'F', 'F', 'F'),
+              3: ('F', 'F', '0', 'F', 'F'),
+              4: ('F', 'F', 'F', '0', 'F'),
+              5: ('F', 'F', 'F', 'F', '0'),
+              },
+    'actions': {True: ('0', 'F'),
+                False: ('F', '0')},
+    }
+
+# EV1527 learning code encoder:  a sync of 1 HIGH and 31 LOW, a 20 bit 
+# address burnt in to the remote then 4 data bits, one per button.  The
+# buttons are those of the common 2 channel on / off remotes.
+EV1527_TABLE = {
+    'base_ns': 350 * 1000,
+    'symbols': {0: (1, 3), 
+                1: (3, 1)},
+    'preamble': (1, 31),
+    'postamble': (),
+    'gap_ns': 0,
+    'address_bits': 20,
+    'address_symbols': {0: 0, 1: 1},
+    'fields': ('address', 'command'),
+    'commands': {(1, True): (0, 0, 0, 1),
+                 (1, False): (0, 0, 1, 0),
+                 (2, True): (0, 1, 0, 0),
+                 (2, False): (1, 0, 0, 0),
+                 },
+    }
+
+
+def parse_action(action):
+    """
+    Return True for an action of True or 'on' and False for an action 
+    of False or 'off' (in any case).  Raise ValueError otherwise.
+    """
+    if isinstance(action, bool):
+        return action
+    elif isinstance(action, str):
+        if action.upper() == 'ON':
+            return True
+        elif action.upper() == 'OFF':
+            return False
+        else:
+            raise ValueError('expect value of "ON" or "OFF"')
+    else:
+        raise ValueError('expect value of "ON", "OFF", True or False')
+
+
+class Codec:
+    """
+    Compile (address, unit, action) commands of one family, described by
+    a table as above, in to frames.
+    
+    A frame is an array('L') of durations in nanoseconds which alternate
+    HIGH, LOW, HIGH, LOW, ... starting with HIGH.  The last LOW includes
+    gap_ns so copies can be sent back-to-back.
+    
+    ValueError is raised if the table is not consistent.
+    """
+    def __init__(self, name, table):
+        self.name = name
+        base_ns = table['base_ns']
+        self.gap_ns = table.get('gap_ns', 0)
+        if base_ns <= 0 or self.gap_ns < 0:
+            raise ValueError('{}: base_ns must be > 0 and gap_ns >= 0'.format(
+                name))
+
+        def pulses(what, lengths):
+            if len(lengths) % 2:
+                raise ValueError('{}: {} must have HIGH and LOW pairs'.format(
+                    name, what))
+            return array('L', [base_ns * length for length in lengths])
+
+        self.__symbols = {symbol: pulses('symbol {!r}'.format(symbol), 
+                                         lengths)
+                          for symbol, lengths in table['symbols'].items()}
+        self.__preamble = pulses('preamble', table.get('preamble', ()))
+        self.__postamble = pulses('postamble', table.get('postamble', ()))
+        self.address_bits = table.get('address_bits', 0)
+        self.first_valid_address = 0
+        self.last_valid_address = (1 << self.address_bits) - 1
+        self.__address_symbols = table.get('address_symbols', {0: 0, 1: 1})
+        self.__fields = tuple(table['fields'])
+        self.__units = dict(table.get('units', {}))
+        self.__actions = dict(table.get('actions', {}))
+        self.__commands = dict(table.get('commands', {}))
+
+        if 'command' in self.__fields:
+            self.units = sorted({unit for unit, action in self.__commands})
+        else:
+            self.units = sorted(self.__units)
+        for field in self.__fields:
+            if field in ('address', 'unit', 'action', 'command'):
+                continue
+            self.__check_symbols(field)
+        for symbols in self.__address_symbols.values():
+            self.__check_symbols((symbols,))
+        for table_symbols in (self.__units, self.__actions, self.__commands):
+            for symbols in table_symbols.values():
+                self.__check_symbols(symbols)
+        if not (self.__preamble or self.__postamble or self.__fields):
+            raise ValueError('{}: a frame must have some pulses'.format(name))
+
+    def __check_symbols(self, symbols):
+        for symbol in symbols:
+            if symbol not in self.__symbols:
+                raise ValueError('{}: symbol {!r} is not in {}'.format(
+                    self.name, symbol, list(self.__symbols)))
+
+    def check_command(self, addr, unit, action):
+        """
+        Check addr, unit and action (True, False, 'on' or 'off') and return
+        them as a tuple of (addr, unit, True|False).  Raises ValueError if
+        any of them is not valid.
+        """
+        if (not isinstance(addr, int) or isinstance(addr, bool)
+                or addr < self.first_valid_address 
+                or addr > self.last_valid_address):
+            raise ValueError('address of {} is not between {} and {}'.format(
+                addr,
+                self.first_valid_address,
+                self.last_valid_address
+                )
+            )
+        if isinstance(unit, bool) or unit not in self.units:
+            raise ValueError('unit of {} is not in {}'.format(
+                unit,
+                self.units
+                )
+            )
+        action = parse_action(action)
+        if ('command' in self.__fields 
+                and (unit, action) not in self.__commands):
+            raise ValueError('unit {} has no {} code for {}'.format(
+                unit, 'on' if action else 'off', self.name))
+        return (addr, unit, action)
+
+    def symbols(self, addr, unit, action):
+        """
+        return the list of symbols sent for a checked command
+        """
+        result = []
+        for field in self.__fields:
+            if 'address' == field:
+                result.extend(self.__address_symbols[(addr >> i) & 1] 
+                              for i in range(self.address_bits - 1, -1, -1))
+            elif 'unit' == field:
+                result.extend(self.__units[unit])
+            elif 'action' == field:
+                result.extend(self.__actions[action])
+            elif 'command' == field:
+                result.extend(self.__commands[(unit, action)])
+            else:
+                result.extend(field)
+        return result
+
+    def compile(self, addr, unit, action, gap_ns=None):
+        """
+        Return the frame for addr, unit and action followed by gap_ns 
+        (default the gap_ns of the table).  Raises ValueError for an 
+        invalid command.
+        """
+        addr, unit, action = self.check_command(addr, unit, action)
+        if gap_ns is None:
+            gap_ns = self.gap_ns
+        elif gap_ns < 0:
+            raise ValueError('gap_ns of {} is < 0'.format(gap_ns))
+        frame = array('L', self.__preamble)
+        for symbol in self.symbols(addr, unit, action):
+            frame.extend(self.__symbols[symbol])
+        frame.extend(self.__postamble)
+        frame[-1] += gap_ns
+        return frame
+
+    #
+    # end of class Codec
+    #
+
+
+# family name -> Codec
+CODECS = {ETEKCITY: Codec(ETEKCITY, ETEKCITY_TABLE),
+          PT2262: Codec(PT2262, PT2262_TABLE),
+          EV1527: Codec(EV1527, EV1527_TABLE),
+          }
+
+# families in a fixed order, the index of a family is kept in journals
+FAMILIES = (ETEKCITY, PT2262, EV1527)
+
+
+def get_codec(family):
+    """
+    return the Codec of family, raise ValueError if it is not known
+    """
+    codec = CODECS.get(family) if isinstance(family, str) else None
+    if codec is None:
+        raise ValueError('family of "{}" is not in {}'.format(
+            family, sorted(CODECS)))
+    return codec
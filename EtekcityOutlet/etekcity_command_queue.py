@@ -0,0 +1,661 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Queue commands for an Etekcity Transmitter so only one thread ever
+drives the pin.
+
+A CommandQueue owns one Transmitter and a worker thread.  Commands are
+sent in the order they are submitted within each priority class and 
+every frame goes out whole.  A command waiting in a higher class 
+(INTERACTIVE before NORMAL before BULK) is sent at the next frame 
+boundary of a lower class command, which then carries on where it 
+stopped.
+Callers can wait for a command to finish or check on it later.  A 
+JobTable keeps commands by id so their progress can be looked up after 
+the caller has moved on.
+
+A queue can be given a maximum depth for each class, so a pin holds up
+to three times that many commands.  Commands submitted to a full class
+fail at once with a QueueFullError rather than waiting behind 
+everything else.
+"""
+
+import collections
+import datetime
+import sys
+import threading
+import time
+import uuid
+
+from etekcity_codecs import DEFAULT_FAMILY, ETEKCITY
+from etekcity_controller import Transmitter
+from etekcity_metrics import LATENCY_BUCKETS
+
+# states of a Command
+QUEUED = 'queued'
+TRANSMITTING = 'transmitting'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_MAX_JOBS = 1000
+
+# priority classes of a Command, most urgent first
+INTERACTIVE = 'interactive'
+NORMAL = 'normal'
+BULK = 'bulk'
+PRIORITIES = (INTERACTIVE, NORMAL, BULK)
+
+# weight of the newest command in the average time to send a command
+SEND_TIME_SMOOTHING = 0.2
+# seconds to send a command assumed for retry_after until one has been
+# timed, more than any burst takes
+DEFAULT_SEND_TIME_IN_SECONDS = 1.0
+# seconds after an outlet is sent in which the same action is not resent
+DEFAULT_DEDUP_WINDOW = 1.0
+
+# how an item is handed to a command which already has the outlet
+_CARRY = 'carry'
+_REPLACE = 'replace'
+_TAKE = 'take'
+
+
+def _timestamp(when):
+    if when is None:
+        return None
+    return datetime.datetime.fromtimestamp(when, 
+                                           datetime.timezone.utc).isoformat()
+
+
+class QueueFullError(RuntimeError):
+    """
+    Raised when a command is submitted to a full CommandQueue.  
+    retry_after is an estimate of the seconds until there is room.
+    """
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Command:
+    """
+    A list of (address, unit, action) items for outlets of family (see
+    etekcity_codecs) to send on one pin as a single burst.  The items are
+    checked when the command is created and ValueError is raised if any 
+    is not valid.  Actions are kept as True or False.
+    
+    Instead of items a TransmitPlan made by the pin's CommandQueue can be
+    given.  The plan is sent as it is without checking or encoding and 
+    the family is that of the plan.
+    
+    priority is one of PRIORITIES.
+    
+    id is a unique string for the command.  created, started and 
+    finished are time.time() values, None until the command reaches that
+    point.  When the command has failed error holds the exception which 
+    was raised.
+    
+    send_items are the items this command sends itself.  A CommandQueue
+    may hand some of them to other commands which carry the same outlets
+    (see CommandQueue) and then changes send_items.  The ids of those 
+    commands are in coalesced and the command is only finished when 
+    they are.  Items which were not sent at all because the outlet was 
+    already in that state are in skipped.
+    """
+    def __init__(self, pin, items=None, plan=None, priority=NORMAL,
+                 family=DEFAULT_FAMILY):
+        if priority not in PRIORITIES:
+            raise ValueError('priority of "{}" is not in {}'.format(
+                priority, PRIORITIES))
+        self.id = uuid.uuid4().hex
+        self.pin = pin
+        self.priority = priority
+        self.plan = plan
+        if plan is not None:
+            self.family = plan.family
+            self.items = plan.items
+        else:
+            self.family = family
+            self.items = [Transmitter.check_command(address, unit, action,
+                                                    family)
+                          for address, unit, action in items]
+        self.send_items = list(self.items)
+        self.coalesced = []
+        self.skipped = []
+        self.state = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.missed_edges = None
+        self.error = None
+        # plan being sent and the next frame of it, kept by CommandQueue
+        # while a command is stopped for a more urgent one
+        self._send_plan = plan
+        self._next_frame = 0
+        self.__lock = threading.Lock()
+        self.__done = threading.Event()
+        # parts still to finish:  this command and each carrier
+        self.__outstanding = 1
+        # commands waiting for this one to carry their items, None once
+        # this command has finished
+        self.__followers = []
+
+    def _start(self):
+        self.state = TRANSMITTING
+        self.started = time.time()
+
+    def _finish(self, missed_edges):
+        self.missed_edges = missed_edges
+        self.__part_done(None)
+
+    def _fail(self, error):
+        self.__part_done(error)
+
+    def __part_done(self, error):
+        with self.__lock:
+            if error is not None and self.error is None:
+                self.error = error
+            self.__outstanding -= 1
+            if self.__outstanding:
+                return
+            self.finished = time.time()
+            self.state = DONE if self.error is None else FAILED
+            followers = self.__followers
+            self.__followers = None
+        self.__done.set()
+        for follower in followers:
+            follower.__part_done(self.error)
+
+    def _carry(self, follower):
+        """
+        Make follower wait for this command, which carries some of its 
+        items.  Returns False if this command has already finished.
+        """
+        with follower.__lock:
+            follower.__outstanding += 1
+        with self.__lock:
+            if self.__followers is not None:
+                self.__followers.append(follower)
+                follower.coalesced.append(self.id)
+                return True
+        with follower.__lock:
+            follower.__outstanding -= 1
+        return False
+
+    def is_finished(self):
+        return self.__done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the command to finish.  Returns False on timeout.
+        """
+        return self.__done.wait(timeout)
+
+    def to_dict(self):
+        """
+        return the command and its progress as a dictionary suitable for
+        JSON with times in ISO 8601 format
+        """
+        result = {}
+        result['id'] = self.id
+        result['state'] = self.state
+        result['pin'] = self.pin
+        result['priority'] = self.priority
+        result['family'] = self.family
+        result['items'] = [{'address': address,
+                            'unit': unit,
+                            'action': 'on' if action else 'off'}
+                           for address, unit, action in self.items]
+        result['created'] = _timestamp(self.created)
+        result['started'] = _timestamp(self.started)
+        result['finished'] = _timestamp(self.finished)
+        result['missed_edges'] = self.missed_edges
+        if self.coalesced:
+            result['coalesced'] = list(self.coalesced)
+        if self.skipped:
+            result['skipped'] = [{'address': address,
+                                  'unit': unit,
+                                  'action': 'on' if action else 'off'}
+                                 for address, unit, action in self.skipped]
+        if self.error is not None:
+            result['error'] = str(self.error)
+        return result
+
+
+class JobTable:
+    """
+    Keep commands by id so they can be looked up later.
+    
+    At most max_jobs commands are kept.  When the table is full the 
+    oldest finished commands are dropped.  Commands which have not 
+    finished are never dropped.
+    """
+    def __init__(self, max_jobs=DEFAULT_MAX_JOBS):
+        if max_jobs < 1:
+            raise ValueError('max_jobs of {} is not > 0'.format(max_jobs))
+        self.__max_jobs = max_jobs
+        self.__lock = threading.Lock()
+        self.__jobs = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.__jobs)
+
+    def add(self, command):
+        """
+        Add command to the table and return it.
+        """
+        with self.__lock:
+            self.__jobs[command.id] = command
+            if len(self.__jobs) > self.__max_jobs:
+                excess = len(self.__jobs) - self.__max_jobs
+                finished = [job_id for job_id, job in self.__jobs.items() 
+                            if job.is_finished()]
+                for job_id in finished[:excess]:
+                    del self.__jobs[job_id]
+        return command
+
+    def get(self, job_id):
+        """
+        return the command with job_id or None if it is not known
+        """
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+
+class CommandQueue:
+    """
+    Send Commands on one Transmitter from a single worker thread.
+    
+    If metrics (an etekcity_metrics.MetricsRegistry) is given the number
+    of commands waiting or being sent and the time commands wait before
+    they start are kept there for each priority class.  If done_callback
+    is given it is called from the worker thread with each command which
+    was sent without error, just before anyone waiting on the command is
+    woken.
+    
+    If max_depth is given no more than that many commands of each class
+    may be waiting or being sent, so up to len(PRIORITIES) * max_depth 
+    in all.
+    
+    Commands are coalesced by (family, address, unit) when submitted:
+      - if a queued command, not yet started, of the same or a more 
+        urgent class has an item for the same outlet that item takes the
+        new action and the new command waits for the queued one instead 
+        of sending the item again
+      - if the queued command is of a less urgent class the item is 
+        taken from it and sent by the new command, which the queued one
+        then waits for
+      - if the same action for the outlet was sent within dedup_window
+        seconds, or is being sent by a command of the same or a more 
+        urgent class, the item is not sent again
+    A command with nothing left to send is not queued and finishes when 
+    the commands carrying its items do.  Commands made from a plan are 
+    sent as they are.
+    """
+    def __init__(self, transmitter, metrics=None, done_callback=None,
+                 max_depth=None, dedup_window=DEFAULT_DEDUP_WINDOW):
+        if max_depth is not None and max_depth < 1:
+            raise ValueError('max_depth of {} is not > 0'.format(max_depth))
+        if dedup_window < 0:
+            raise ValueError('dedup_window of {} is < 0'.format(
+                dedup_window))
+        self.__max_depth = max_depth
+        self.__dedup_window = dedup_window
+        # average seconds to send a command, used for retry_after
+        self.__send_time = None
+        self.__transmitter = transmitter
+        self.__done_callback = done_callback
+        self.__lock = threading.Condition()
+        # priority -> commands waiting, a command which was stopped for a 
+        # more urgent one is put back at the front
+        self.__pending = {priority: collections.deque() 
+                          for priority in PRIORITIES}
+        # (family, address, unit) -> queued command which sends that 
+        # outlet
+        self.__queued_outlets = {}
+        # (family, address, unit) -> (action, command, time.monotonic() when it
+        # was sent or None while it is being sent)
+        self.__recent_outlets = {}
+        self.__active = None
+        self.__closed = False
+        self.__depth_gauges = None
+        self.__wait_histograms = None
+        if metrics is not None:
+            self.__depth_gauges = {}
+            self.__wait_histograms = {}
+            for priority in PRIORITIES:
+                labels = {'pin': transmitter._board_pin, 
+                          'priority': priority}
+                self.__depth_gauges[priority] = metrics.gauge(
+                    'etekcity_queue_depth',
+                    'commands waiting for or using a transmitter',
+                    labels)
+                self.__wait_histograms[priority] = metrics.histogram(
+                    'etekcity_queue_wait_seconds',
+                    'time from submitting a command until it is started',
+                    LATENCY_BUCKETS,
+                    labels)
+        self.__thread = threading.Thread(target=self.__run, 
+                                         name='CommandQueue',
+                                         daemon=True)
+        self.__thread.start()
+
+    def __depth(self, priority):
+        active = self.__active
+        return len(self.__pending[priority]) + (
+            1 if active is not None and priority == active.priority else 0)
+
+    def __update_depth(self, priority):
+        if self.__depth_gauges is not None:
+            self.__depth_gauges[priority].set(self.__depth(priority))
+
+    def depth(self, priority=None):
+        """
+        return the number of commands of priority, or of all classes, 
+        waiting or being sent
+        """
+        with self.__lock:
+            if priority is not None:
+                return self.__depth(priority)
+            return sum(self.__depth(priority) for priority in PRIORITIES)
+
+    def compile_plan(self, items, family=DEFAULT_FAMILY):
+        """
+        return a TransmitPlan for the (address, unit, action) items of 
+        family which can be sent on this queue any number of times
+        """
+        return self.__transmitter.compile_plan(items, family)
+
+    def __carrier(self, family, address, unit, action, priority, now):
+        """
+        return (command, how) where command already sends or sent the
+        outlet, or (None, None).  how is _CARRY if command can carry the
+        item as it is, _REPLACE if it can once its action is changed and
+        _TAKE if command is less urgent than priority so the item must be
+        taken from it.  Call with the lock held.
+        """
+        rank = PRIORITIES.index(priority)
+        queued = self.__queued_outlets.get((family, address, unit))
+        if queued is not None:
+            if PRIORITIES.index(queued.priority) <= rank:
+                return queued, _REPLACE
+            return queued, _TAKE
+        recent = self.__recent_outlets.get((family, address, unit))
+        if recent is not None:
+            recent_action, command, sent = recent
+            if sent is None:
+                # waiting for a less urgent command could take longer 
+                # than sending the item again
+                usable = PRIORITIES.index(command.priority) <= rank
+            else:
+                usable = now - sent < self.__dedup_window
+            if recent_action == action and FAILED != command.state and usable:
+                return command, _CARRY
+        return None, None
+
+    def __take(self, command, carrier, item):
+        """
+        Move the outlet of item from the queued carrier to command, which
+        carrier then waits for.  A carrier left with nothing to send is 
+        taken off the queue.  Call with the lock held.
+        """
+        address, unit, action = item
+        count = len(carrier.send_items)
+        carrier.send_items = [queued_item 
+                              for queued_item in carrier.send_items
+                              if (address, unit) != queued_item[:2]]
+        if count == len(carrier.send_items):
+            return
+        command._carry(carrier)
+        if not carrier.send_items:
+            self.__pending[carrier.priority].remove(carrier)
+            self.__update_depth(carrier.priority)
+            carrier._finish(0)
+
+    def __coalesce(self, command, carriers):
+        """
+        Hand the items with carriers to them, or take them from less 
+        urgent carriers.  Call with the lock held.
+        """
+        kept = []
+        for item, (carrier, how) in zip(command.send_items, carriers):
+            if carrier is None:
+                kept.append(item)
+                continue
+            if _TAKE == how:
+                kept.append(item)
+                self.__take(command, carrier, item)
+                continue
+            if _REPLACE == how:
+                address, unit, action = item
+                for queued_items in (carrier.send_items, carrier.items):
+                    for index, queued_item in enumerate(queued_items):
+                        if (address, unit) == queued_item[:2]:
+                            queued_items[index] = item
+            if not carrier._carry(command):
+                # it has just finished, close enough to a duplicate
+                pass
+        command.send_items = kept
+
+    def __busy(self, family, address, unit):
+        """
+        return True if a command for the outlet, or for all Etekcity 
+        outlets, is queued or being sent.  Call with the lock held.
+        """
+        keys = [(family, address, unit)]
+        if ETEKCITY == family:
+            keys.append((family, Transmitter.ALL_ADDRESS, 
+                         Transmitter.ALL_UNIT))
+        for key in keys:
+            if key in self.__queued_outlets:
+                return True
+            recent = self.__recent_outlets.get(key)
+            if recent is not None and recent[2] is None:
+                return True
+        return False
+
+    def __skip(self, command, skip):
+        """
+        Move the items for which skip(pin, address, unit, action, family)
+        is True to command.skipped, unless a command for the outlet is 
+        still queued or being sent as the outlet may then end up in 
+        another state.  Call with the lock held.
+        """
+        kept = []
+        for address, unit, action in command.send_items:
+            if (not self.__busy(command.family, address, unit)
+                    and skip(command.pin, address, unit, action, 
+                             command.family)):
+                command.skipped.append((address, unit, action))
+            else:
+                kept.append((address, unit, action))
+        command.send_items = kept
+
+    def submit(self, command, coalesce=True, skip=None):
+        """
+        Add command to the end of the queue for its priority and return 
+        it.  With coalesce False the command is sent in full as it is.
+        
+        If skip is given, e.g. OutletStateTable.matches, items for which 
+        skip(pin, address, unit, action, family) is True are not sent 
+        (see Command.skipped) unless a command for the same outlet is 
+        queued or being sent.  Checking here, with the queue locked, 
+        means a newer action is never dropped in favour of an older one
+        which has not been sent yet.
+        
+        If the queue is full the command is marked failed and 
+        QueueFullError is raised.
+        """
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError('CommandQueue has been closed')
+            if skip is not None and command.plan is None:
+                self.__skip(command, skip)
+                if not command.send_items:
+                    command._finish(0)
+                    return command
+            carriers = [(None, None)] * len(command.send_items)
+            if coalesce and command.plan is None:
+                now = time.monotonic()
+                carriers = [self.__carrier(command.family, address, unit, 
+                                           action, command.priority, now)
+                            for address, unit, action in command.send_items]
+            needs_slot = any(carrier is None or _TAKE == how 
+                             for carrier, how in carriers)
+            depth = self.__depth(command.priority)
+            if (needs_slot and self.__max_depth is not None 
+                    and depth >= self.__max_depth):
+                send_time = self.__send_time
+                if send_time is None:
+                    send_time = DEFAULT_SEND_TIME_IN_SECONDS
+                # the more urgent commands go first
+                ahead = sum(self.__depth(priority) for priority 
+                            in PRIORITIES[:PRIORITIES.index(
+                                command.priority) + 1])
+                retry_after = send_time * (ahead - self.__max_depth + 1)
+                error = QueueFullError(
+                    'queue for pin {} is full with {} {} commands'.format(
+                        command.pin, depth, command.priority),
+                    retry_after=retry_after)
+                command._fail(error)
+                raise error
+            self.__coalesce(command, carriers)
+            if not command.send_items:
+                # everything is carried by other commands
+                command._finish(0)
+                return command
+            self.__pending[command.priority].append(command)
+            if command.plan is None:
+                for address, unit, action in command.send_items:
+                    self.__queued_outlets[(command.family, address, 
+                                           unit)] = command
+            self.__update_depth(command.priority)
+            self.__lock.notify()
+        return command
+
+    def close(self):
+        """
+        Send what is already queued, stop the worker thread and close the
+        Transmitter.
+        """
+        with self.__lock:
+            self.__closed = True
+            self.__lock.notify()
+        self.__thread.join()
+        self.__transmitter.close()
+
+    def __set_recent(self, command, sent):
+        for address, unit, action in command.send_items:
+            key = (command.family, address, unit)
+            if sent is None and command is self.__queued_outlets.get(key):
+                del self.__queued_outlets[key]
+            self.__recent_outlets[key] = (action, command, sent)
+        if sent is not None:
+            # forget outlets which have left the window
+            expired = [key for key, (action, recent, when) 
+                       in self.__recent_outlets.items()
+                       if when is not None 
+                       and sent - when >= self.__dedup_window]
+            for key in expired:
+                del self.__recent_outlets[key]
+
+    def __next_command(self):
+        """
+        return the first command of the most urgent class or None.  Call 
+        with the lock held.
+        """
+        for priority in PRIORITIES:
+            if self.__pending[priority]:
+                return self.__pending[priority].popleft()
+        return None
+
+    def __more_urgent(self, priority):
+        """
+        return a function which tells if a command more urgent than 
+        priority is waiting.  The deques are only read so no lock is 
+        taken between frames.
+        """
+        more_urgent = [self.__pending[other] 
+                       for other in PRIORITIES[:PRIORITIES.index(priority)]]
+        if not more_urgent:
+            return None
+        return lambda: any(more_urgent)
+
+    def __run(self):
+        while True:
+            with self.__lock:
+                while not any(self.__pending.values()) and not self.__closed:
+                    self.__lock.wait()
+                command = self.__next_command()
+                if command is None:
+                    return
+                self.__active = command
+                if command.started is None:
+                    self.__set_recent(command, None)
+                    command._start()
+                    if self.__wait_histograms is not None:
+                        self.__wait_histograms[command.priority].observe(
+                            command.started - command.created)
+                self.__update_depth(command.priority)
+            
+            finished = True
+            try:
+                if command._send_plan is None:
+                    command._send_plan = self.__transmitter.compile_plan(
+                        command.send_items, command.family)
+                missed, command._next_frame = (
+                    self.__transmitter.transmit_plan_part(
+                        command._send_plan, 
+                        command._next_frame,
+                        self.__more_urgent(command.priority)))
+                command.missed_edges = (command.missed_edges or 0) + missed
+                finished = (len(command._send_plan.frames) 
+                            <= command._next_frame)
+            except Exception as e:
+                command._fail(e)
+            else:
+                if finished:
+                    if self.__done_callback is not None:
+                        try:
+                            self.__done_callback(command)
+                        except Exception as e:
+                            print('done_callback caught "{}"'.format(e), 
+                                  file=sys.stderr)
+                    command._finish(command.missed_edges)
+
+            with self.__lock:
+                self.__active = None
+                if not finished:
+                    # carry on after the more urgent commands
+                    self.__pending[command.priority].appendleft(command)
+                    continue
+                self.__set_recent(command, time.monotonic())
+                send_time = time.time() - command.started
+                if self.__send_time is None:
+                    self.__send_time = send_time
+                else:
+                    self.__send_time += SEND_TIME_SMOOTHING * (
+                        send_time - self.__send_time)
+                self.__update_depth(command.priority)
@@ -0,0 +1,112 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Serve the line protocol of etekcity_client.py on a Unix domain socket 
+and, optionally, a TCP port.
+
+Each connection is handled by its own thread.  A line is parsed and 
+given to run_command(pin, address, unit, action, force) which sends it
+and returns (status, message) for the reply.  A line which can not be
+parsed is answered with a status of 400.
+"""
+
+import os
+import socketserver
+import sys
+import threading
+
+from etekcity_client import FORCE
+
+
+def parse_command(line):
+    """
+    return (pin, address, unit, action, force) from a protocol line.  The
+    action is returned as given.  Raises ValueError if the line is not 
+    valid.
+    """
+    fields = line.split()
+    if len(fields) not in (4, 5) or (5 == len(fields) 
+                                     and FORCE != fields[4].lower()):
+        raise ValueError('expect "pin address unit on|off [force]"')
+    try:
+        pin, address, unit = (int(field) for field in fields[:3])
+    except ValueError:
+        raise ValueError('pin, address and unit must be numbers')
+    return (pin, address, unit, fields[3], 5 == len(fields))
+
+
+class CommandSocketHandler(socketserver.StreamRequestHandler):
+    """
+    Answer each line of the connection.  The server has a run_command
+    attribute.
+    """
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.decode('utf8', 'replace').strip()
+            if not line:
+                continue
+            try:
+                command = parse_command(line)
+            except ValueError as e:
+                status, message = 400, str(e)
+            else:
+                status, message = self.server.run_command(*command)
+            reply = '{} {}\n'.format(status, message.replace('\n', ' '))
+            self.wfile.write(reply.encode('utf8'))
+            self.wfile.flush()
+
+
+class UnixCommandServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, run_command):
+        # a socket left by an earlier run would stop the bind
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, CommandSocketHandler)
+        # any local user may send commands, as with the REST server
+        os.chmod(path, 0o666)
+        self.run_command = run_command
+
+
+class TcpCommandServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, run_command):
+        super().__init__(address, CommandSocketHandler)
+        self.run_command = run_command
+
+
+def start_server(server):
+    """
+    Serve requests for server from a daemon thread and return the thread.
+    """
+    thread = threading.Thread(target=server.serve_forever, 
+                              name='etekcity-command-socket',
+                              daemon=True)
+    thread.start()
+    return thread
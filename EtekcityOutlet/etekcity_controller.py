@@ -26,11 +26,25 @@ SOFTWARE.
 
 Control a relay made by Etekcity using a 433 MHz transmitter connected to a 
 Raspberry Pi pin.  Specify the pin with the board numbers.
+
+Outlets of the other families in etekcity_codecs can be sent on the same
+transmitter by giving a family to compile_plan() or transmit_many().
+
+The pin is driven through a backend from etekcity_backends which defaults
+to RPi.GPIO.
 """
 
+import collections
 import sys
+import threading
 import time
-import RPi.GPIO as GPIO
+from array import array
+
+from etekcity_backends import RPiGpioBackend
+from etekcity_codecs import (DEFAULT_FAMILY, ETEKCITY_TABLE, get_codec, 
+                             parse_action)
+from etekcity_metrics import (COPIES_BUCKETS, FRAME_DURATION_BUCKETS,
+                              LATENESS_BUCKETS)
 
 DEBUG = False
 
@@ -76,29 +90,62 @@ class Transmitter:
     # internal details
     #
     
-    _TOTAL_BIT_TIME_IN_SECONDS = 720 / 1000000.0
-    _ZERO_BIT_TIME_HIGH_IN_SECONDS = 180 / 1000000.0
-    _ONE_BIT_TIME_HIGH_IN_SECONDS = (
-        _TOTAL_BIT_TIME_IN_SECONDS 
-        - _ZERO_BIT_TIME_HIGH_IN_SECONDS
+    # the encoding is the etekcity table of etekcity_codecs, these names
+    # are kept for the code which works with the Etekcity bits directly
+    _TOTAL_BIT_TIME_IN_NS = (ETEKCITY_TABLE['base_ns'] 
+                             * sum(ETEKCITY_TABLE['symbols'][0]))
+    _ZERO_BIT_TIME_HIGH_IN_NS = (ETEKCITY_TABLE['base_ns'] 
+                                 * ETEKCITY_TABLE['symbols'][0][0])
+    _ONE_BIT_TIME_HIGH_IN_NS = (
+        _TOTAL_BIT_TIME_IN_NS
+        - _ZERO_BIT_TIME_HIGH_IN_NS
         )
-    _DELAY_AFTER_TRANSMIT_IN_SECONDS = 5000 / 1000000.0
+    _DELAY_AFTER_TRANSMIT_IN_NS = ETEKCITY_TABLE['gap_ns']
     
-    # these appear to be stable across units 
-    _UNIT_BITS = {1:[0, 1, 0, 1, 0, 1, 0, 1, 0, 0, 1, 1],
-                  2:[0, 1, 0, 1, 0, 1, 0, 1, 1, 1, 0, 0],
-                  3:[0, 1, 0, 1, 0, 1, 1, 1, 0, 0, 0, 0],
-                  4:[0, 1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0],
-                  5:[0, 1, 1, 1, 0, 1, 0, 1, 0, 0, 0, 0],
-                  }
-    _ON_BITS = [0, 0, 1, 1]
-    _OFF_BITS = [1, 1, 0, 0]
-    _END_BITS = [0]
+    _UNIT_BITS = {unit: list(bits) 
+                  for unit, bits in ETEKCITY_TABLE['units'].items()}
+    _ON_BITS = list(ETEKCITY_TABLE['actions'][True])
+    _OFF_BITS = list(ETEKCITY_TABLE['actions'][False])
+    _END_BITS = list(ETEKCITY_TABLE['fields'][-1])
     
-    def __init__(self, board_pin, retries=DEFAULT_COPIES_TO_TRANSMIT):
+    def __init__(self, board_pin, retries=DEFAULT_COPIES_TO_TRANSMIT,
+                 frame_cache_size=None, precompile=False, backend=None,
+                 metrics=None, airtime=None, worker=None, journal=None,
+                 engine=None, profiles=None):
         """
         Create a transmitter give the board_pin to which the 433 MHz
         transmitter is connected.
+        
+        Compiled frames are cached, frame_cache_size bounds the number kept
+        (default FrameCompiler.DEFAULT_CACHE_SIZE).  With precompile set
+        every possible frame is compiled now so no encoding is done later.
+        
+        backend is the object used to drive the pin, by default a new
+        RPiGpioBackend.  A backend which is hardware_timed is given whole
+        bursts instead of being driven edge by edge.
+        
+        If metrics (an etekcity_metrics.MetricsRegistry) is given the edge
+        lateness, duration of each frame and copies sent are recorded 
+        there with a label of the pin number.
+        
+        If airtime (an etekcity_airtime.AirtimeAccountant) is given each 
+        burst is checked against the allowed duty cycle before it is sent.
+        
+        If worker (an etekcity_rt_worker.TransmitWorker for board_pin) is
+        given the frames are sent by that process instead of this one and
+        backend is not used.  The worker is closed with the Transmitter.
+        
+        If journal (an etekcity_journal.Journal) is given a record of each
+        command is added to it after every burst.
+        
+        engine is the TimingEngine which times the edges, by default one
+        with the default spin time.  etekcity_calibration makes one tuned
+        to the machine.
+        
+        If profiles (an etekcity_outlet_profiles.OutletProfiles) is given
+        the outlets which have a profile are sent with its number of 
+        copies and gap after each frame instead of retries copies and the
+        gap of their family.
         """
         if board_pin not in Transmitter.VALID_PINS:
             raise ValueError('board_pin of {} must be in {}'.format(
@@ -110,11 +157,55 @@ class Transmitter:
         if retries < 1:
             raise ValueError('retries value of {} is not > 0'.format(retries))
         self.__retries = retries
+        self.__profiles = profiles
+
+        if precompile:
+            self.__frames = FrameCompiler(FrameCompiler.ALL_FRAMES_COUNT)
+            self.__frames.precompile_all()
+        elif frame_cache_size is not None:
+            self.__frames = FrameCompiler(frame_cache_size)
+        else:
+            self.__frames = FrameCompiler()
+        if engine is None:
+            engine = TimingEngine()
+        self.__engine = engine
+        self.__airtime = airtime
+        self.__journal = journal
 
-        GPIO.setwarnings(False)
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setup(self._board_pin, GPIO.OUT)
-        GPIO.output(self._board_pin, GPIO.LOW)
+        self.__metrics = metrics
+        if metrics is not None:
+            labels = {'pin': board_pin}
+            self.__lateness_histogram = metrics.histogram(
+                'etekcity_frame_edge_lateness_seconds',
+                'latest edge in each frame compared to its deadline',
+                LATENESS_BUCKETS,
+                labels)
+            self.__duration_histogram = metrics.histogram(
+                'etekcity_frame_duration_seconds',
+                'time from the scheduled start to the last edge of a frame',
+                FRAME_DURATION_BUCKETS,
+                labels)
+            self.__copies_histogram = metrics.histogram(
+                'etekcity_command_copies',
+                'copies of the frame sent for each command',
+                COPIES_BUCKETS,
+                labels)
+            self.__missed_counter = metrics.counter(
+                'etekcity_missed_edges_total',
+                'edges sent later than the allowed lateness',
+                labels)
+
+        self.__worker = worker
+        if worker is not None:
+            if worker.board_pin != board_pin:
+                raise ValueError('worker is for pin {} not {}'.format(
+                    worker.board_pin, board_pin))
+            self.__backend = None
+        else:
+            if backend is None:
+                backend = RPiGpioBackend()
+            self.__backend = backend
+            self.__backend.setup_output(self._board_pin)
 
         self.__alive = True
 
@@ -124,58 +215,98 @@ class Transmitter:
         """
         self.__alive = False
         self._board_pin = None
-        GPIO.cleanup()
+        if self.__worker is not None:
+            self.__worker.close()
+        else:
+            self.__backend.cleanup()
             
-    def __transmit_bits(self, values):
+    def __transmit_plan(self, plan, start_frame=0, should_yield=None):
+        """
+        Send the frames of plan from start_frame as one burst, stopping
+        early if should_yield says so.  Return the number of edges which 
+        missed their deadline and the index of the first frame not sent.
+        
+        The airtime of the whole plan is reserved when it is started.
         """
-        transmit a sequence of bits.  Leaves signal in LOW state.
+        if self.__airtime is not None and 0 == start_frame:
+            self.__airtime.reserve(plan.airtime)
+        frames = plan.frames
+        if start_frame:
+            frames = frames[start_frame:]
+        if self.__worker is not None:
+            results = self.__worker
+            missed = self.__worker.play(frames)
+            played = len(frames)
+        elif self.__backend.hardware_timed:
+            results = self.__backend
+            missed = self.__backend.play(self._board_pin, frames)
+            played = len(frames)
+        else:
+            results = self.__engine
+            missed = self.__engine.play(self.__backend.output, 
+                                        self._board_pin,
+                                        frames,
+                                        should_yield)
+            played = self.__engine.frames_played
+        if self.__journal is not None:
+            self.__journal.record(self._board_pin, plan, 
+                                  results.frame_lateness_ns, start_frame)
+        next_frame = start_frame + played
+        if self.__metrics is not None:
+            self.__record_metrics(missed, plan, results, 
+                                  len(plan.frames) == next_frame)
+        return missed, next_frame
+
+    def __record_metrics(self, missed, plan, results, finished):
         """
-        for value in values:
-            if value:
-                high_time = self._ONE_BIT_TIME_HIGH_IN_SECONDS
-            else:
-                high_time = self._ZERO_BIT_TIME_HIGH_IN_SECONDS
-            
-            start_time = time.time()
-            GPIO.output(self._board_pin, GPIO.HIGH)
-            high_end_time = time.time() + high_time
-            total_end_time = time.time() + self._TOTAL_BIT_TIME_IN_SECONDS
-            while time.time() < high_end_time:
-                pass
-            GPIO.output(self._board_pin, GPIO.LOW) 
-            while time.time() < total_end_time:
-                pass
-            
-    def __addr_to_bits(self, addr):
-        if (addr < Transmitter.FIRST_VALID_ADDRESS 
-                or addr > Transmitter.LAST_VALID_ADDRESS):
-            raise ValueError('address of {} is not between {} and {}'.format(
-                addr,
-                Transmitter.FIRST_VALID_ADDRESS,
-                Transmitter.LAST_VALID_ADDRESS
-                )
-            )
-        result = []
-        for i in [7, 6, 5, 4, 3, 2, 1, 0]:
-            result.append((addr >> i) & 1 )
-        return result
-    
+        Add the results of the last burst to the metrics.  results is the
+        TimingEngine or TransmitWorker which sent the burst.  The copies
+        are counted once the plan is finished.
+        """
+        for lateness in results.frame_lateness_ns:
+            self.__lateness_histogram.observe(lateness / 1000000000.0)
+        for duration in results.frame_durations_ns:
+            self.__duration_histogram.observe(duration / 1000000000.0)
+        if finished:
+            for copies in plan.item_copies:
+                self.__copies_histogram.observe(copies)
+        if missed:
+            self.__missed_counter.inc(missed)
+
+    _parse_action = staticmethod(parse_action)
+
+    @classmethod
+    def check_command(cls, addr, unit, action, family=DEFAULT_FAMILY):
+        """
+        Check addr, unit and action (as for transmit_action()) and return
+        them as a tuple of (addr, unit, True|False).  Raises ValueError if
+        any of them, or family, is not valid.
+        """
+        return get_codec(family).check_command(addr, unit, action)
+
+    def __transmit_command(self, addr, unit, action):
+        """
+        Send the frame for addr, unit & action the configured number of 
+        times as one burst.  Return the number of edges which missed 
+        their deadline.
+        """
+        if not self.__alive:
+            raise RuntimeError('etekcity_controller has been closed')
+
+        missed, next_frame = self.__transmit_plan(
+            self.compile_plan([(addr, unit, action)]))
+        return missed
+
     def transmit_on(self, addr, unit):
         """
         Send a command to turn on the relay specified by addr & unit. 
         
         The command is normally sent multiple times for some degree of
         robustness.
-        """
-        if not self.__alive:
-            raise RuntimeError('etekcity_controller has been closed')
         
-        for i in range(self.__retries):
-            self.__transmit_bits(self.__addr_to_bits(addr))
-            self.__transmit_bits(self._UNIT_BITS[unit])
-            self.__transmit_bits(self._ON_BITS)
-            self.__transmit_bits(self._END_BITS)
-            time.sleep(self._DELAY_AFTER_TRANSMIT_IN_SECONDS)
+        Returns the number of edges which missed their deadline.
+        """
+        return self.__transmit_command(addr, unit, True)
         
     def transmit_off(self, addr, unit):
         """
@@ -183,16 +314,10 @@ class Transmitter:
         
         The command is normally sent multiple times for some degree of
         robustness.
-        """
-        if not self.__alive:
-            raise RuntimeError('etekcity_controller has been closed')
         
-        for i in range(self.__retries):
-            self.__transmit_bits(self.__addr_to_bits(addr))
-            self.__transmit_bits(self._UNIT_BITS[unit])
-            self.__transmit_bits(self._OFF_BITS)
-            self.__transmit_bits(self._END_BITS)
-            time.sleep(self._DELAY_AFTER_TRANSMIT_IN_SECONDS)
+        Returns the number of edges which missed their deadline.
+        """
+        return self.__transmit_command(addr, unit, False)
 
     def transmit_action(self, addr, unit, action):
         """
@@ -201,58 +326,384 @@ class Transmitter:
         
         The command is normally sent multiple times for some degree of
         robustness.
+        
+        Returns the number of edges which missed their deadline.
         """
         if not self.__alive:
             raise RuntimeError('etekcity_controller has been closed')
         
-        if isinstance(action, bool):
-            if action:
-                self.transmit_on(addr, unit)
-            else:
-                self.transmit_off(addr, unit)
-        elif isinstance(action, str):
-            if action.upper() == 'ON':
-                self.transmit_on(addr, unit)
-            elif action.upper() == 'OFF':
-                self.transmit_off(addr, unit)
-            else:
-                raise ValueError('expect value of "ON" or "OFF"')
+        if self._parse_action(action):
+            return self.transmit_on(addr, unit)
         else:
-            raise ValueError('expect value of "ON", "OFF", True or False')
+            return self.transmit_off(addr, unit)
 
-    def transmit_all_on(self):
+    def transmit_many(self, commands, family=DEFAULT_FAMILY, copies=None):
         """
-        Turn on all the relays. 
+        Send several commands given as a list of (addr, unit, action) 
+        tuples where action is as for transmit_action() to outlets of 
+        family.  copies, if given, is the number of copies of each 
+        command sent instead of the Transmitter's or the outlet's own.
         
-        The command is normally sent multiple times for some degree of
-        robustness.
+        The copies are interleaved round-robin:  the first copy of every
+        command is sent, then the second copy of every command, and so on.
+        The total airtime is the same as sending the commands one after
+        the other but every relay gets its first frame within one pass.
         
-        I found sequence this while coding test cases.  (pgc)
+        All commands are checked before anything is sent and ValueError
+        is raised if any of them is not valid.
+        
+        Returns the number of edges which missed their deadline.
+        """
+        return self.transmit_plan(self.compile_plan(commands, family, copies))
+
+    def compile_plan(self, commands, family=DEFAULT_FAMILY, copies=None):
+        """
+        Check and compile a list of (addr, unit, action) tuples for outlets
+        of family in to a TransmitPlan which sends them the way 
+        transmit_many() does.  The plan can be sent any number of times 
+        with transmit_plan() without checking or encoding the commands 
+        again.  copies is as for transmit_many().
+        
+        Raises ValueError if any of the commands is not valid.
+        """
+        if copies is not None and copies < 1:
+            raise ValueError('copies of {} is not > 0'.format(copies))
+        items = [self.check_command(addr, unit, action, family) 
+                 for addr, unit, action in commands]
+        if self.__profiles is None:
+            if copies is None:
+                copies = self.__retries
+            frames = [self.__frames.compile(addr, unit, action, family)
+                      for addr, unit, action in items]
+            return TransmitPlan(items, frames * copies, copies, family)
+
+        gap_ns = get_codec(family).gap_ns
+        forced_copies = copies
+        copies = []
+        gaps = []
+        for addr, unit, action in items:
+            profile = self.__profiles.get(addr, unit, family)
+            if profile is None:
+                profile = (self.__retries, gap_ns)
+            copies.append(profile[0] if forced_copies is None 
+                          else forced_copies)
+            gaps.append(profile[1])
+        frames = [self.__frames.compile(addr, unit, action, family, gap)
+                  for (addr, unit, action), gap in zip(items, gaps)]
+        # the same passes as transmit_many() with each item left out once
+        # it has been sent enough times
+        plan_frames = []
+        frame_items = []
+        for copy in range(max(copies, default=0)):
+            for i, frame in enumerate(frames):
+                if copy < copies[i]:
+                    plan_frames.append(frame)
+                    frame_items.append(i)
+        return TransmitPlan(items, plan_frames, copies, family, 
+                            frame_items, gaps)
+
+    def transmit_plan(self, plan):
+        """
+        Send a TransmitPlan made by compile_plan().
+        
+        Returns the number of edges which missed their deadline.
+        """
+        if not self.__alive:
+            raise RuntimeError('etekcity_controller has been closed')
+
+        if not plan.frames:
+            return 0
+        missed, next_frame = self.__transmit_plan(plan)
+        return missed
+
+    def transmit_plan_part(self, plan, start_frame=0, should_yield=None):
+        """
+        Send a TransmitPlan from frame start_frame.  should_yield, if 
+        given, is called before each frame after the first and when it 
+        returns True the burst stops there so a more urgent burst can go
+        out.  Frames are never cut short.  The rest of the plan can be 
+        sent later by calling again with the returned frame index.
+        
+        Only the TimingEngine can stop early, a worker process or a 
+        hardware timed backend always sends the rest of the plan.
+        
+        Returns the number of edges which missed their deadline and the 
+        index of the first frame not sent, len(plan.frames) when the plan
+        is done.
         """
         if not self.__alive:
             raise RuntimeError('etekcity_controller has been closed')
+
+        if start_frame >= len(plan.frames):
+            return 0, len(plan.frames)
+        return self.__transmit_plan(plan, start_frame, should_yield)
+
+    def transmit_all_on(self):
+        """
+        Turn on all the relays. 
+        
+        The command is sent the same number of times as any other command.
         
-        for i in range(self.__retries):
-            self.transmit_on(Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT)
+        I found sequence this while coding test cases.  (pgc)
+        """
+        return self.transmit_on(Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT)
             
     def transmit_all_off(self):
         """
         Turn off all the relays. 
         
-        The command is normally sent multiple times for some degree of
-        robustness.
+        The command is sent the same number of times as any other command.
 
         I found sequence this while coding test cases.  (pgc)
         """
-        if not self.__alive:
-            raise RuntimeError('etekcity_controller has been closed')
-        
-        for i in range(self.__retries):
-            self.transmit_off(Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT)
+        return self.transmit_off(Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT)
     #
     # end of class Transmitter        
     #
+
+
+class TransmitPlan:
+    """
+    A burst which is ready to send:  the checked (address, unit, action)
+    items it carries, the compiled frames in the order they are sent, the
+    family of the outlets and the seconds of airtime the burst uses.
+    
+    copies is the number of copies of every item or a list of the copies
+    of each item.  frame_items is the index of the item of each frame, 
+    by default the frames take the items in turn.  gaps_ns is the idle
+    time after the frames of each item, by default the gap of the 
+    family.  item_copies holds the copies of each item and copies the 
+    most copies of any item.
+    
+    Plans are made by Transmitter.compile_plan().
+    """
+    def __init__(self, items, frames, copies, family=DEFAULT_FAMILY,
+                 frame_items=None, gaps_ns=None):
+        self.items = tuple(items)
+        self.frames = tuple(frames)
+        self.family = family
+        if isinstance(copies, int):
+            self.item_copies = (copies,) * len(self.items)
+        else:
+            self.item_copies = tuple(copies)
+        self.copies = max(self.item_copies, default=0)
+        if frame_items is None:
+            frame_items = [i % len(self.items) 
+                           for i in range(len(self.frames))]
+        self.frame_items = tuple(frame_items)
+        if gaps_ns is None:
+            gaps_ns = [get_codec(family).gap_ns] * len(self.items)
+        total = 0
+        for frame, item in zip(self.frames, self.frame_items):
+            total += sum(frame) - gaps_ns[item]
+        # seconds on the air, not counting the idle time after each frame
+        self.airtime = total / 1000000000.0
+
+    #
+    # end of class TransmitPlan
+    #
+
+
+class FrameCompiler:
+    """
+    Turn an (address, unit, action) of a family in to the pulses sent for
+    one copy of the command.
+    
+    A compiled frame is a flat array of durations in nanoseconds which 
+    alternate HIGH, LOW, HIGH, LOW, ... starting with HIGH.  The last LOW
+    includes the idle time after the frame so copies can be sent 
+    back-to-back.  The timing loop only walks the array; all table 
+    lookups and symbol decisions are done once, by the Codec of the 
+    family.
+    
+    Frames are kept in a bounded cache keyed on (family, address, unit, 
+    action, gap), with a gap equal to that of the family kept as None.  
+    When the cache is full the least recently used frame is dropped.  The
+    cache can be used from several threads.
+    """
+    # enough for the handful of outlets most people have
+    DEFAULT_CACHE_SIZE = 64
+    # number of distinct Etekcity frames (addresses * units * actions)
+    ALL_FRAMES_COUNT = ((Transmitter.LAST_VALID_ADDRESS 
+                         - Transmitter.FIRST_VALID_ADDRESS + 1)
+                        * len(Transmitter._UNIT_BITS) 
+                        * 2)
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        if cache_size < 1:
+            raise ValueError('cache_size of {} is not > 0'.format(cache_size))
+        self.__cache_size = cache_size
+        self.__cache = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__cache)
+
+    def compile(self, addr, unit, action, family=DEFAULT_FAMILY, 
+                gap_ns=None):
+        """
+        Return the compiled frame for addr, unit and action (True for on,
+        False for off) of family followed by gap_ns (default the gap of
+        the family).  Raises ValueError for an invalid addr, unit, family
+        or gap_ns.
+        """
+        if gap_ns is not None and gap_ns == get_codec(family).gap_ns:
+            # the same frame as the default gap so share its cache entry
+            gap_ns = None
+        key = (family, addr, unit, bool(action), gap_ns)
+        with self.__lock:
+            frame = self.__cache.get(key)
+            if frame is not None:
+                self.__cache.move_to_end(key)
+                return frame
+
+        frame = self.__build(*key)
+        with self.__lock:
+            self.__cache[key] = frame
+            if len(self.__cache) > self.__cache_size:
+                self.__cache.popitem(last=False)
+        return frame
+
+    def precompile_all(self):
+        """
+        Compile every valid Etekcity frame.  The cache must be able to hold 
+        ALL_FRAMES_COUNT frames for this to be useful.
+        """
+        for addr in range(Transmitter.FIRST_VALID_ADDRESS,
+                          Transmitter.LAST_VALID_ADDRESS + 1):
+            for unit in Transmitter._UNIT_BITS:
+                self.compile(addr, unit, True)
+                self.compile(addr, unit, False)
+
+    @staticmethod
+    def __build(family, addr, unit, action, gap_ns):
+        return get_codec(family).compile(addr, unit, action, gap_ns)
+
+    #
+    # end of class FrameCompiler
+    #
+
+
+class TimingEngine:
+    """
+    Play compiled frames on a pin with every edge deadline computed from
+    a single start time taken from time.perf_counter_ns().  As deadlines
+    never depend on when the previous edge actually happened, errors do
+    not add up over a frame or a burst of frames.
+    
+    Waits longer than spin_ns (e.g. the idle time after each frame) are 
+    slept through so the CPU is free.  Only the last spin_ns before an 
+    edge is spent in a busy loop.
     
+    Writing the pin takes time, so the write for each edge is started 
+    lead_ns before its deadline and the level changes close to it.  
+    Lateness is measured for the time the level is expected to change,
+    lead_ns after the write is started.  
+    
+    An edge which goes out more than late_ns after its deadline is 
+    counted as missed.  For each frame the worst lateness and the time 
+    from its scheduled start to its last edge are kept.
+    
+    play() can be asked to stop between frames, after the idle time of 
+    the last frame sent, so a burst can be split without ever cutting a
+    frame short.
+    """
+    DEFAULT_SPIN_NS = 300 * 1000
+    DEFAULT_LATE_NS = 50 * 1000
+
+    def __init__(self, spin_ns=DEFAULT_SPIN_NS, late_ns=DEFAULT_LATE_NS,
+                 lead_ns=0):
+        if spin_ns < 0:
+            raise ValueError('spin_ns of {} is < 0'.format(spin_ns))
+        if late_ns < 0:
+            raise ValueError('late_ns of {} is < 0'.format(late_ns))
+        if lead_ns < 0:
+            raise ValueError('lead_ns of {} is < 0'.format(lead_ns))
+        self.__spin_ns = spin_ns
+        self.__late_ns = late_ns
+        self.__lead_ns = lead_ns
+        # results of the most recent play()
+        self.missed_edges = 0
+        self.max_lateness_ns = 0
+        self.frame_lateness_ns = []
+        self.frame_durations_ns = []
+        self.frames_played = 0
+
+    def play(self, output, pin, frames, should_yield=None):
+        """
+        Send the compiled frames back-to-back using output(pin, level).
+        Returns when the idle time after the last frame has passed.
+        
+        If should_yield is given it is called just before each frame 
+        after the first and if it returns True no more frames are sent. 
+        frames_played is set to the number of frames sent.
+        
+        Returns the number of edges which missed their deadline.
+        """
+        now = time.perf_counter_ns
+        sleep = time.sleep
+        spin_ns = self.__spin_ns
+        late_ns = self.__late_ns
+        lead_ns = self.__lead_ns
+        missed = 0
+        worst = 0
+        frame_lateness = []
+        frame_durations = []
+
+        # the first write starts now
+        deadline = now() + lead_ns
+        t = deadline
+        played = 0
+        for frame in frames:
+            if played and should_yield is not None:
+                # decide as late in the idle time as possible
+                t = now()
+                if deadline - t > spin_ns:
+                    sleep((deadline - t - spin_ns) / 1000000000.0)
+                if should_yield():
+                    break
+            played += 1
+            frame_start = deadline
+            frame_worst = 0
+            level = 1
+            for duration in frame:
+                # when the write for this edge should start
+                start = deadline - lead_ns
+                t = now()
+                if start - t > spin_ns:
+                    sleep((start - t - spin_ns) / 1000000000.0)
+                    t = now()
+                while t < start:
+                    t = now()
+                output(pin, level)
+                lateness = t - start
+                if lateness > late_ns:
+                    missed += 1
+                if lateness > frame_worst:
+                    frame_worst = lateness
+                deadline += duration
+                level ^= 1
+            frame_lateness.append(frame_worst)
+            frame_durations.append(t + lead_ns - frame_start)
+            if frame_worst > worst:
+                worst = frame_worst
+
+        remaining = deadline - now()
+        if remaining > 0:
+            sleep(remaining / 1000000000.0)
+
+        self.missed_edges = missed
+        self.max_lateness_ns = worst
+        self.frame_lateness_ns = frame_lateness
+        self.frame_durations_ns = frame_durations
+        self.frames_played = played
+        return missed
+
+    #
+    # end of class TimingEngine
+    #
+
+
 def usage():
     print('usage:  Etekcity.py board_pin address unit on|off',
           file=sys.stderr)    
@@ -269,11 +720,25 @@ def usage():
 if '__main__' == __name__ :
     """
     Simple command to operate devices.
+    
+    The command goes through the command socket of etekcity_rest_server.py
+    when the server is running so the pin has a single owner.
     """
+    import etekcity_client
     
     ## special case
     if 2 == len(sys.argv):
         board_pin = int(sys.argv[1])
+        try:
+            etekcity_client.send_command(board_pin, 
+                                         Transmitter.ALL_ADDRESS, 
+                                         Transmitter.ALL_UNIT, 
+                                         False, 
+                                         force=True)
+            exit(0)
+        except OSError:
+            # the server is not running, drive the pin from here
+            pass
         transmitter = Transmitter(board_pin)
         transmitter.transmit_all_off()
         exit(0)
@@ -339,6 +804,18 @@ if '__main__' == __name__ :
         print('unit:       {}'.format(unit), file=sys.stderr)
         print('action:     {}'.format(action), file=sys.stderr)
     
+    try:
+        etekcity_client.send_command(board_pin, addr, unit, action, 
+                                     force=True)
+        exit(0)
+    except OSError:
+        # the server is not running, drive the pin from here
+        pass
+    except etekcity_client.CommandError as e:
+        print('server could not send command: {}'.format(e), 
+              file=sys.stderr)
+        exit(1)
+
     transmitter = Transmitter(board_pin)
     transmitter.transmit_action(addr, unit, action)
     
@@ -0,0 +1,299 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Find the fewest copies and the shortest gap between copies with which 
+each outlet still switches every time, and keep them as outlet profiles
+(see etekcity_outlet_profiles.py) for the Transmitter to use.
+
+Each outlet must have a line which shows if it is powered, e.g. a small
+mains adapter or an opto-isolator, wired to an input of a 
+SerialArduinoGpio controller.  The Arduino pin is used as an input with
+its pull up so a line which pulls the pin LOW when the outlet is on 
+needs --active_low.
+
+For each outlet the copies are lowered one at a time, using the gap of 
+its family, while every one of --trials on / off switches is seen on 
+the input.  The gap is then shortened in steps while the outlet still
+switches every time.  --margin extra copies are added to the result.  
+Before each setting is tried the outlet is turned off with the default
+copies and gap so a failure can not carry over to the next setting.
+
+The REST server must be stopped while tuning as both drive the pin.  
+Run as root, for example:
+
+  etekcity_copy_tuning.py /dev/ttyUSB0 --outlet 21 1 7 --outlet 21 2 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from etekcity_codecs import CODECS, DEFAULT_FAMILY, get_codec
+from etekcity_controller import Transmitter
+from etekcity_outlet_profiles import OutletProfiles
+
+TRANSMIT_PIN = 18
+DEFAULT_TRIALS = 5
+DEFAULT_MARGIN = 1
+DEFAULT_SETTLE_TIME_IN_SECONDS = 1.0
+DEFAULT_PROFILES_FILE = 'etekcity_profiles.json'
+# gaps tried, as fractions of the gap of the family
+GAP_FRACTIONS = [1.0, 0.8, 0.6, 0.4, 0.2]
+
+
+def burst_ms(plan):
+    """
+    return the milliseconds taken to send plan
+    """
+    return sum(sum(frame) for frame in plan.frames) / 1000000.0
+
+
+class ArduinoFeedback:
+    """
+    Read the line of an outlet with a SerialArduinoGpioController.  The
+    line is read settle_time seconds after the command so the outlet has
+    time to switch.
+    """
+    def __init__(self, controller, active_low=False,
+                 settle_time=DEFAULT_SETTLE_TIME_IN_SECONDS):
+        self.__controller = controller
+        self.__active_low = active_low
+        self.__settle_time = settle_time
+
+    def setup_input(self, arduino_pin):
+        # a pin set HIGH is an input with its pull up
+        self.__controller.set_digital_value(arduino_pin, 1)
+
+    def outlet_on(self, arduino_pin):
+        time.sleep(self.__settle_time)
+        value = self.__controller.read_digital_value(arduino_pin)
+        return bool(value) != self.__active_low
+
+
+class CopyTuner:
+    """
+    Tune outlets of family sent by transmitter, which must use profiles,
+    an OutletProfiles, and read through feedback.
+    """
+    def __init__(self, transmitter, profiles, feedback, 
+                 trials=DEFAULT_TRIALS, family=DEFAULT_FAMILY):
+        if trials < 1:
+            raise ValueError('trials of {} is not > 0'.format(trials))
+        self.__transmitter = transmitter
+        self.__profiles = profiles
+        self.__feedback = feedback
+        self.__trials = trials
+        self.__family = family
+
+    def __reset(self, address, unit, arduino_pin):
+        """
+        turn the outlet off with the default copies and gap
+        """
+        self.__profiles.remove(address, unit, self.__family)
+        self.__transmitter.transmit_many([(address, unit, False)], 
+                                         self.__family)
+        if self.__feedback.outlet_on(arduino_pin):
+            raise RuntimeError(
+                'outlet {} unit {} does not turn off with the default '
+                'copies, check the wiring of Arduino pin {}'.format(
+                    address, unit, arduino_pin))
+
+    def reliable(self, address, unit, arduino_pin, copies, gap_ns):
+        """
+        return True if the outlet followed every on and off of the trials
+        when sent with copies and gap_ns
+        """
+        self.__reset(address, unit, arduino_pin)
+        self.__profiles.set(address, unit, copies, gap_ns, self.__family)
+        for trial in range(self.__trials):
+            for action in (True, False):
+                self.__transmitter.transmit_many([(address, unit, action)],
+                                                 self.__family)
+                if action != self.__feedback.outlet_on(arduino_pin):
+                    return False
+        return True
+
+    def tune(self, address, unit, arduino_pin, max_copies, 
+             margin=DEFAULT_MARGIN):
+        """
+        Find and set the profile of the outlet.  Returns (copies, gap_ns)
+        or None, with no profile set, if the outlet is not reliable even 
+        with max_copies and the default gap.
+        """
+        default_gap_ns = get_codec(self.__family).gap_ns
+        print('outlet {} unit {}: trying {} copies'.format(
+            address, unit, max_copies))
+        if not self.reliable(address, unit, arduino_pin, max_copies, 
+                             default_gap_ns):
+            self.__reset(address, unit, arduino_pin)
+            return None
+
+        copies = max_copies
+        while 1 < copies:
+            print('outlet {} unit {}: trying {} copies'.format(
+                address, unit, copies - 1))
+            if not self.reliable(address, unit, arduino_pin, copies - 1,
+                                 default_gap_ns):
+                break
+            copies -= 1
+
+        gap_ns = default_gap_ns
+        for fraction in GAP_FRACTIONS:
+            candidate = int(default_gap_ns * fraction)
+            if candidate >= gap_ns:
+                continue
+            print('outlet {} unit {}: trying a gap of {} us'.format(
+                address, unit, candidate // 1000))
+            if not self.reliable(address, unit, arduino_pin, copies, 
+                                 candidate):
+                break
+            gap_ns = candidate
+
+        self.__reset(address, unit, arduino_pin)
+        copies += margin
+        self.__profiles.set(address, unit, copies, gap_ns, self.__family)
+        return copies, gap_ns
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(
+        description='find the fewest copies and shortest gap for outlets')
+    parser.add_argument('serial_port',
+                        help='serial port of the SerialArduinoGpio '
+                        'controller, e.g. /dev/ttyUSB0'
+                        )
+    parser.add_argument('--outlet',
+                        action='append',
+                        nargs=3,
+                        required=True,
+                        metavar=('ADDRESS', 'UNIT', 'ARDUINO_PIN'),
+                        help='outlet to tune and the Arduino pin its line '
+                        'is wired to, may be given more than once',
+                        type=int
+                        )
+    parser.add_argument('--family',
+                        default=DEFAULT_FAMILY,
+                        choices=sorted(CODECS),
+                        help='family of the outlets'
+                        )
+    parser.add_argument('--pin',
+                        default=TRANSMIT_PIN,
+                        help='board pin of the transmitter',
+                        type=int
+                        )
+    parser.add_argument('--max_copies',
+                        default=Transmitter.DEFAULT_COPIES_TO_TRANSMIT,
+                        help='copies to start from',
+                        type=int
+                        )
+    parser.add_argument('--trials',
+                        default=DEFAULT_TRIALS,
+                        help='on / off switches which must all be seen',
+                        type=int
+                        )
+    parser.add_argument('--margin',
+                        default=DEFAULT_MARGIN,
+                        help='copies added to the fewest which worked',
+                        type=int
+                        )
+    parser.add_argument('--settle_time',
+                        default=DEFAULT_SETTLE_TIME_IN_SECONDS,
+                        help='seconds to wait before reading the line',
+                        type=float
+                        )
+    parser.add_argument('--active_low',
+                        help='the line is LOW when the outlet is on',
+                        action='store_true'
+                        )
+    parser.add_argument('--profiles_file',
+                        default=DEFAULT_PROFILES_FILE,
+                        help='JSON file where the profiles are kept'
+                        )
+    args = parser.parse_args()
+
+    # the SerialArduinoGpio controller is kept beside this directory
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 os.pardir, 'SerialArduinoGpio'))
+    from SerialArduinoGpioController import (SerialArduinoGpioController,
+                                             VALID_DIGITAL_PINS)
+
+    for address, unit, arduino_pin in args.outlet:
+        if arduino_pin not in VALID_DIGITAL_PINS:
+            print('Arduino pin of {} is not in {}'.format(
+                arduino_pin, sorted(VALID_DIGITAL_PINS)), file=sys.stderr)
+            exit(2)
+        try:
+            Transmitter.check_command(address, unit, True, args.family)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            exit(2)
+
+    controller = SerialArduinoGpioController(args.serial_port)
+    feedback = ArduinoFeedback(controller, args.active_low, 
+                               args.settle_time)
+    profiles = OutletProfiles(args.profiles_file)
+    transmitter = Transmitter(args.pin, 
+                              retries=args.max_copies, 
+                              profiles=profiles)
+    tuner = CopyTuner(transmitter, profiles, feedback, args.trials, 
+                      args.family)
+
+    status = 0
+    for address, unit, arduino_pin in args.outlet:
+        feedback.setup_input(arduino_pin)
+        # a profile from an earlier run is replaced, or dropped when the
+        # outlet can not be tuned
+        profiles.remove(address, unit, args.family)
+        default_plan = transmitter.compile_plan([(address, unit, True)], 
+                                                args.family)
+        try:
+            result = tuner.tune(address, unit, arduino_pin, args.max_copies,
+                                args.margin)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            status = 1
+            continue
+        if result is None:
+            print('outlet {} unit {} did not switch every time with {} '
+                  'copies, no profile kept'.format(address, unit, 
+                                                   args.max_copies))
+            status = 1
+            continue
+        copies, gap_ns = result
+        plan = transmitter.compile_plan([(address, unit, True)], 
+                                        args.family)
+        print('outlet {} unit {}: {} copies with a gap of {} us, burst of '
+              '{:.1f} ms ({:.1f} ms on the air) instead of {:.1f} ms '
+              '({:.1f} ms)'.format(
+                  address, unit, copies, gap_ns // 1000, 
+                  burst_ms(plan), 1000.0 * plan.airtime, 
+                  burst_ms(default_plan), 1000.0 * default_plan.airtime))
+    profiles.save()
+
+    transmitter.close()
+    controller.close()
+    exit(status)
@@ -0,0 +1,244 @@
+#!/usr/bin/python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Append-only binary journal of the commands sent by a Transmitter.
+
+Each (address, unit, action) item of a burst is written as one fixed 
+size record of:
+  time_ns          wall clock time (ns since the epoch) the burst ended
+  address          outlet address
+  pin              board pin
+  unit             outlet unit
+  action           1 for on, 0 for off
+  family           index of the outlet family in etekcity_codecs.FAMILIES
+  copies           number of frames sent for the item
+  max_lateness_ns  latest edge of any frame of the item
+All the records of a burst are added with a single os.write() to a file
+opened with O_APPEND so writing costs a few microseconds and is done 
+after the burst has been sent.  Times never go backwards in the file so
+a reader can find a range of time with a binary search over the memory 
+mapped file.
+
+Run this file to export a journal as JSON lines:
+  etekcity_journal.py journal_file [--since TIME] [--until TIME]
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from etekcity_codecs import FAMILIES
+
+# time_ns, address, pin, unit, action, family, copies, 6 pad bytes, 
+# max_lateness_ns
+RECORD = struct.Struct('<qIBBBBH6xq')
+
+# largest value which fits in the max_lateness_ns field
+MAX_LATENESS_IN_NS = (1 << 63) - 1
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+JournalRecord = collections.namedtuple(
+    'JournalRecord', 
+    ['time_ns', 'address', 'pin', 'unit', 'action', 'family', 'copies', 
+     'max_lateness_ns'])
+
+
+class Journal:
+    """
+    Writer for the journal in path.  The file is created if needed and 
+    records are added to the end of it.
+    
+    A partial record left at the end by an interrupted write is dropped so
+    new records stay aligned, and the time of the last record is kept so 
+    records stay in time order even if the wall clock went back since.
+    """
+    def __init__(self, path):
+        self.__fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 
+                            0o644)
+        self.__lock = threading.Lock()
+        size = os.fstat(self.__fd).st_size
+        complete = size - size % RECORD.size
+        if complete != size:
+            os.ftruncate(self.__fd, complete)
+        self.__last_time_ns = 0
+        if complete:
+            self.__last_time_ns = struct.unpack(
+                '<q', os.pread(self.__fd, 8, complete - RECORD.size))[0]
+
+    def record(self, pin, plan, frame_lateness_ns, first_frame=0):
+        """
+        Add a record for each item of the TransmitPlan plan which was just
+        sent on pin.  frame_lateness_ns is the latest edge of each frame
+        sent, starting with frame first_frame of the plan, as kept by 
+        TimingEngine.
+        
+        Frame i of the plan belongs to item plan.frame_items[i].  copies is
+        the number of frames sent for the item in this part of the plan.
+        """
+        count = len(plan.items)
+        if 0 == count or not frame_lateness_ns:
+            return
+        latest = [0] * count
+        copies = [0] * count
+        frame_items = plan.frame_items
+        for i, lateness in enumerate(frame_lateness_ns, first_frame):
+            item = frame_items[i]
+            copies[item] += 1
+            if lateness > latest[item]:
+                latest[item] = lateness
+        sent = [i for i in range(count) if copies[i]]
+        family = FAMILIES.index(plan.family)
+        buffer = bytearray(RECORD.size * len(sent))
+        with self.__lock:
+            # a step back of the wall clock must not break the ordering
+            now = max(time.time_ns(), self.__last_time_ns)
+            self.__last_time_ns = now
+            for offset, i in enumerate(sent):
+                address, unit, action = plan.items[i]
+                RECORD.pack_into(buffer, offset * RECORD.size,
+                                 now, address, pin, unit, int(action),
+                                 family, copies[i], 
+                                 min(latest[i], MAX_LATENESS_IN_NS))
+            os.write(self.__fd, buffer)
+
+    def close(self):
+        os.close(self.__fd)
+
+
+class JournalReader:
+    """
+    Read the journal in path through a read-only memory map.  Records are
+    indexed from 0.  A partly written record at the end of the file is 
+    ignored.  Records added after the reader is made are not seen.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as journal_file:
+            size = os.fstat(journal_file.fileno()).st_size
+            self.__count = size // RECORD.size
+            self.__map = None
+            if self.__count:
+                self.__map = mmap.mmap(journal_file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.__count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.__count
+        if index < 0 or index >= self.__count:
+            raise IndexError('journal index out of range')
+        return JournalRecord(*RECORD.unpack_from(self.__map, 
+                                                 index * RECORD.size))
+
+    def __time_ns(self, index):
+        # time_ns is the first field of the record
+        return struct.unpack_from('<q', self.__map, index * RECORD.size)[0]
+
+    def __bisect(self, time_ns):
+        """
+        return the index of the first record at or after time_ns
+        """
+        low = 0
+        high = self.__count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__time_ns(middle) < time_ns:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def range(self, start_ns=None, end_ns=None):
+        """
+        Yield the records with start_ns <= time_ns < end_ns.  Either limit
+        can be None for no limit.
+        """
+        first = 0 if start_ns is None else self.__bisect(start_ns)
+        last = self.__count if end_ns is None else self.__bisect(end_ns)
+        for index in range(first, last):
+            yield self[index]
+
+    def close(self):
+        if self.__map is not None:
+            self.__map.close()
+
+
+def record_to_dict(record):
+    """
+    return a JournalRecord as a dictionary suitable for JSON with the time
+    in ISO 8601
+    """
+    result = record._asdict()
+    result['time'] = datetime.datetime.fromtimestamp(
+        record.time_ns / 1000000000.0, datetime.timezone.utc).isoformat()
+    result['action'] = 'on' if record.action else 'off'
+    if record.family < len(FAMILIES):
+        result['family'] = FAMILIES[record.family]
+    return result
+
+
+def parse_time(value):
+    """
+    return the local time value in the form YYYY-MM-DDTHH:MM:SS as ns 
+    since the epoch
+    """
+    when = datetime.datetime.strptime(value, TIME_FORMAT)
+    return int(time.mktime(when.timetuple())) * 1000000000
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(
+        description='export an Etekcity transmit journal as JSON lines')
+    parser.add_argument('journal_file',
+                        help='journal to read'
+                        )
+    parser.add_argument('--since',
+                        default=None,
+                        help='first local time to export as '
+                        'YYYY-MM-DDTHH:MM:SS',
+                        type=parse_time
+                        )
+    parser.add_argument('--until',
+                        default=None,
+                        help='local time at which to stop the export as '
+                        'YYYY-MM-DDTHH:MM:SS',
+                        type=parse_time
+                        )
+    args = parser.parse_args()
+
+    reader = JournalReader(args.journal_file)
+    for record in reader.range(args.since, args.until):
+        print(json.dumps(record_to_dict(record)))
+    reader.close()
@@ -0,0 +1,228 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Small, dependency free metrics which can be rendered in the Prometheus 
+text exposition format.
+
+Metrics are created through a MetricsRegistry.  Asking for a metric which
+already exists (same name and labels) returns the existing one so several
+objects can share a registry.  All metrics are safe to update from 
+multiple threads.
+
+Histograms have a fixed set of buckets chosen when they are created so
+recording a value never allocates.
+"""
+
+import threading
+
+# bucket upper bounds in seconds for edge lateness
+LATENESS_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                    0.001, 0.0025, 0.005, 0.01)
+# bucket upper bounds in seconds for the time to send one frame
+FRAME_DURATION_BUCKETS = (0.0175, 0.018, 0.0185, 0.019, 0.02, 0.0225,
+                          0.025, 0.03, 0.05)
+# bucket upper bounds for the number of copies sent for a command
+COPIES_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 12, 16)
+# bucket upper bounds in seconds for request handling time
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, v) for k, v in items) + '}'
+
+
+class Counter:
+    """
+    A value which only goes up.
+    """
+    TYPE = 'counter'
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__value = 0
+
+    def inc(self, amount=1):
+        with self.__lock:
+            self.__value += amount
+
+    def get(self):
+        return self.__value
+
+    def render(self, name, labels, lines):
+        lines.append('{}{} {}'.format(name, 
+                                      _format_labels(labels),
+                                      _format_value(self.__value)))
+
+
+class Gauge:
+    """
+    A value which can go up and down.
+    """
+    TYPE = 'gauge'
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__value = 0
+
+    def set(self, value):
+        with self.__lock:
+            self.__value = value
+
+    def inc(self, amount=1):
+        with self.__lock:
+            self.__value += amount
+
+    def dec(self, amount=1):
+        with self.__lock:
+            self.__value -= amount
+
+    def get(self):
+        return self.__value
+
+    def render(self, name, labels, lines):
+        lines.append('{}{} {}'.format(name, 
+                                      _format_labels(labels),
+                                      _format_value(self.__value)))
+
+
+class Histogram:
+    """
+    Count observations in fixed buckets given by their upper bounds.  An
+    extra bucket catches everything above the last bound.
+    """
+    TYPE = 'histogram'
+
+    def __init__(self, bounds):
+        if list(bounds) != sorted(bounds):
+            raise ValueError('bounds of {} are not sorted'.format(bounds))
+        self.__lock = threading.Lock()
+        self.__bounds = tuple(bounds)
+        self.__counts = [0] * (len(self.__bounds) + 1)
+        self.__sum = 0
+        self.__count = 0
+
+    def observe(self, value):
+        index = 0
+        for bound in self.__bounds:
+            if value <= bound:
+                break
+            index += 1
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__sum += value
+            self.__count += 1
+
+    def get_count(self):
+        return self.__count
+
+    def get_sum(self):
+        return self.__sum
+
+    def render(self, name, labels, lines):
+        with self.__lock:
+            counts = list(self.__counts)
+            total = self.__sum
+            count = self.__count
+        cumulative = 0
+        for bound, bucket_count in zip(self.__bounds + (float('inf'),), 
+                                       counts):
+            cumulative += bucket_count
+            lines.append('{}_bucket{} {}'.format(
+                name,
+                _format_labels(labels, ('le', _format_value(bound))),
+                cumulative))
+        lines.append('{}_sum{} {}'.format(name, 
+                                          _format_labels(labels),
+                                          _format_value(total)))
+        lines.append('{}_count{} {}'.format(name, 
+                                            _format_labels(labels),
+                                            count))
+
+
+class MetricsRegistry:
+    """
+    Hold named metrics and render them in Prometheus text format.
+    """
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        # name -> [metric_class, help_text, {labels: metric}]
+        self.__families = {}
+
+    def __get(self, metric_class, name, help_text, labels, *args):
+        key = tuple(sorted((labels or {}).items()))
+        with self.__lock:
+            family = self.__families.get(name)
+            if family is None:
+                family = [metric_class, help_text, {}]
+                self.__families[name] = family
+            elif family[0] is not metric_class:
+                raise ValueError('metric {} is already a {}'.format(
+                    name, family[0].TYPE))
+            metric = family[2].get(key)
+            if metric is None:
+                metric = metric_class(*args)
+                family[2][key] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=None):
+        return self.__get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=None):
+        return self.__get(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, bounds, labels=None):
+        return self.__get(Histogram, name, help_text, labels, bounds)
+
+    def render(self):
+        """
+        return all metrics as a string in Prometheus text format
+        """
+        lines = []
+        with self.__lock:
+            families = sorted((name, family[0], family[1], dict(family[2])) 
+                              for name, family in self.__families.items())
+        for name, metric_class, help_text, metrics in families:
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, metric_class.TYPE))
+            for labels in sorted(metrics):
+                metrics[labels].render(name, labels, lines)
+        return '\n'.join(lines) + '\n'
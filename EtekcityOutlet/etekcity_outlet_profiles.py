@@ -0,0 +1,137 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Transmit profiles for single outlets.
+
+A profile sets the number of copies of the frame sent to an outlet and
+the gap after each copy, for outlets which switch reliably with fewer
+copies or a shorter gap than the defaults.  Profiles are found with 
+etekcity_copy_tuning.py and kept in a JSON file which holds a list of 
+dictionaries with keys of "address", "unit", "copies", "gap_us" and 
+optional "family".  For example:
+
+    [
+     {"address": 21, "unit": 1, "copies": 3, "gap_us": 3000},
+     {"address": 21, "unit": 2, "copies": 2, "gap_us": 2000}
+    ]
+
+A Transmitter given an OutletProfiles uses the profile of each outlet 
+which has one when it compiles a plan.  The file is replaced atomically
+each time it is saved.
+"""
+
+import json
+import os
+import threading
+
+from etekcity_codecs import DEFAULT_FAMILY
+from etekcity_controller import Transmitter
+from etekcity_json_file import save_json
+
+
+class OutletProfiles:
+    """
+    (copies, gap_ns) for each (address, unit, family) which has a 
+    profile.  If path is given the profiles are loaded from there and 
+    save() writes them back.
+    """
+    def __init__(self, path=None):
+        self.__path = path
+        self.__lock = threading.Lock()
+        # (address, unit, family) -> (copies, gap_ns)
+        self.__profiles = {}
+        if path is not None and os.path.exists(path):
+            self.__load()
+
+    def __load(self):
+        with open(self.__path, 'r') as profiles_file:
+            data = json.load(profiles_file)
+        if not isinstance(data, list):
+            raise ValueError('profiles file {} does not hold a list'.format(
+                self.__path))
+        for index, entry in enumerate(data):
+            try:
+                self.set(entry['address'], 
+                         entry['unit'], 
+                         entry['copies'], 
+                         entry['gap_us'] * 1000, 
+                         entry.get('family', DEFAULT_FAMILY))
+            except KeyError as e:
+                raise ValueError('profile {} is missing {}'.format(index, e))
+            except (AttributeError, TypeError, ValueError) as e:
+                raise ValueError('profile {} is not valid: {}'.format(
+                    index, e))
+
+    def save(self):
+        """
+        write the profiles to a temporary file then rename it over the 
+        old one so a crash never leaves a partial file
+        """
+        if self.__path is None:
+            return
+        save_json(self.__path, self.to_list())
+
+    def get(self, address, unit, family=DEFAULT_FAMILY):
+        """
+        return (copies, gap_ns) for the outlet or None if it has no 
+        profile
+        """
+        return self.__profiles.get((address, unit, family))
+
+    def set(self, address, unit, copies, gap_ns, family=DEFAULT_FAMILY):
+        """
+        Set the profile of the outlet.  Raises ValueError if any value is
+        not valid.
+        """
+        address, unit = Transmitter.check_command(address, unit, True, 
+                                                  family)[:2]
+        if (not isinstance(copies, int) or isinstance(copies, bool)
+                or 1 > copies):
+            raise ValueError('copies of {} is not > 0'.format(copies))
+        if not isinstance(gap_ns, (int, float)) or 0 > gap_ns:
+            raise ValueError('gap of {} ns is < 0'.format(gap_ns))
+        with self.__lock:
+            self.__profiles[(address, unit, family)] = (copies, int(gap_ns))
+
+    def remove(self, address, unit, family=DEFAULT_FAMILY):
+        with self.__lock:
+            self.__profiles.pop((address, unit, family), None)
+
+    def __len__(self):
+        return len(self.__profiles)
+
+    def to_list(self):
+        """
+        return the profiles as a list of dictionaries as kept in the file
+        """
+        with self.__lock:
+            profiles = sorted(self.__profiles.items())
+        return [{'family': family,
+                 'address': address,
+                 'unit': unit,
+                 'copies': copies,
+                 'gap_us': gap_ns // 1000}
+                for (address, unit, family), (copies, gap_ns) in profiles]
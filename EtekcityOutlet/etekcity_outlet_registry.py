@@ -0,0 +1,213 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Named outlets for the Etekcity REST server.
+
+The registry is a JSON file which holds a dictionary of outlet name to a
+dictionary with keys of "address", "unit" and optional "pin", "room" and
+"family" (see etekcity_codecs.py).  For example:
+
+    {
+     "desk lamp": {"address": 21, "unit": 1, "room": "office"},
+     "printer": {"address": 21, "unit": 2, "room": "office"},
+     "porch": {"address": 17, "unit": 5, "pin": 16, "room": "outside"}
+    }
+
+The addresses and units are the ones found with etekcity_try_addrs.py.
+
+When the file is read every outlet is checked and its "on" and "off" 
+bursts are compiled, and the outlets are indexed by name and by room, so
+a command for a named outlet is one dictionary lookup and no encoding.  
+The file is checked for changes at most once every check_interval 
+seconds when the registry is used and read again when it has changed.
+A file with a problem is reported and the outlets from the last good 
+file are kept.
+"""
+
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+from etekcity_codecs import DEFAULT_FAMILY
+from etekcity_controller import Transmitter
+
+DEFAULT_CHECK_INTERVAL = 1.0
+
+
+class Outlet:
+    """
+    A named outlet and its compiled plans.  plans maps True (on) and False
+    (off) to the TransmitPlan which sends that action.
+    """
+    def __init__(self, name, room, pin, address, unit, family, plans):
+        self.name = name
+        self.room = room
+        self.pin = pin
+        self.address = address
+        self.unit = unit
+        self.family = family
+        self.plans = plans
+
+    def to_dict(self):
+        result = {}
+        result['name'] = self.name
+        result['room'] = self.room
+        result['pin'] = self.pin
+        result['address'] = self.address
+        result['unit'] = self.unit
+        result['family'] = self.family
+        return result
+
+
+def read_outlets(path, default_pin, compile_plan):
+    """
+    Read and check the outlets in the JSON file at path.  compile_plan is
+    called with (pin, items, family) to compile the plans of each outlet.
+    
+    Returns an OrderedDict of name to Outlet.  Raises ValueError 
+    describing the first problem found.
+    """
+    with open(path, 'r') as outlets_file:
+        data = json.load(outlets_file, 
+                         object_pairs_hook=collections.OrderedDict)
+    if not isinstance(data, dict):
+        raise ValueError('outlets file {} does not hold a dictionary'.format(
+            path))
+
+    outlets = collections.OrderedDict()
+    for name, entry in data.items():
+        try:
+            pin = entry.get('pin', default_pin)
+            if pin not in Transmitter.VALID_PINS:
+                raise ValueError('pin of {} is not in {}'.format(
+                    pin, Transmitter.VALID_PINS))
+            room = entry.get('room')
+            if room is not None and not isinstance(room, str):
+                raise ValueError('room of {} is not a string'.format(room))
+            family = entry.get('family', DEFAULT_FAMILY)
+            address, unit = Transmitter.check_command(
+                entry['address'], entry['unit'], True, family)[:2]
+            plans = {action: compile_plan(pin, [(address, unit, action)], 
+                                          family)
+                     for action in (True, False)}
+        except KeyError as e:
+            raise ValueError('outlet "{}" is missing {}'.format(name, e))
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError('outlet "{}" is not valid: {}'.format(name, e))
+        outlets[name] = Outlet(name, room, pin, address, unit, family, plans)
+    return outlets
+
+
+class OutletRegistry:
+    """
+    Outlets read from the file at path, kept up to date with the file.  
+    compile_plan is as for read_outlets().  A file which does not exist 
+    is an empty registry until it is created.
+    """
+    def __init__(self, path, default_pin, compile_plan, 
+                 check_interval=DEFAULT_CHECK_INTERVAL):
+        self.__path = path
+        self.__default_pin = default_pin
+        self.__compile_plan = compile_plan
+        self.__check_interval = check_interval
+        self.__lock = threading.Lock()
+        # (name -> Outlet, room -> tuple of Outlet), replaced as a whole 
+        # so readers never need the lock
+        self.__index = ({}, {})
+        # (st_mtime_ns, st_size) of the file last read, None if missing
+        self.__version = None
+        self.__next_check = 0.0
+        self.__reload()
+
+    def __stat(self):
+        try:
+            stat = os.stat(self.__path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def __reload(self):
+        """
+        Read the file again if it has changed.  Call with the lock held or
+        from __init__.
+        """
+        version = self.__stat()
+        if version == self.__version:
+            return
+        self.__version = version
+        if version is None:
+            self.__index = ({}, {})
+            return
+        try:
+            outlets = read_outlets(self.__path, self.__default_pin, 
+                                   self.__compile_plan)
+        except (OSError, ValueError) as e:
+            print('keeping the outlets read before, "{}": {}'.format(
+                self.__path, e), file=sys.stderr)
+            return
+        rooms = {}
+        for outlet in outlets.values():
+            rooms.setdefault(outlet.room, []).append(outlet)
+        self.__index = (outlets, 
+                        {room: tuple(members) 
+                         for room, members in rooms.items()})
+
+    def __current(self):
+        """
+        return the index, reading the file again first when it is time
+        to look for a change
+        """
+        now = time.monotonic()
+        if now >= self.__next_check:
+            with self.__lock:
+                if now >= self.__next_check:
+                    self.__reload()
+                    self.__next_check = now + self.__check_interval
+        return self.__index
+
+    def get(self, name):
+        """
+        return the Outlet called name or None
+        """
+        return self.__current()[0].get(name)
+
+    def in_room(self, room):
+        """
+        return a tuple of the Outlets in room
+        """
+        return self.__current()[1].get(room, ())
+
+    def outlets(self):
+        """
+        return a list of all the Outlets
+        """
+        return list(self.__current()[0].values())
+
+    def __len__(self):
+        return len(self.__current()[0])
@@ -0,0 +1,204 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Remember the last action commanded for each Etekcity outlet.
+
+The outlets can not be read back so this is what the outlets were last
+told to do, not necessarily what they are doing.  The table is keyed on
+(pin, address, unit, family) and can be kept in a JSON file so it survives 
+restarts.  Changes are written by a background thread save_delay 
+seconds after the first change since the last write, so commands never
+wait for the disk and a burst of commands costs one write.  The file is
+replaced atomically and close() writes any change still pending.
+
+A command to the special ALL_ADDRESS / ALL_UNIT pair sets every known 
+Etekcity outlet on the pin.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+
+from etekcity_codecs import DEFAULT_FAMILY, ETEKCITY
+from etekcity_controller import Transmitter
+from etekcity_json_file import save_json
+
+DEFAULT_SAVE_DELAY_IN_SECONDS = 2.0
+
+
+class OutletStateTable:
+    """
+    Last commanded action (True for on, False for off) and the time it was
+    sent for each (pin, address, unit, family).  If path is given the 
+    table is loaded from there and saved there save_delay seconds after
+    it changes.
+    """
+    def __init__(self, path=None, 
+                 save_delay=DEFAULT_SAVE_DELAY_IN_SECONDS):
+        self.__path = path
+        self.__save_delay = save_delay
+        self.__lock = threading.Condition()
+        # (pin, address, unit, family) -> (action, time.time() when sent)
+        self.__states = {}
+        # the table has changed since it was last written
+        self.__dirty = False
+        self.__closed = False
+        # only one write at a time, taken without holding __lock
+        self.__save_lock = threading.Lock()
+        self.__thread = None
+        if path is not None:
+            if os.path.exists(path):
+                self.__load()
+            self.__thread = threading.Thread(target=self.__run,
+                                             name='OutletStateTable',
+                                             daemon=True)
+            self.__thread.start()
+
+    def __load(self):
+        with open(self.__path, 'r') as state_file:
+            for entry in json.load(state_file):
+                key = (entry['pin'], entry['address'], entry['unit'],
+                       entry.get('family', DEFAULT_FAMILY))
+                self.__states[key] = ('on' == entry['action'], entry['time'])
+
+    def __run(self):
+        while True:
+            with self.__lock:
+                while not self.__dirty and not self.__closed:
+                    self.__lock.wait()
+                # let the changes which follow soon after join this write
+                deadline = time.monotonic() + self.__save_delay
+                while not self.__closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__lock.wait(remaining)
+                if self.__closed:
+                    # close() writes what is left
+                    return
+            self.flush()
+
+    def flush(self):
+        """
+        write the table now if it has changed since it was last written
+        """
+        if self.__path is None:
+            return
+        with self.__save_lock:
+            with self.__lock:
+                if not self.__dirty:
+                    return
+                entries = self.__entries()
+                self.__dirty = False
+            self.__save(entries)
+
+    def close(self):
+        """
+        stop the background thread and write any change still pending
+        """
+        with self.__lock:
+            self.__closed = True
+            self.__lock.notify()
+        if self.__thread is not None:
+            self.__thread.join()
+        self.flush()
+
+    def __save(self, entries):
+        """
+        write entries to a temporary file then rename it over the old 
+        one so a crash never leaves a partial file
+        """
+        save_json(self.__path, entries)
+
+    def __entries(self):
+        return [{'pin': pin,
+                 'address': address,
+                 'unit': unit,
+                 'family': family,
+                 'action': 'on' if action else 'off',
+                 'time': when}
+                for (pin, address, unit, family), (action, when) 
+                in sorted(self.__states.items())]
+
+    def get(self, pin, address, unit, family=DEFAULT_FAMILY):
+        """
+        return the last action for the outlet or None if it is not known
+        """
+        state = self.__states.get((pin, address, unit, family))
+        if state is None:
+            return None
+        return state[0]
+
+    def matches(self, pin, address, unit, action, family=DEFAULT_FAMILY):
+        """
+        return True if the last action sent to the outlet was action
+        """
+        return action == self.get(pin, address, unit, family)
+
+    def record(self, pin, items, when=None, family=DEFAULT_FAMILY):
+        """
+        Note that the (address, unit, action) items of family were sent on
+        pin.
+        """
+        if when is None:
+            when = time.time()
+        with self.__lock:
+            for address, unit, action in items:
+                if (ETEKCITY == family
+                        and Transmitter.ALL_ADDRESS == address 
+                        and Transmitter.ALL_UNIT == unit):
+                    for key in self.__states:
+                        if pin == key[0] and ETEKCITY == key[3]:
+                            self.__states[key] = (action, when)
+                else:
+                    self.__states[(pin, address, unit, family)] = (action, 
+                                                                   when)
+            if not self.__dirty:
+                self.__dirty = True
+                self.__lock.notify()
+
+    def record_command(self, command):
+        """
+        Note the items of an etekcity_command_queue.Command which has been
+        sent.  Only the items the command sent itself are noted, the 
+        commands which carried its other items note those.
+        """
+        self.record(command.pin, command.send_items, 
+                    family=command.family)
+
+    def to_list(self):
+        """
+        return the table as a list of dictionaries with keys of "pin",
+        "address", "unit", "family", "action" and "time" (ISO 8601)
+        """
+        with self.__lock:
+            entries = self.__entries()
+        for entry in entries:
+            entry['time'] = datetime.datetime.fromtimestamp(
+                entry['time'], datetime.timezone.utc).isoformat()
+        return entries
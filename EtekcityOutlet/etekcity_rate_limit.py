@@ -0,0 +1,136 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Limit how fast each client may send commands to the REST server.
+
+Every client address has a token bucket which holds up to burst tokens
+and is refilled at rate tokens a second.  Each command takes one token.
+A request which needs more tokens than the bucket holds is refused with
+a RateLimitExceededError which says how long until it would fit, so one
+busy client can not fill the command queues for everyone else.  
+
+A request of more than burst commands, e.g. a large scene, is let 
+through once the bucket is full and leaves it in debt, so the client's
+later requests are refused until the bucket has refilled.
+"""
+
+import collections
+import threading
+import time
+
+DEFAULT_BURST = 10
+# client buckets kept, the least recently used full bucket is dropped
+DEFAULT_MAX_CLIENTS = 10000
+
+
+class RateLimitExceededError(RuntimeError):
+    """
+    Raised when a client has sent too many commands.  retry_after is the
+    number of seconds until the request would be allowed or None if it 
+    never will be.
+    """
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Up to burst tokens refilled at rate tokens a second.  Not thread safe,
+    ClientRateLimiter holds a lock while it is used.
+    """
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, 
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost, now):
+        """
+        Take cost tokens.  Returns 0 if they were taken or the seconds 
+        until they will be there.  A cost of more than burst is taken 
+        from a full bucket, leaving it below zero.
+        """
+        self.refill(now)
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """
+    A TokenBucket for each client, made when the client is first seen.
+    """
+    def __init__(self, rate, burst=DEFAULT_BURST, 
+                 max_clients=DEFAULT_MAX_CLIENTS):
+        if rate <= 0:
+            raise ValueError('rate of {} is not > 0'.format(rate))
+        if burst < 1:
+            raise ValueError('burst of {} is not >= 1'.format(burst))
+        self.__rate = rate
+        self.__burst = burst
+        self.__max_clients = max_clients
+        self.__lock = threading.Lock()
+        self.__buckets = collections.OrderedDict()
+
+    def __drop_idle(self, now):
+        """
+        Forget the least recently used buckets which have refilled, as a
+        new bucket for the same client would be the same.
+        """
+        while len(self.__buckets) > self.__max_clients:
+            client, bucket = next(iter(self.__buckets.items()))
+            bucket.refill(now)
+            if bucket.tokens < self.__burst:
+                return
+            del self.__buckets[client]
+
+    def check(self, client, cost=1):
+        """
+        Take cost tokens from the bucket of client or raise 
+        RateLimitExceededError.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            bucket = self.__buckets.get(client)
+            if bucket is None:
+                bucket = TokenBucket(self.__rate, self.__burst, now)
+                self.__buckets[client] = bucket
+            else:
+                self.__buckets.move_to_end(client)
+            wait = bucket.take(cost, now)
+            self.__drop_idle(now)
+        if wait:
+            raise RateLimitExceededError(
+                'too many commands from {}'.format(client), 
+                retry_after=wait)
@@ -0,0 +1,351 @@
+#!/usr/bin/python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Receive and decode Etekcity outlet commands with a 433 MHz receiver 
+connected to a Raspberry Pi pin.
+
+The backend calls back on every edge of the input pin.  The callback 
+only stores the time and level in an EdgeRing, a ring buffer of 
+preallocated arrays, and returns.  A thread drains the ring in to a
+Decoder which matches the pulses against the bit timing used by 
+Transmitter (720 us bits with a 180 us HIGH for 0 and 540 us for 1) and
+the _UNIT_BITS / _ON_BITS / _OFF_BITS tables.  The decoder keeps the
+frame being received as an integer so nothing is built up per edge.
+
+A remote sends each command several times, and Transmitter interleaves
+the copies of several commands, so by default a frame which was seen
+within the last dedup_ns is not reported again.
+
+Recorded edges can be decoded with decode_trace() or from the command 
+line with --trace, a file of "time_ns level" lines as written with 
+--record.
+
+usage:  etekcity_receiver.py board_pin [--record FILE]
+        etekcity_receiver.py --trace FILE
+"""
+
+import argparse
+import sys
+import threading
+import time
+from array import array
+
+from etekcity_backends import RPiGpioBackend
+from etekcity_controller import Transmitter
+
+DEFAULT_RING_SIZE = 16384
+# how often the ring is drained
+POLL_TIME_IN_SECONDS = 0.01
+
+# a HIGH shorter than this is noise, longer is a 1 up to the bit time
+_MIN_HIGH_IN_NS = Transmitter._ZERO_BIT_TIME_HIGH_IN_NS // 2
+_SPLIT_HIGH_IN_NS = (Transmitter._ZERO_BIT_TIME_HIGH_IN_NS 
+                     + Transmitter._ONE_BIT_TIME_HIGH_IN_NS) // 2
+_MAX_HIGH_IN_NS = Transmitter._TOTAL_BIT_TIME_IN_NS
+# rise to rise time within a frame
+_MIN_PERIOD_IN_NS = Transmitter._TOTAL_BIT_TIME_IN_NS * 3 // 4
+_MAX_PERIOD_IN_NS = Transmitter._TOTAL_BIT_TIME_IN_NS * 5 // 4
+# a LOW at least this long separates frames
+_GAP_IN_NS = Transmitter._TOTAL_BIT_TIME_IN_NS * 2
+
+_ADDRESS_BIT_COUNT = 8
+_UNIT_BIT_COUNT = len(Transmitter._UNIT_BITS[1])
+_ACTION_BIT_COUNT = len(Transmitter._ON_BITS)
+_END_BIT_COUNT = len(Transmitter._END_BITS)
+FRAME_BIT_COUNT = (_ADDRESS_BIT_COUNT + _UNIT_BIT_COUNT 
+                   + _ACTION_BIT_COUNT + _END_BIT_COUNT)
+
+
+def _bits_value(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+
+# value of the bits in a frame -> unit or action
+_UNIT_CODES = {_bits_value(bits): unit 
+               for unit, bits in Transmitter._UNIT_BITS.items()}
+_ACTION_CODES = {_bits_value(Transmitter._ON_BITS): True,
+                 _bits_value(Transmitter._OFF_BITS): False}
+_END_CODE = _bits_value(Transmitter._END_BITS)
+
+DEFAULT_DEDUP_NS = 200 * 1000 * 1000
+
+
+class EdgeRing:
+    """
+    Edges as (time_ns, level) in preallocated arrays for one writer (the
+    edge callback) and one reader.  When the ring is full new edges are
+    dropped and counted in overruns.
+    """
+    def __init__(self, size=DEFAULT_RING_SIZE):
+        if size < 1:
+            raise ValueError('size of {} is not > 0'.format(size))
+        self.size = size
+        self.times = array('q', bytes(8 * size))
+        self.levels = bytearray(size)
+        # counts of edges written and read, only the writer changes head
+        # and only the reader changes tail
+        self.head = 0
+        self.tail = 0
+        self.overruns = 0
+
+    def push(self, time_ns, level):
+        head = self.head
+        if head - self.tail >= self.size:
+            self.overruns += 1
+            return
+        index = head % self.size
+        self.times[index] = time_ns
+        self.levels[index] = level
+        self.head = head + 1
+
+    def drain(self, consumer):
+        """
+        Call consumer(time_ns, level) for every edge written since the last
+        drain.  Returns the number of edges.
+        """
+        tail = self.tail
+        head = self.head
+        times = self.times
+        levels = self.levels
+        size = self.size
+        while tail < head:
+            index = tail % size
+            consumer(times[index], levels[index])
+            tail += 1
+        count = head - self.tail
+        self.tail = tail
+        return count
+
+
+class Decoder:
+    """
+    Turn a stream of edges in to callback(address, unit, action, time_ns)
+    calls, action being True for on.  time_ns is the time of the last 
+    edge of the frame.
+    
+    frames counts the good frames and errors the partial frames which 
+    were dropped.
+    """
+    def __init__(self, callback, dedup_ns=DEFAULT_DEDUP_NS):
+        self.__callback = callback
+        self.__dedup_ns = dedup_ns
+        self.frames = 0
+        self.errors = 0
+        self.__level = 0
+        self.__rise = None
+        self.__bits = 0
+        self.__count = 0
+        # (address, unit, action) -> time_ns it was last seen, at most one
+        # entry for each possible frame
+        self.__last_seen = {}
+
+    def __drop(self):
+        if self.__count:
+            self.errors += 1
+        self.__bits = 0
+        self.__count = 0
+
+    def feed(self, time_ns, level):
+        """
+        Add one edge.  An edge to the level the line is already at is 
+        ignored.
+        """
+        if level == self.__level:
+            return
+        self.__level = level
+        if level:
+            if self.__rise is not None:
+                period = time_ns - self.__rise
+                if period >= _GAP_IN_NS:
+                    self.__drop()
+                elif period < _MIN_PERIOD_IN_NS or period > _MAX_PERIOD_IN_NS:
+                    self.__drop()
+            self.__rise = time_ns
+            return
+
+        if self.__rise is None:
+            return
+        high = time_ns - self.__rise
+        if high < _MIN_HIGH_IN_NS or high > _MAX_HIGH_IN_NS:
+            self.__drop()
+            self.__rise = None
+            return
+        self.__bits = (self.__bits << 1) | (high > _SPLIT_HIGH_IN_NS)
+        self.__count += 1
+        if FRAME_BIT_COUNT == self.__count:
+            self.__frame(time_ns)
+            # the next rise must come after a gap to start a new frame
+            self.__rise = None
+
+    def __frame(self, time_ns):
+        bits = self.__bits
+        self.__bits = 0
+        self.__count = 0
+        end = bits & ((1 << _END_BIT_COUNT) - 1)
+        bits >>= _END_BIT_COUNT
+        action = _ACTION_CODES.get(bits & ((1 << _ACTION_BIT_COUNT) - 1))
+        bits >>= _ACTION_BIT_COUNT
+        unit = _UNIT_CODES.get(bits & ((1 << _UNIT_BIT_COUNT) - 1))
+        address = bits >> _UNIT_BIT_COUNT
+        if _END_CODE != end or action is None or unit is None:
+            self.errors += 1
+            return
+        self.frames += 1
+        frame = (address, unit, action)
+        last_seen = self.__last_seen.get(frame)
+        self.__last_seen[frame] = time_ns
+        if last_seen is None or time_ns - last_seen >= self.__dedup_ns:
+            self.__callback(address, unit, action, time_ns)
+
+
+def decode_trace(edges, dedup_ns=DEFAULT_DEDUP_NS):
+    """
+    Decode recorded edges given as (time_ns, level) pairs and return a 
+    list of (address, unit, action, time_ns).
+    """
+    events = []
+    decoder = Decoder(lambda *event: events.append(event), dedup_ns)
+    for time_ns, level in edges:
+        decoder.feed(time_ns, level)
+    return events
+
+
+class Receiver:
+    """
+    Decode commands received on board_pin and call 
+    callback(address, unit, action, time_ns) from a daemon thread.
+    
+    backend is an object as in etekcity_backends with input support, by 
+    default a new RPiGpioBackend.  If recorder is given it is also called
+    with every (time_ns, level) edge from the same thread.
+    """
+    def __init__(self, board_pin, callback, backend=None, 
+                 ring_size=DEFAULT_RING_SIZE, dedup_ns=DEFAULT_DEDUP_NS,
+                 recorder=None):
+        if board_pin not in Transmitter.VALID_PINS:
+            raise ValueError('board_pin of {} must be in {}'.format(
+                board_pin, Transmitter.VALID_PINS))
+        self.ring = EdgeRing(ring_size)
+        self.decoder = Decoder(callback, dedup_ns)
+        self.__recorder = recorder
+        self.__closed = threading.Event()
+        if backend is None:
+            backend = RPiGpioBackend()
+        self.__backend = backend
+        backend.setup_input(board_pin)
+        backend.add_edge_callback(board_pin, self.ring.push)
+        self.__thread = threading.Thread(target=self.__run, 
+                                         name='etekcity-receiver',
+                                         daemon=True)
+        self.__thread.start()
+
+    def __consume(self, time_ns, level):
+        self.__recorder(time_ns, level)
+        self.decoder.feed(time_ns, level)
+
+    def __run(self):
+        consumer = self.decoder.feed
+        if self.__recorder is not None:
+            consumer = self.__consume
+        while not self.__closed.wait(POLL_TIME_IN_SECONDS):
+            self.ring.drain(consumer)
+        self.ring.drain(consumer)
+
+    def close(self):
+        """
+        Decode what is in the ring, stop the thread and release the pin.
+        """
+        self.__closed.set()
+        self.__thread.join()
+        self.__backend.cleanup()
+
+
+def print_event(address, unit, action, time_ns):
+    print('address {} unit {} {}'.format(address, unit, 
+                                         'on' if action else 'off'))
+    sys.stdout.flush()
+
+
+def read_trace(path):
+    """
+    return the (time_ns, level) edges in a trace file
+    """
+    edges = []
+    with open(path, 'r') as trace_file:
+        for line in trace_file:
+            fields = line.split()
+            if fields:
+                edges.append((int(fields[0]), int(fields[1])))
+    return edges
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(
+        description='decode Etekcity commands from a 433 MHz receiver')
+    parser.add_argument('board_pin',
+                        nargs='?',
+                        default=None,
+                        help='pin connected to the receiver DATA pin',
+                        type=int
+                        )
+    parser.add_argument('--record',
+                        default=None,
+                        help='also write every edge to this trace file'
+                        )
+    parser.add_argument('--trace',
+                        default=None,
+                        help='decode this trace file instead of the pin'
+                        )
+    args = parser.parse_args()
+
+    if args.trace is not None:
+        for event in decode_trace(read_trace(args.trace)):
+            print_event(*event)
+        exit(0)
+    if args.board_pin is None:
+        parser.error('board_pin or --trace is needed')
+
+    recorder = None
+    if args.record is not None:
+        record_file = open(args.record, 'w')
+        def recorder(time_ns, level):
+            record_file.write('{} {}\n'.format(time_ns, level))
+
+    receiver = Receiver(args.board_pin, print_event, recorder=recorder)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    receiver.close()
+    if args.record is not None:
+        record_file.close()
+    print('{} frames, {} errors, {} edges dropped'.format(
+        receiver.decoder.frames, receiver.decoder.errors, 
+        receiver.ring.overruns), file=sys.stderr)
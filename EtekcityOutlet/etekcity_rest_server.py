@@ -32,23 +32,151 @@ Send a JSON dictionary with keys of:
   "unit" (1-5)
   "action" ("on"|"off")
   optional "pin" (valid board pin number)
-The default pin number is 18.
+  optional "async" (true|false)
+  optional "force" (true|false)
+  optional "priority" ("interactive"|"normal"|"bulk")
+  optional "family" ("etekcity"|"pt2262"|"ev1527")
+The default pin number is 18 and the default family "etekcity".  The
+range of "address" and "unit" depends on the family (see 
+etekcity_codecs.py).  Commands of all families for a pin share its queue.
+
+Commands are sent in order of priority.  A more urgent command is sent
+between the frames of a less urgent one which then carries on.  Single
+commands are "interactive" unless told otherwise, lists and scenes are
+"normal" and scheduled commands "bulk".
+
+The server remembers the last action sent to each outlet (kept in the
+file given with --state_file so it survives restarts).  A command which
+matches the remembered action is not sent unless "force" is true or 
+another command for the outlet is still queued or being sent.  A GET of 
+/outlets returns the remembered actions without using the radio.
+
+Several commands can be sent in one request as a JSON list of 
+dictionaries with keys of "address", "unit", "action" and optional "pin",
+"family", "priority" and "force".
+All items are checked before anything is sent.  The commands for each 
+pin are then sent as one burst with their copies interleaved and the 
+response holds a result for every item.
+
+Scenes are named lists of commands read from the JSON file given with
+--scenes_file (see etekcity_scenes.py for the format).  Each scene is 
+checked and compiled in to ready-to-send bursts when the server starts.
+A POST to /scenes/<name> sends the scene, a GET of /scenes lists them.
+
+Outlets can be given names and rooms in the JSON file given with 
+--outlets_file (see etekcity_outlet_registry.py for the format).  The 
+file is read again when it changes.  A POST to /outlets/<name> with a 
+JSON dictionary of "action" and optional "async", "force" and "priority"
+sends the precompiled command for that outlet.  A GET of /outlets/<name>
+or of /outlets?room=<room> returns the outlets with the last action sent
+to each.
+
+Timed actions are kept by the scheduler (see etekcity_scheduler.py for
+the rules).  A POST to /schedules with a JSON dictionary of "address", 
+"unit", "action", optional "pin" and one of "at", "every", "time" or 
+"sun" adds a schedule, a GET of /schedules lists them and a DELETE of 
+/schedules/<id> removes one.  An "id" may be given, a non-empty string
+without "/", otherwise one is made up.  Schedules are kept in the file
+given with --schedules_file.  Sunrise and sunset rules need --latitude 
+and --longitude.
+
+Normally the response is sent when the command has been transmitted.  If
+"async" is true the command is queued and "202 Accepted" is returned at
+once with a job id.  A GET of /jobs/<id> then reports the job as 
+"queued", "transmitting", "done" or "failed" with time stamps.  Finished
+jobs are kept until --max_jobs newer jobs have been added.
 
 try a curl command such as:
   curl -H 'Content-Type: application/json' -X POST -d '{"address":21, 
     "unit":1, "action": "on"}'  http://localhost:11111/
 
+Requests are served concurrently and connections are kept alive 
+(HTTP/1.1).  One Transmitter is kept for each pin and all commands for a
+pin go through a single queue so frames are never mixed on the pin.  
+With --rt_cpu each pin is driven by a real-time worker process pinned
+to that CPU.
+
+With --max_duty_cycle the airtime used by all commands is limited over a
+sliding window.  Commands which do not fit are delayed or, with an 
+--airtime_policy of "reject", answered with 503 and a Retry-After header.
+
+With --calibration_file the cost of reading the clock, writing a pin and
+waking from a sleep is measured on each pin when the server starts, for
+the default pin, or when the pin is first used (or read back from the 
+file when that pin was measured on the same model of Raspberry Pi) and
+the edge timing is tuned to match, see etekcity_calibration.py.
+--copies sets the number of copies of each frame sent.  With 
+--profiles_file the outlets tuned with etekcity_copy_tuning.py are sent
+with their own number of copies and gap between copies.
+
+With --journal_file a fixed size record of every command sent, with 
+the lateness of its edges, is added to that file.
+
+With --client_rate each client address may send that many commands a
+second on average with bursts of up to --client_burst.  More are 
+answered at once with 429 and a Retry-After header.  A request of more
+than --client_burst commands, e.g. a large scene, is sent once the 
+client's allowance is full and the client's later requests get 429 
+until it has built up again.  At most --max_queue_depth commands of 
+each priority wait for each pin; more are answered with 503 and a 
+Retry-After header.
+
+Commands for an outlet which is still queued replace the queued action 
+instead of being sent again, and a repeat of a command sent within 
+--dedup_window seconds is not sent again, unless "force" is true.
+
+With --command_socket (and --command_port for TCP) single commands can
+also be sent with the line protocol of etekcity_client.py, which is much
+cheaper for scripts than starting up a Transmitter of their own.
+
+A GET of /metrics returns transmitter timing, request latency and queue
+depth in Prometheus text format.
+
 The server must run as root to have access to the GPIO pins.
 
 """
 
 import argparse
+import collections
 import datetime
 import json
+import math
+import signal
 import sys
+import threading
+import time
+import urllib.parse
 from http.server import BaseHTTPRequestHandler, HTTPServer
+try:
+    from http.server import ThreadingHTTPServer
+except ImportError:
+    # python < 3.7
+    from socketserver import ThreadingMixIn
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
 
-from etekcity_controller import Transmitter
+import etekcity_airtime
+from etekcity_airtime import AirtimeAccountant, AirtimeExceededError
+from etekcity_backends import RPiGpioBackend
+from etekcity_calibration import load_or_measure
+from etekcity_codecs import DEFAULT_FAMILY
+from etekcity_command_socket import (start_server, TcpCommandServer, 
+                                     UnixCommandServer)
+import etekcity_command_queue
+from etekcity_command_queue import (BULK, Command, CommandQueue, FAILED, 
+                                    INTERACTIVE, JobTable, NORMAL, 
+                                    PRIORITIES, QueueFullError)
+from etekcity_controller import TimingEngine, Transmitter
+from etekcity_journal import Journal
+from etekcity_metrics import LATENCY_BUCKETS, MetricsRegistry
+from etekcity_outlet_profiles import OutletProfiles
+from etekcity_outlet_registry import OutletRegistry
+from etekcity_outlet_state import OutletStateTable
+import etekcity_rate_limit
+from etekcity_rate_limit import ClientRateLimiter, RateLimitExceededError
+from etekcity_rt_worker import TransmitWorker
+from etekcity_scenes import read_scenes
+from etekcity_scheduler import Scheduler
 
 DEBUG = 0
 
@@ -63,18 +191,268 @@ USE_MESSAGE = ('send a JSON dictionary with keys of '
                '<LI>"unit" (1-5)'
                '<LI>"action" ("on"|"off")'
                '<LI>optional "pin" (valid board pin number)'
+               '<LI>optional "async" (true|false)'
+               '<LI>optional "force" (true|false)'
+               '<LI>optional "priority" ("interactive"|"normal"|"bulk")'
+               '<LI>optional "family" ("etekcity"|"pt2262"|"ev1527")'
                '</UL>'
+               'or a JSON list of dictionaries with keys of "address", '
+               '"unit", "action" and optional "pin", "family", "priority" '
+               'and "force"'
                )
 
 DEFAULT_PIN = 18
 
+DEFAULT_MAX_QUEUE_DEPTH = 100
+
+METRICS_PATH = '/metrics'
+JOBS_PATH_PREFIX = '/jobs/'
+OUTLETS_PATH = '/outlets'
+OUTLETS_PATH_PREFIX = '/outlets/'
+SCENES_PATH = '/scenes'
+SCENES_PATH_PREFIX = '/scenes/'
+SCHEDULES_PATH = '/schedules'
+SCHEDULES_PATH_PREFIX = '/schedules/'
+
+METRICS = MetricsRegistry()
+REQUEST_LATENCY = METRICS.histogram(
+    'etekcity_request_latency_seconds',
+    'time to handle a command request',
+    LATENCY_BUCKETS,
+    {'method': 'POST'})
+
+# set from the command line when the duty cycle is limited
+AIRTIME = None
+# set from the command line to use a real-time worker process per pin
+RT_CPU = None
+# set from the command line to keep a journal of the commands sent
+JOURNAL = None
+# set from the command line to tune the edge timing to this machine
+CALIBRATION_FILE = None
+# pin -> Calibration measured on that pin
+CALIBRATIONS = {}
+# held while a pin is measured, so only one is at a time
+CALIBRATIONS_LOCK = threading.Lock()
+# named outlets, set from the command line
+REGISTRY = None
+# copies and gap of single outlets, set from the command line
+PROFILES = None
+# replaced from the command line
+COPIES = Transmitter.DEFAULT_COPIES_TO_TRANSMIT
+# set from the command line to limit commands from each client
+RATE_LIMITER = None
+RATE_LIMITED = METRICS.counter(
+    'etekcity_rate_limited_requests_total',
+    'requests refused because the client sent too many commands')
+# replaced from the command line
+MAX_QUEUE_DEPTH = DEFAULT_MAX_QUEUE_DEPTH
+DEDUP_WINDOW = etekcity_command_queue.DEFAULT_DEDUP_WINDOW
+
+# commands submitted with "async", replaced with the --max_jobs value
+JOBS = JobTable()
+
+# last action sent to each outlet, replaced to use the --state_file value
+OUTLET_STATES = OutletStateTable()
+
+# scene name -> list of (pin, TransmitPlan), filled by load_scenes()
+SCENES = {}
+
+# timed actions, replaced from the command line
+SCHEDULER = None
+
+# one CommandQueue, which owns the Transmitter, for each pin in use
+COMMAND_QUEUES = {}
+COMMAND_QUEUES_LOCK = threading.Lock()
+
+
+def status_for_error(error):
+    '''
+    return the HTTP status and extra headers for a command which failed 
+    with error
+    '''
+    if isinstance(error, (AirtimeExceededError, QueueFullError, 
+                          RateLimitExceededError)):
+        headers = {}
+        if error.retry_after is not None:
+            headers['Retry-After'] = str(math.ceil(error.retry_after))
+        if isinstance(error, RateLimitExceededError):
+            return 429, headers
+        return 503, headers
+    elif isinstance(error, (TypeError, ValueError)):
+        return 400, {}
+    else:
+        return 500, {}
+
+
+def get_calibration(pin):
+    '''
+    return the Calibration for pin, measured on pin the first time it is
+    used unless the calibration file already has it, or None without a
+    calibration file.  Must not be called with COMMAND_QUEUES_LOCK held
+    so the other pins are not held up while pin is measured.
+    '''
+    if CALIBRATION_FILE is None:
+        return None
+    with CALIBRATIONS_LOCK:
+        calibration = CALIBRATIONS.get(pin)
+        if calibration is None:
+            # the pin is only written LOW while measuring
+            backend = RPiGpioBackend()
+            backend.setup_output(pin)
+            calibration = load_or_measure(CALIBRATION_FILE, backend.output,
+                                          pin)
+            CALIBRATIONS[pin] = calibration
+    return calibration
+
+
+def get_command_queue(pin):
+    '''
+    return the CommandQueue for pin, creating it and its Transmitter the
+    first time the pin is used.
+    '''
+    with COMMAND_QUEUES_LOCK:
+        command_queue = COMMAND_QUEUES.get(pin)
+    if command_queue is not None:
+        return command_queue
+    if pin not in Transmitter.VALID_PINS:
+        raise ValueError('pin of {} is not in {}'.format(
+            pin, Transmitter.VALID_PINS))
+    # measured before taking the lock which every request needs
+    calibration = get_calibration(pin)
+    with COMMAND_QUEUES_LOCK:
+        command_queue = COMMAND_QUEUES.get(pin)
+        if command_queue is None:
+            engine = None
+            spin_ns = TimingEngine.DEFAULT_SPIN_NS
+            lead_ns = 0
+            if calibration is not None:
+                engine = calibration.timing_engine()
+                spin_ns = calibration.spin_ns
+                lead_ns = calibration.lead_ns
+            worker = None
+            if RT_CPU is not None:
+                worker = TransmitWorker(pin, cpu=RT_CPU, spin_ns=spin_ns,
+                                        lead_ns=lead_ns)
+            transmitter = Transmitter(pin, 
+                                      retries=COPIES,
+                                      engine=engine,
+                                      profiles=PROFILES,
+                                      metrics=METRICS, 
+                                      airtime=AIRTIME,
+                                      worker=worker,
+                                      journal=JOURNAL)
+            command_queue = CommandQueue(transmitter, 
+                                         METRICS,
+                                         OUTLET_STATES.record_command,
+                                         MAX_QUEUE_DEPTH,
+                                         DEDUP_WINDOW)
+            COMMAND_QUEUES[pin] = command_queue
+        return command_queue
+
+
+def compile_outlet_plan(pin, items, family):
+    '''
+    return a TransmitPlan for items on pin, used to precompile the outlets
+    of the registry
+    '''
+    return get_command_queue(pin).compile_plan(items, family)
+
+
+def outlet_state(outlet):
+    '''
+    return a registered outlet and the last action sent to it as a 
+    dictionary
+    '''
+    result = outlet.to_dict()
+    action = OUTLET_STATES.get(outlet.pin, outlet.address, outlet.unit, 
+                               outlet.family)
+    result['action'] = None if action is None else 'on' if action else 'off'
+    return result
+
+
+def load_scenes(path):
+    '''
+    Read the scenes in path and compile each one in to a TransmitPlan for
+    every pin it uses.  Returns a dictionary of name to a list of 
+    (pin, plan).
+    '''
+    scenes = {}
+    for name, items_by_pin in read_scenes(path, DEFAULT_PIN).items():
+        scenes[name] = [(pin, get_command_queue(pin).compile_plan(items))
+                        for pin, items in items_by_pin.items()]
+    return scenes
+
+
+def submit_scheduled(pin, items):
+    '''
+    send the (address, unit, action) items which the scheduler found due 
+    for pin as one command
+    '''
+    get_command_queue(pin).submit(Command(pin, items, priority=BULK))
+
+
+def run_socket_command(pin, address, unit, action, force):
+    '''
+    Send a command from the command socket and wait for it.  Returns 
+    (status, message) for the reply.
+    '''
+    try:
+        command_queue = get_command_queue(pin)
+        command = Command(pin, [(address, unit, action)], 
+                          priority=INTERACTIVE)
+        command_queue.submit(command, coalesce=not force,
+                             skip=None if force else OUTLET_STATES.matches)
+        command.wait()
+        if FAILED == command.state:
+            raise command.error
+    except Exception as e:
+        status, headers = status_for_error(e)
+        return status, str(e)
+    if command.skipped:
+        return 200, 'skipped'
+    return 200, 'ok'
+
 
 class Simple_RequestHandler(BaseHTTPRequestHandler):
     '''
     A subclass of BaseHTTPRequestHandler for our work.
     '''
+    # allow connections to be kept open between requests
+    protocol_version = 'HTTP/1.1'
     
     
+    def send_body(self, status, content_type, body, headers=None):
+        '''
+        send a complete response.  Content-Length is always sent so the
+        connection can be kept alive.
+        '''
+        data = bytes(body, 'utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if headers:
+            for name, value in headers.items():
+                self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def check_rate(self, cost):
+        '''
+        Take cost commands from the client's allowance.  Returns False,
+        after sending a 429 response, if the client has sent too many.
+        '''
+        if RATE_LIMITER is None:
+            return True
+        try:
+            RATE_LIMITER.check(self.client_address[0], cost)
+        except RateLimitExceededError as e:
+            RATE_LIMITED.inc()
+            self.send_error_for(e)
+            return False
+        return True
+
+
     def do_GET(self):
         '''
         handle the HTTP GET request
@@ -82,15 +460,68 @@ class Simple_RequestHandler(BaseHTTPRequestHandler):
         if DEBUG:
             print('got GET request', file=sys.stderr)
 
-        # Send response status code
-        self.send_response(200)
- 
-        # Send headers
-        self.send_header('Content-Type','text/html')
-        self.end_headers()
+        path = urllib.parse.urlsplit(self.path).path
+        if METRICS_PATH == path:
+            self.send_body(200, MetricsRegistry.CONTENT_TYPE, METRICS.render())
+            return
+
+        if OUTLETS_PATH == path:
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(
+                self.path).query)
+            if 'room' in query:
+                outlets = []
+                if REGISTRY is not None:
+                    for room in query['room']:
+                        outlets.extend(REGISTRY.in_room(room))
+                self.send_body(200, 'application/json', 
+                               json.dumps([outlet_state(outlet) 
+                                           for outlet in outlets], 
+                                          indent=1))
+                return
+            self.send_body(200, 'application/json', 
+                           json.dumps(OUTLET_STATES.to_list(), indent=1))
+            return
+
+        if path.startswith(OUTLETS_PATH_PREFIX):
+            outlet = None
+            if REGISTRY is not None:
+                outlet = REGISTRY.get(urllib.parse.unquote(
+                    path[len(OUTLETS_PATH_PREFIX):]))
+            if outlet is None:
+                self.send_body(404, 'text/html', 'no such outlet')
+                return
+            self.send_body(200, 'application/json', 
+                           json.dumps(outlet_state(outlet), indent=1))
+            return
+
+        if SCENES_PATH == path:
+            result = {}
+            for name, plans in SCENES.items():
+                result[name] = [{'pin': pin,
+                                 'address': address,
+                                 'unit': unit,
+                                 'action': 'on' if action else 'off'}
+                                for pin, plan in plans
+                                for address, unit, action in plan.items]
+            self.send_body(200, 'application/json', 
+                           json.dumps(result, indent=1))
+            return
+
+        if SCHEDULES_PATH == path:
+            self.send_body(200, 'application/json', 
+                           json.dumps(SCHEDULER.to_list(), indent=1))
+            return
+
+        if path.startswith(JOBS_PATH_PREFIX):
+            job = JOBS.get(path[len(JOBS_PATH_PREFIX):])
+            if job is None:
+                self.send_body(404, 'text/html', 'no such job')
+                return
+            self.send_body(200, 'application/json', 
+                           json.dumps(job.to_dict(), indent=1))
+            return
 
-        # Write content as utf-8 data
-        self.wfile.write(bytes(USE_MESSAGE, 'utf8'))
+        self.send_body(200, 'text/html', USE_MESSAGE)
         return
 
 
@@ -101,13 +532,62 @@ class Simple_RequestHandler(BaseHTTPRequestHandler):
         if DEBUG:
             print('got POST request', file=sys.stderr)
             print(self.headers, file=sys.stderr)
-        content_len = int(self.headers['Content-Length'])
+        start_time = time.perf_counter()
+        content_len = int(self.headers.get('Content-Length', 0))
         post_body = self.rfile.read(content_len).decode('utf8')
         if DEBUG:
             print('post_body: "{}"'.format(post_body), file=sys.stderr)     
-        data = json.loads(post_body)
-        if DEBUG:
-            print('post data: "{}"'.format(data), file=sys.stderr)
+
+        try:
+            # a scene can be triggered without a body
+            data = json.loads(post_body) if post_body else {}
+            if DEBUG:
+                print('post data: "{}"'.format(data), file=sys.stderr)
+        except Exception as e:
+            self.send_body(400, 'text/html', USE_MESSAGE)
+            return
+
+        path = urllib.parse.urlsplit(self.path).path
+        if isinstance(data, list):
+            cost = len(data)
+        elif path.startswith(SCENES_PATH_PREFIX):
+            cost = sum(len(plan.items) 
+                       for pin, plan in SCENES.get(
+                           path[len(SCENES_PATH_PREFIX):], []))
+        else:
+            cost = 1
+        if not self.check_rate(cost):
+            REQUEST_LATENCY.observe(time.perf_counter() - start_time)
+            return
+
+        if path.startswith(SCENES_PATH_PREFIX):
+            self.handle_scene(path[len(SCENES_PATH_PREFIX):], data)
+            REQUEST_LATENCY.observe(time.perf_counter() - start_time)
+            return
+
+        if path.startswith(OUTLETS_PATH_PREFIX):
+            self.handle_outlet(
+                urllib.parse.unquote(path[len(OUTLETS_PATH_PREFIX):]), 
+                data, 
+                start_time)
+            return
+
+        if SCHEDULES_PATH == path:
+            try:
+                schedule = SCHEDULER.add(data)
+            except (TypeError, ValueError) as e:
+                self.send_body(400, 'text/html', str(e))
+                return
+            location = SCHEDULES_PATH_PREFIX + schedule.id
+            self.send_body(201, 'application/json', 
+                           json.dumps(schedule.to_dict(), indent=1),
+                           {'Location': location})
+            return
+
+        if isinstance(data, list):
+            self.handle_bulk(data)
+            REQUEST_LATENCY.observe(time.perf_counter() - start_time)
+            return
 
         try:
             pin_num = DEFAULT_PIN
@@ -116,6 +596,10 @@ class Simple_RequestHandler(BaseHTTPRequestHandler):
             address_num = data['address']
             unit_num = data['unit']
             action = data['action']
+            run_async = bool(data.get('async', False))
+            force = bool(data.get('force', False))
+            priority = data.get('priority', INTERACTIVE)
+            family = data.get('family', DEFAULT_FAMILY)
         
             if DEBUG:
                 print('pin:     {}'.format(pin_num), file=sys.stderr)
@@ -123,22 +607,21 @@ class Simple_RequestHandler(BaseHTTPRequestHandler):
                 print('unit:    {}'.format(unit_num), file=sys.stderr)
                 print('action:  {}'.format(action), file=sys.stderr)
         except Exception as e:
-            self.send_response(400)
-            self.send_header('Content-Type','text/html')
-            self.end_headers()
-            self.wfile.write(bytes(USE_MESSAGE, 'utf8'))
+            self.send_body(400, 'text/html', USE_MESSAGE)
             return
 
-        
-        ec = Transmitter(pin_num)    
-        ec.transmit_action(address_num, unit_num, action)
-
-        # Send response status code
-        self.send_response(200)
+        try:
+            command_queue = get_command_queue(pin_num)
+        except (TypeError, ValueError) as e:
+            self.send_body(400, 'text/html', str(e))
+            return
 
-        # Send headers
-        self.send_header('Content-Type','application/json')
-        self.end_headers()
+        try:
+            command = Command(pin_num, [(address_num, unit_num, action)],
+                              priority=priority, family=family)
+        except ValueError as e:
+            self.send_body(400, 'text/html', str(e))
+            return
 
         result = {}
         result['status'] = 200
@@ -146,9 +629,283 @@ class Simple_RequestHandler(BaseHTTPRequestHandler):
         result['address'] = address_num
         result['unit'] = unit_num
         result['action'] = action
+        if DEFAULT_FAMILY != family:
+            result['family'] = family
+
+        self.send_command(command_queue, command, result, force, run_async,
+                          start_time)
+
+
+    def send_command(self, command_queue, command, result, force, run_async,
+                     start_time):
+        '''
+        Queue the single command on command_queue and respond with result
+        once it has been sent, or at once with a job id if run_async is 
+        set.  A command which matches the last action sent to its outlet
+        is skipped unless force is set or another command for the outlet
+        is still queued or being sent.
+        '''
+        try:
+            command_queue.submit(
+                command, coalesce=not force,
+                skip=None if force else OUTLET_STATES.matches)
+        except QueueFullError as e:
+            REQUEST_LATENCY.observe(time.perf_counter() - start_time)
+            self.send_error_for(e)
+            return
+
+        if command.skipped:
+            REQUEST_LATENCY.observe(time.perf_counter() - start_time)
+            result['skipped'] = True
+            self.send_body(200, 'application/json', 
+                           json.dumps(result, indent=1))
+            return
+
+        if run_async:
+            JOBS.add(command)
+            REQUEST_LATENCY.observe(time.perf_counter() - start_time)
+            result = {}
+            result['status'] = 202
+            result['job'] = command.id
+            result['location'] = JOBS_PATH_PREFIX + command.id
+            self.send_body(202, 'application/json', 
+                           json.dumps(result, indent=1),
+                           {'Location': result['location']})
+            return
+
+        command.wait()
+        REQUEST_LATENCY.observe(time.perf_counter() - start_time)
+        if FAILED == command.state:
+            self.send_error_for(command.error)
+            return
 
-        self.wfile.write(bytes(json.dumps(result, indent=1), "utf8"))
+        self.send_body(200, 'application/json', json.dumps(result, indent=1))
         return
+
+
+    def do_DELETE(self):
+        '''
+        handle the HTTP DELETE request which removes a schedule
+        '''
+        path = urllib.parse.urlsplit(self.path).path
+        if (path.startswith(SCHEDULES_PATH_PREFIX) 
+                and SCHEDULER.remove(path[len(SCHEDULES_PATH_PREFIX):])):
+            self.send_body(200, 'application/json', 
+                           json.dumps({'status': 200}, indent=1))
+            return
+        self.send_body(404, 'text/html', 'no such schedule')
+
+
+    def handle_bulk(self, data):
+        '''
+        Check every item in the list data, send the commands for each pin 
+        as one burst and respond with a result for every item.
+        
+        If any item is not valid nothing is sent and the errors are
+        returned with a status of 400.
+        
+        Items which match the last action sent to the outlet are skipped
+        unless they have "force" set or another command for the outlet is
+        still queued or being sent.
+        '''
+        # (pin, family) -> items, the outlets of each family on a pin are 
+        # sent as one burst
+        items_by_pin = collections.OrderedDict()
+        # the most urgent priority asked for by the items of each burst
+        priority_by_pin = {}
+        errors = []
+        for index, item in enumerate(data):
+            try:
+                pin_num = item.get('pin', DEFAULT_PIN)
+                family = item.get('family', DEFAULT_FAMILY)
+                checked = Transmitter.check_command(item['address'],
+                                                    item['unit'],
+                                                    item['action'],
+                                                    family)
+                if pin_num not in Transmitter.VALID_PINS:
+                    raise ValueError('pin of {} is not in {}'.format(
+                        pin_num, Transmitter.VALID_PINS))
+                priority = item.get('priority', NORMAL)
+                if priority not in PRIORITIES:
+                    raise ValueError('priority of "{}" is not in {}'.format(
+                        priority, PRIORITIES))
+                key = (pin_num, family)
+                items_by_pin.setdefault(key, []).append((index, checked))
+                priority_by_pin[key] = min(
+                    priority, 
+                    priority_by_pin.get(key, priority),
+                    key=PRIORITIES.index)
+            except Exception as e:
+                if isinstance(e, KeyError):
+                    e = 'missing key {}'.format(e)
+                elif isinstance(e, AttributeError):
+                    e = 'item is not a dictionary'
+                errors.append({'index': index, 'error': str(e)})
+        if errors:
+            result = {}
+            result['status'] = 400
+            result['errors'] = errors
+            self.send_body(400, 'application/json', 
+                           json.dumps(result, indent=1))
+            return
+
+        commands = []
+        for (pin_num, family), items in items_by_pin.items():
+            command = Command(pin_num, [checked for index, checked in items],
+                              priority=priority_by_pin[(pin_num, family)],
+                              family=family)
+            # outlets with a forced item are sent whatever their state
+            forced = set(checked[:2] for index, checked in items
+                         if data[index].get('force', False))
+            def skip(pin, address, unit, action, family, forced=forced):
+                return ((address, unit) not in forced 
+                        and OUTLET_STATES.matches(pin, address, unit, 
+                                                  action, family))
+            try:
+                get_command_queue(pin_num).submit(command, 
+                                                  coalesce=not forced,
+                                                  skip=skip)
+            except QueueFullError:
+                # the command has failed and is reported below
+                pass
+            commands.append((command, items))
+
+        status = 200
+        headers = {}
+        results = [None] * len(data)
+        for command, items in commands:
+            command.wait()
+            if FAILED == command.state:
+                item_status, item_headers = status_for_error(command.error)
+                if 200 == status:
+                    status, headers = item_status, item_headers
+            else:
+                item_status = 200
+            for index, (address_num, unit_num, action) in items:
+                skipped = (address_num, unit_num, action) in command.skipped
+                item_result = {}
+                item_result['status'] = 200 if skipped else item_status
+                item_result['pin'] = command.pin
+                item_result['address'] = address_num
+                item_result['unit'] = unit_num
+                item_result['action'] = 'on' if action else 'off'
+                if DEFAULT_FAMILY != command.family:
+                    item_result['family'] = command.family
+                if skipped:
+                    item_result['skipped'] = True
+                elif FAILED == command.state:
+                    item_result['error'] = str(command.error)
+                results[index] = item_result
+
+        result = {}
+        result['status'] = status
+        result['results'] = results
+        self.send_body(status, 'application/json', 
+                       json.dumps(result, indent=1), 
+                       headers)
+
+
+    def handle_outlet(self, name, data, start_time):
+        '''
+        Send the precompiled plan for the "action" in data to the outlet
+        called name.  data may also have "async", "force" and "priority"
+        as for a single command.
+        '''
+        outlet = None
+        if REGISTRY is not None:
+            outlet = REGISTRY.get(name)
+        if outlet is None:
+            self.send_body(404, 'text/html', 'no such outlet')
+            return
+        try:
+            action = Transmitter._parse_action(data['action'])
+            run_async = bool(data.get('async', False))
+            force = bool(data.get('force', False))
+            command = Command(outlet.pin, 
+                              plan=outlet.plans[action],
+                              priority=data.get('priority', INTERACTIVE))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            if isinstance(e, KeyError):
+                e = 'missing key {}'.format(e)
+            self.send_body(400, 'text/html', str(e))
+            return
+
+        result = outlet.to_dict()
+        result['status'] = 200
+        result['action'] = 'on' if action else 'off'
+        self.send_command(get_command_queue(outlet.pin), command, result, 
+                          force, run_async, start_time)
+
+
+    def handle_scene(self, name, data):
+        '''
+        Send the precompiled plans of the scene called name.  If data has
+        "async" set the commands are queued as jobs and 202 is returned.
+        '''
+        plans = SCENES.get(name)
+        if plans is None:
+            self.send_body(404, 'text/html', 'no such scene')
+            return
+        run_async = isinstance(data, dict) and bool(data.get('async', False))
+        priority = NORMAL
+        if isinstance(data, dict):
+            priority = data.get('priority', NORMAL)
+        if priority not in PRIORITIES:
+            self.send_body(400, 'text/html', 
+                           'priority of "{}" is not in {}'.format(
+                               priority, PRIORITIES))
+            return
+
+        commands = []
+        for pin_num, plan in plans:
+            command = Command(pin_num, plan=plan, priority=priority)
+            if run_async:
+                JOBS.add(command)
+            try:
+                COMMAND_QUEUES[pin_num].submit(command)
+            except QueueFullError:
+                # the command has failed and is reported with the others
+                pass
+            commands.append(command)
+
+        result = {}
+        result['scene'] = name
+        if run_async:
+            result['status'] = 202
+            result['jobs'] = [command.id for command in commands]
+            self.send_body(202, 'application/json', 
+                           json.dumps(result, indent=1))
+            return
+
+        status = 200
+        headers = {}
+        results = []
+        for command in commands:
+            command.wait()
+            pin_result = {}
+            pin_result['pin'] = command.pin
+            pin_result['status'] = 200
+            if FAILED == command.state:
+                pin_result['status'], pin_headers = status_for_error(
+                    command.error)
+                pin_result['error'] = str(command.error)
+                if 200 == status:
+                    status, headers = pin_result['status'], pin_headers
+            results.append(pin_result)
+        result['status'] = status
+        result['results'] = results
+        self.send_body(status, 'application/json', 
+                       json.dumps(result, indent=1),
+                       headers)
+
+
+    def send_error_for(self, error):
+        '''
+        send the response for a command which failed with error
+        '''
+        status, headers = status_for_error(error)
+        self.send_body(status, 'text/html', str(error), headers)
+
  
     def log_message(self, format, *args):
         """
@@ -175,8 +932,161 @@ if '__main__' == __name__:
                         default=DEFAULT_LISTEN_ADDRESS,
                         help='network address for server in form of "x.x.x.x"'
                         )
+    parser.add_argument('--max_duty_cycle',
+                        default=None,
+                        help='fraction of time the transmitter may be on '
+                        '(e.g. 0.1), default is no limit',
+                        type=float
+                        )
+    parser.add_argument('--duty_cycle_window',
+                        default=etekcity_airtime.DEFAULT_WINDOW_IN_SECONDS,
+                        help='seconds over which the duty cycle is measured',
+                        type=float
+                        )
+    parser.add_argument('--airtime_policy',
+                        default=etekcity_airtime.THROTTLE,
+                        choices=etekcity_airtime.VALID_POLICIES,
+                        help='delay or reject commands over the duty cycle'
+                        )
+    parser.add_argument('--rt_cpu',
+                        default=None,
+                        help='drive the pins from a real-time worker process '
+                        'pinned to this CPU',
+                        type=int
+                        )
+    parser.add_argument('--max_jobs',
+                        default=etekcity_command_queue.DEFAULT_MAX_JOBS,
+                        help='number of async jobs remembered',
+                        type=int
+                        )
+    parser.add_argument('--state_file',
+                        default=None,
+                        help='JSON file where the last action sent to each '
+                        'outlet is kept'
+                        )
+    parser.add_argument('--scenes_file',
+                        default=None,
+                        help='JSON file of named scenes'
+                        )
+    parser.add_argument('--client_rate',
+                        default=None,
+                        help='commands a second each client address may '
+                        'send, default is no limit',
+                        type=float
+                        )
+    parser.add_argument('--client_burst',
+                        default=etekcity_rate_limit.DEFAULT_BURST,
+                        help='commands a client may send at once',
+                        type=int
+                        )
+    parser.add_argument('--max_queue_depth',
+                        default=DEFAULT_MAX_QUEUE_DEPTH,
+                        help='commands of each priority which may wait for '
+                        'each pin',
+                        type=int
+                        )
+    parser.add_argument('--command_socket',
+                        default=None,
+                        help='Unix domain socket for etekcity_client.py '
+                        'commands'
+                        )
+    parser.add_argument('--command_port',
+                        default=None,
+                        help='TCP port on --network_address for '
+                        'etekcity_client.py commands',
+                        type=int
+                        )
+    parser.add_argument('--dedup_window',
+                        default=etekcity_command_queue.DEFAULT_DEDUP_WINDOW,
+                        help='seconds in which a repeat of a command is '
+                        'not sent again, 0 to always send',
+                        type=float
+                        )
+    parser.add_argument('--journal_file',
+                        default=None,
+                        help='file where a record of each command sent is '
+                        'added (see etekcity_journal.py)'
+                        )
+    parser.add_argument('--outlets_file',
+                        default=None,
+                        help='JSON file of named outlets, read again when '
+                        'it changes'
+                        )
+    parser.add_argument('--calibration_file',
+                        default=None,
+                        help='JSON file where the timing overhead measured '
+                        'on this machine is kept'
+                        )
+    parser.add_argument('--copies',
+                        default=Transmitter.DEFAULT_COPIES_TO_TRANSMIT,
+                        help='copies of the frame sent for each command',
+                        type=int
+                        )
+    parser.add_argument('--profiles_file',
+                        default=None,
+                        help='JSON file of the copies and gap for single '
+                        'outlets (see etekcity_copy_tuning.py)'
+                        )
+    parser.add_argument('--schedules_file',
+                        default=None,
+                        help='JSON file where schedules are kept'
+                        )
+    parser.add_argument('--latitude',
+                        default=None,
+                        help='latitude of the outlets in degrees north for '
+                        'sunrise and sunset schedules',
+                        type=float
+                        )
+    parser.add_argument('--longitude',
+                        default=None,
+                        help='longitude of the outlets in degrees east for '
+                        'sunrise and sunset schedules',
+                        type=float
+                        )
     args = parser.parse_args()
+    RT_CPU = args.rt_cpu
+    COPIES = args.copies
+    MAX_QUEUE_DEPTH = args.max_queue_depth
+    DEDUP_WINDOW = args.dedup_window
+    if args.client_rate is not None:
+        RATE_LIMITER = ClientRateLimiter(args.client_rate, args.client_burst)
+    JOBS = JobTable(args.max_jobs)
     
+    if args.max_duty_cycle is not None:
+        AIRTIME = AirtimeAccountant(window=args.duty_cycle_window,
+                                    max_duty_cycle=args.max_duty_cycle,
+                                    policy=args.airtime_policy)
+
+    OUTLET_STATES = OutletStateTable(args.state_file)
+
+    if args.journal_file is not None:
+        JOURNAL = Journal(args.journal_file)
+
+    if args.calibration_file is not None:
+        CALIBRATION_FILE = args.calibration_file
+        # other pins are calibrated when they are first used
+        calibration = get_calibration(DEFAULT_PIN)
+        print('edge timing calibrated for "{}" pin {}, spin {} us, lead {} '
+              'ns'.format(calibration.model, DEFAULT_PIN, 
+                          calibration.spin_ns // 1000, calibration.lead_ns))
+
+    if args.profiles_file is not None:
+        PROFILES = OutletProfiles(args.profiles_file)
+
+    if args.scenes_file is not None:
+        SCENES = load_scenes(args.scenes_file)
+
+    if args.outlets_file is not None:
+        REGISTRY = OutletRegistry(args.outlets_file, 
+                                  DEFAULT_PIN, 
+                                  compile_outlet_plan)
+
+    SCHEDULER = Scheduler(submit_scheduled, 
+                          DEFAULT_PIN,
+                          latitude=args.latitude,
+                          longitude=args.longitude,
+                          path=args.schedules_file)
+
     if args.verbose:
         DEBUG = True
     
@@ -189,10 +1099,23 @@ if '__main__' == __name__:
     if DEBUG:
         print('server_address: "{}"'.format(server_address), file=sys.stderr)
     
+    if args.command_socket is not None:
+        start_server(UnixCommandServer(args.command_socket, 
+                                       run_socket_command))
+    if args.command_port is not None:
+        start_server(TcpCommandServer((args.network_address, 
+                                       args.command_port), 
+                                      run_socket_command))
+
+    # stopping the service runs the finally clause below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     try:
-        httpd_server = HTTPServer(server_address, Simple_RequestHandler)
+        httpd_server = ThreadingHTTPServer(server_address, 
+                                           Simple_RequestHandler)
         print('running server listening on {}...'.format(server_address))
         httpd_server.serve_forever()
     except Exception as ex:
         print('caught "{}"'.format(ex))
+    finally:
+        OUTLET_STATES.close()
 
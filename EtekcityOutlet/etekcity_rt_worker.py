@@ -0,0 +1,187 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Run the Etekcity timing loop in a separate process which owns the pin.
+
+The worker process is set up to be disturbed as little as possible:
+  it is pinned to one CPU with os.sched_setaffinity()
+  it asks for the SCHED_FIFO real-time scheduler
+  it locks its memory so it is never paged out
+  the garbage collector is frozen and disabled, a collection is run 
+    after each burst while the pin is idle
+Steps which are not permitted (e.g. when not running as root) are 
+skipped and reported in TransmitWorker.status.
+
+Compiled frames are sent to the worker over a pipe and the timing 
+results are sent back when the burst is done.
+
+The worker is started with the "spawn" method so it does not inherit
+the threads or memory of the process which starts it.
+"""
+
+import ctypes
+import gc
+import multiprocessing
+import os
+
+from etekcity_backends import RPiGpioBackend
+from etekcity_controller import TimingEngine
+
+DEFAULT_RT_PRIORITY = 50
+
+# from <sys/mman.h>
+_MCL_CURRENT = 1
+_MCL_FUTURE = 2
+
+
+def _lock_memory():
+    """
+    Lock current and future pages in memory.  Returns True on success.
+    """
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        return 0 == libc.mlockall(_MCL_CURRENT | _MCL_FUTURE)
+    except (OSError, AttributeError):
+        return False
+
+
+def _worker_main(conn, board_pin, cpu, priority, backend_factory, spin_ns,
+                 lead_ns):
+    """
+    Body of the worker process.
+    """
+    status = {'cpu': None, 'sched_fifo': False, 'memory_locked': False}
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+            status['cpu'] = cpu
+        except (OSError, AttributeError):
+            pass
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        status['sched_fifo'] = True
+    except (OSError, AttributeError):
+        pass
+    status['memory_locked'] = _lock_memory()
+
+    try:
+        backend = backend_factory()
+        backend.setup_output(board_pin)
+        engine = TimingEngine(spin_ns=spin_ns, lead_ns=lead_ns)
+    except Exception as e:
+        conn.send(('error', 'while starting worker caught "{}"'.format(e)))
+        return
+    
+    gc.collect()
+    gc.freeze()
+    gc.disable()
+    conn.send(('ready', status))
+
+    while True:
+        try:
+            frames = conn.recv()
+        except EOFError:
+            break
+        if frames is None:
+            break
+        try:
+            missed = engine.play(backend.output, board_pin, frames)
+            conn.send(('done', (missed,
+                                engine.max_lateness_ns,
+                                engine.frame_lateness_ns,
+                                engine.frame_durations_ns)))
+        except Exception as e:
+            conn.send(('error', 'while transmitting caught "{}"'.format(e)))
+        gc.collect()
+
+    backend.cleanup()
+
+
+class TransmitWorker:
+    """
+    Own board_pin in a separate real-time process and send frames on it.
+    
+    cpu is the CPU to which the process is pinned (None to not pin).  
+    backend_factory is called in the worker to create the pin backend.
+    spin_ns and lead_ns are given to the TimingEngine of the worker.
+    
+    After play() the results of the burst are available with the same 
+    names as on a TimingEngine.
+    """
+    def __init__(self, board_pin, cpu=None, priority=DEFAULT_RT_PRIORITY,
+                 backend_factory=RPiGpioBackend, 
+                 spin_ns=TimingEngine.DEFAULT_SPIN_NS, lead_ns=0):
+        self.board_pin = board_pin
+        context = multiprocessing.get_context('spawn')
+        self.__conn, child_conn = context.Pipe()
+        self.__process = context.Process(
+            target=_worker_main,
+            args=(child_conn, board_pin, cpu, priority, backend_factory,
+                  spin_ns, lead_ns),
+            daemon=True)
+        self.__process.start()
+        child_conn.close()
+
+        kind, value = self.__conn.recv()
+        if 'ready' != kind:
+            self.__process.join()
+            raise RuntimeError(value)
+        self.status = value
+
+        self.missed_edges = 0
+        self.max_lateness_ns = 0
+        self.frame_lateness_ns = []
+        self.frame_durations_ns = []
+
+    def play(self, frames):
+        """
+        Have the worker send the compiled frames back-to-back.  Returns
+        the number of edges which missed their deadline.
+        """
+        if self.__process is None:
+            raise RuntimeError('TransmitWorker has been closed')
+        self.__conn.send(list(frames))
+        kind, value = self.__conn.recv()
+        if 'done' != kind:
+            raise RuntimeError(value)
+        (self.missed_edges, 
+         self.max_lateness_ns, 
+         self.frame_lateness_ns, 
+         self.frame_durations_ns) = value
+        return self.missed_edges
+
+    def close(self):
+        """
+        Stop the worker process and release the pin.
+        """
+        if self.__process is not None:
+            try:
+                self.__conn.send(None)
+            except (OSError, EOFError):
+                pass
+            self.__process.join()
+            self.__conn.close()
+            self.__process = None
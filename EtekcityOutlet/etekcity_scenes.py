@@ -0,0 +1,93 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Read named scenes for the Etekcity REST server.
+
+A scene is a list of outlet commands which are sent together.  Scenes are
+kept in a JSON file which holds a dictionary of scene name to a list of
+dictionaries with keys of "address", "unit", "action" and optional "pin".
+For example:
+
+    {
+     "evening": [
+      {"address": 21, "unit": 1, "action": "on"},
+      {"address": 21, "unit": 2, "action": "on"},
+      {"address": 17, "unit": 5, "action": "off", "pin": 16}
+     ],
+     "bedtime": [
+      {"address": 21, "unit": 1, "action": "off"},
+      {"address": 21, "unit": 2, "action": "off"}
+     ]
+    }
+
+Everything in the file is checked when it is read so triggering a scene 
+later needs no checking.
+"""
+
+import collections
+import json
+
+from etekcity_controller import Transmitter
+
+
+def read_scenes(path, default_pin):
+    """
+    Read and check the scenes in the JSON file at path.  
+    
+    Returns an OrderedDict of scene name to an OrderedDict of pin to the 
+    list of checked (address, unit, action) items for that pin.  Raises
+    ValueError describing the first problem found.
+    """
+    with open(path, 'r') as scenes_file:
+        data = json.load(scenes_file, 
+                         object_pairs_hook=collections.OrderedDict)
+    if not isinstance(data, dict):
+        raise ValueError('scenes file {} does not hold a dictionary'.format(
+            path))
+
+    scenes = collections.OrderedDict()
+    for name, commands in data.items():
+        if not isinstance(commands, list):
+            raise ValueError('scene "{}" is not a list'.format(name))
+        items_by_pin = collections.OrderedDict()
+        for index, command in enumerate(commands):
+            try:
+                pin = command.get('pin', default_pin)
+                if pin not in Transmitter.VALID_PINS:
+                    raise ValueError('pin of {} is not in {}'.format(
+                        pin, Transmitter.VALID_PINS))
+                item = Transmitter.check_command(command['address'],
+                                                 command['unit'],
+                                                 command['action'])
+            except KeyError as e:
+                raise ValueError('scene "{}" item {} is missing {}'.format(
+                    name, index, e))
+            except (AttributeError, TypeError, ValueError) as e:
+                raise ValueError('scene "{}" item {} is not valid: {}'.format(
+                    name, index, e))
+            items_by_pin.setdefault(pin, []).append(item)
+        scenes[name] = items_by_pin
+    return scenes
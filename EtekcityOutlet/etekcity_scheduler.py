@@ -0,0 +1,538 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Run timed actions for Etekcity outlets from inside the REST server.
+
+Each schedule sends one action to one outlet according to a rule which 
+is one of:
+  "at"     a local date and time ("2026-10-16T18:30:00") to run once
+  "every"  a number of seconds, at least 10, between runs
+  "time"   a local time of day ("HH:MM") to run each day
+  "sun"    "sunrise" or "sunset" each day, moved by "offset" minutes
+"time" and "sun" rules may have "days", a list of day names ("mon" to
+"sun"), to run only on those days.  "sun" rules need the latitude and 
+longitude of the outlets.
+
+The next run of every schedule is kept in a heap ordered by a 
+time.monotonic() deadline so thousands of schedules cost one wake up per
+batch.  All schedules which are due within the same tick are sent 
+together as one command per pin so they go out as a single burst.
+"""
+
+import datetime
+import heapq
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+
+from etekcity_controller import Transmitter
+from etekcity_json_file import save_json
+
+AT = 'at'
+EVERY = 'every'
+TIME = 'time'
+SUN = 'sun'
+VALID_RULES = (AT, EVERY, TIME, SUN)
+
+SUNRISE = 'sunrise'
+SUNSET = 'sunset'
+
+DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# schedules due within this many seconds of each other are sent together
+DEFAULT_TICK_IN_SECONDS = 0.5
+# shortest "every", so one schedule can not keep the transmitter busy
+MIN_EVERY_IN_SECONDS = 10.0
+# wake at least this often so a change of the wall clock is noticed and
+# every deadline moved to match
+MAX_SLEEP_IN_SECONDS = 60.0
+# sun rules look this many days ahead for a sunrise / sunset
+MAX_SEARCH_DAYS = 366
+# the sun's center is this many degrees below the horizon at sunrise
+SUN_ZENITH_IN_DEGREES = 90.833
+
+AT_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M')
+TIME_FORMAT = '%H:%M'
+
+
+def sun_time(date, latitude, longitude, rising):
+    """
+    Return the UTC datetime of sunrise (rising True) or sunset on date at
+    latitude / longitude (degrees, north and east positive).  Returns 
+    None if the sun does not rise or set that day.
+
+    This is the NOAA / Almanac for Computers calculation which is good to
+    about a minute.
+    """
+    day_of_year = date.timetuple().tm_yday
+    longitude_hour = longitude / 15.0
+    if rising:
+        approx = day_of_year + ((6.0 - longitude_hour) / 24.0)
+    else:
+        approx = day_of_year + ((18.0 - longitude_hour) / 24.0)
+
+    mean_anomaly = (0.9856 * approx) - 3.289
+    true_longitude = (mean_anomaly 
+                      + (1.916 * math.sin(math.radians(mean_anomaly)))
+                      + (0.020 * math.sin(math.radians(2 * mean_anomaly)))
+                      + 282.634) % 360.0
+
+    right_ascension = math.degrees(math.atan(
+        0.91764 * math.tan(math.radians(true_longitude)))) % 360.0
+    # put the right ascension in the same quadrant as the true longitude
+    right_ascension += ((math.floor(true_longitude / 90.0) * 90.0)
+                        - (math.floor(right_ascension / 90.0) * 90.0))
+    right_ascension /= 15.0
+
+    sin_declination = 0.39782 * math.sin(math.radians(true_longitude))
+    cos_declination = math.cos(math.asin(sin_declination))
+    cos_hour_angle = ((math.cos(math.radians(SUN_ZENITH_IN_DEGREES))
+                       - (sin_declination * math.sin(math.radians(latitude))))
+                      / (cos_declination * math.cos(math.radians(latitude))))
+    if cos_hour_angle > 1.0 or cos_hour_angle < -1.0:
+        return None
+
+    hour_angle = math.degrees(math.acos(cos_hour_angle))
+    if rising:
+        hour_angle = 360.0 - hour_angle
+    hour_angle /= 15.0
+
+    local_mean_time = (hour_angle + right_ascension 
+                       - (0.06571 * approx) - 6.622)
+    utc_hours = (local_mean_time - longitude_hour) % 24.0
+    midnight = datetime.datetime(date.year, date.month, date.day, 
+                                 tzinfo=datetime.timezone.utc)
+    result = midnight + datetime.timedelta(hours=utc_hours)
+    # the UTC time may fall on the day before or after the local date
+    offset_days = (result.astimezone().date() - date).days
+    return result - datetime.timedelta(days=offset_days)
+
+
+class Schedule:
+    """
+    One outlet action and the rule for when to send it.  Made from the 
+    dictionary given to Scheduler.add() and checked when it is made.
+    """
+    def __init__(self, data, default_pin, latitude=None, longitude=None):
+        if not isinstance(data, dict):
+            raise ValueError('schedule is not a dictionary')
+        self.id = data.get('id', uuid.uuid4().hex)
+        # the id is the last part of the schedule's URL
+        if not isinstance(self.id, str) or not self.id or '/' in self.id:
+            raise ValueError('"id" must be a non-empty string without "/"')
+        self.pin = data.get('pin', default_pin)
+        if self.pin not in Transmitter.VALID_PINS:
+            raise ValueError('pin of {} is not in {}'.format(
+                self.pin, Transmitter.VALID_PINS))
+        try:
+            self.item = Transmitter.check_command(data['address'], 
+                                                  data['unit'], 
+                                                  data['action'])
+        except KeyError as e:
+            raise ValueError('missing key {}'.format(e))
+
+        rules = [rule for rule in VALID_RULES if rule in data]
+        if 1 != len(rules):
+            raise ValueError('a schedule needs one of {}'.format(VALID_RULES))
+        self.rule = rules[0]
+        self.value = data[self.rule]
+
+        self.days = None
+        if 'days' in data:
+            if self.rule not in (TIME, SUN):
+                raise ValueError('"days" is only used with "{}" and "{}"'
+                                 .format(TIME, SUN))
+            try:
+                self.days = sorted(set(DAY_NAMES.index(day.lower()) 
+                                       for day in data['days']))
+            except (AttributeError, TypeError, ValueError):
+                raise ValueError('days must be a list of {}'.format(
+                    DAY_NAMES))
+            if not self.days:
+                raise ValueError('days must not be empty')
+
+        self.offset = 0.0
+        self.__latitude = latitude
+        self.__longitude = longitude
+        if AT == self.rule:
+            self.__at = self.__parse_at(self.value)
+        elif EVERY == self.rule:
+            if (isinstance(self.value, bool) 
+                    or not isinstance(self.value, (int, float))
+                    or not self.value >= MIN_EVERY_IN_SECONDS):
+                raise ValueError('"every" must be a number of seconds of at'
+                                 ' least {}'.format(MIN_EVERY_IN_SECONDS))
+        elif TIME == self.rule:
+            try:
+                self.__time = datetime.datetime.strptime(
+                    self.value, TIME_FORMAT).time()
+            except (TypeError, ValueError):
+                raise ValueError('"time" must be in the form "HH:MM"')
+        else:
+            if self.value not in (SUNRISE, SUNSET):
+                raise ValueError('"sun" must be "{}" or "{}"'.format(
+                    SUNRISE, SUNSET))
+            if latitude is None or longitude is None:
+                raise ValueError('"sun" rules need the latitude and longitude'
+                                 ' set when the server is started')
+            self.offset = data.get('offset', 0)
+            if (isinstance(self.offset, bool) 
+                    or not isinstance(self.offset, (int, float))):
+                raise ValueError('"offset" must be a number of minutes')
+
+        # local datetime of the next run, None when there are no more
+        self.next_time = None
+        # the same as a time.time() value
+        self.next_epoch = None
+        # set each time the schedule is armed so old heap entries can be
+        # told apart from the current one
+        self.generation = None
+
+    @staticmethod
+    def __parse_at(value):
+        for at_format in AT_FORMATS:
+            try:
+                return datetime.datetime.strptime(value, at_format)
+            except (TypeError, ValueError):
+                pass
+        raise ValueError('"at" must be in the form "YYYY-MM-DDTHH:MM[:SS]"')
+
+    def __day_allowed(self, date):
+        return self.days is None or date.weekday() in self.days
+
+    def compute_next(self, after):
+        """
+        Set and return next_time, the first run later than the local 
+        datetime after, or None if the schedule will not run again.
+        """
+        if EVERY == self.rule:
+            return self.__compute_next_every(after)
+        if AT == self.rule:
+            result = self.__at if self.__at > after else None
+        else:
+            result = None
+            date = after.date()
+            for day in range(MAX_SEARCH_DAYS):
+                if self.__day_allowed(date):
+                    when = self.__time_on(date)
+                    if when is not None and when > after:
+                        result = when
+                        break
+                date += datetime.timedelta(days=1)
+        self.next_time = result
+        self.next_epoch = None
+        if result is not None:
+            self.next_epoch = time.mktime(result.timetuple()) + (
+                result.microsecond / 1e6)
+        return result
+
+    def __compute_next_every(self, after):
+        """
+        compute_next() for an "every" rule.  The runs are kept as 
+        time.time() values so a daylight saving change does not move 
+        them.  Runs missed while the clock was set forward are skipped 
+        rather than all sent at once.
+        """
+        now = time.time()
+        last = self.next_epoch
+        if last is None:
+            result = now + self.value
+        elif after < self.next_time:
+            # the last run has not happened, the clock may have been set
+            # back since it was worked out
+            result = min(last, now + self.value)
+        else:
+            missed = math.floor(max(0.0, now - last) / self.value)
+            result = last + (missed + 1) * self.value
+        self.next_epoch = result
+        self.next_time = datetime.datetime.fromtimestamp(result)
+        return self.next_time
+
+    def __time_on(self, date):
+        if TIME == self.rule:
+            return datetime.datetime.combine(date, self.__time)
+        when = sun_time(date, self.__latitude, self.__longitude, 
+                        SUNRISE == self.value)
+        if when is None:
+            return None
+        when += datetime.timedelta(minutes=self.offset)
+        return when.astimezone().replace(tzinfo=None)
+
+    def to_dict(self):
+        """
+        return the schedule as given to Scheduler.add() with "id" and
+        "next" (ISO 8601 local time) added
+        """
+        address, unit, action = self.item
+        result = {}
+        result['id'] = self.id
+        result['pin'] = self.pin
+        result['address'] = address
+        result['unit'] = unit
+        result['action'] = 'on' if action else 'off'
+        result[self.rule] = self.value
+        if SUN == self.rule:
+            result['offset'] = self.offset
+        if self.days is not None:
+            result['days'] = [DAY_NAMES[day] for day in self.days]
+        result['next'] = (None if self.next_time is None 
+                          else self.next_time.isoformat())
+        return result
+
+
+class Scheduler:
+    """
+    Keep schedules and call submit(pin, items) from a daemon thread with 
+    the (address, unit, action) items for each pin which are due.
+
+    If path is given the schedules are loaded from and saved to that JSON
+    file.  The file is written from the scheduler thread when schedules 
+    are added or removed or a schedule has no more runs, so adding many
+    schedules at once writes it only a few times.
+    """
+    def __init__(self, submit, default_pin, latitude=None, longitude=None,
+                 path=None, tick=DEFAULT_TICK_IN_SECONDS):
+        self.__submit = submit
+        self.__default_pin = default_pin
+        self.__latitude = latitude
+        self.__longitude = longitude
+        self.__path = path
+        self.__tick = tick
+        self.__condition = threading.Condition()
+        # id -> Schedule
+        self.__schedules = {}
+        # (monotonic deadline, generation, id)
+        self.__heap = []
+        # time.time() - time.monotonic() when the deadlines were worked out
+        self.__clock_offset = time.time() - time.monotonic()
+        self.__sequence = 0
+        self.__closed = False
+        # the schedules have changed since they were last saved
+        self.__dirty = False
+        if path is not None and os.path.exists(path):
+            self.__load()
+        self.__thread = threading.Thread(target=self.__run, 
+                                         name='etekcity-scheduler',
+                                         daemon=True)
+        self.__thread.start()
+
+    def __load(self):
+        with open(self.__path, 'r') as schedules_file:
+            entries = json.load(schedules_file)
+        with self.__condition:
+            for data in entries:
+                data.pop('next', None)
+                if not self.__arm(self.__make(data)):
+                    self.__changed()
+
+    def __changed(self):
+        """
+        Have the scheduler thread save the schedules.  Call with the 
+        condition held.
+        """
+        if self.__path is not None:
+            self.__dirty = True
+            self.__condition.notify()
+
+    def __entries(self):
+        """
+        return the schedules as saved in the file.  Call with the 
+        condition held.
+        """
+        entries = []
+        for schedule in self.__schedules.values():
+            entry = schedule.to_dict()
+            del entry['next']
+            entries.append(entry)
+        return entries
+
+    def __save(self, entries):
+        try:
+            save_json(self.__path, entries)
+        except (OSError, TypeError, ValueError) as e:
+            print('saving schedules in "{}" failed: {}'.format(
+                self.__path, e), file=sys.stderr)
+
+    def __make(self, data):
+        return Schedule(data, self.__default_pin, 
+                        self.__latitude, self.__longitude)
+
+    def __arm(self, schedule, after=None):
+        """
+        Work out the next run of schedule and put it in the heap.  A 
+        schedule with no more runs is dropped and False returned.  Call 
+        with the condition held.
+        """
+        if after is None:
+            after = datetime.datetime.now()
+        if schedule.compute_next(after) is None:
+            self.__schedules.pop(schedule.id, None)
+            return False
+        self.__schedules[schedule.id] = schedule
+        self.__sequence += 1
+        schedule.generation = self.__sequence
+        heapq.heappush(self.__heap, (self.__deadline(schedule.next_epoch), 
+                                     schedule.generation, 
+                                     schedule.id))
+        self.__condition.notify()
+        return True
+
+    @staticmethod
+    def __deadline(next_epoch):
+        """
+        return the time.monotonic() deadline of the time.time() value 
+        next_epoch
+        """
+        return time.monotonic() + (next_epoch - time.time())
+
+    def __check_clock(self):
+        """
+        Work out every deadline again if the wall clock has been set 
+        since they were, e.g. by NTP after a boot without a real time 
+        clock.  Call with the condition held.
+        """
+        offset = time.time() - time.monotonic()
+        if abs(offset - self.__clock_offset) <= self.__tick:
+            return
+        self.__clock_offset = offset
+        self.__heap = [(self.__deadline(schedule.next_epoch), 
+                        schedule.generation, 
+                        schedule.id)
+                       for schedule in self.__schedules.values()]
+        heapq.heapify(self.__heap)
+
+    def add(self, data):
+        """
+        Check and add the schedule in the dictionary data.  Returns the 
+        Schedule.  Raises ValueError if data is not valid.
+        """
+        schedule = self.__make(data)
+        with self.__condition:
+            if schedule.id in self.__schedules:
+                raise ValueError('schedule {} already exists'.format(
+                    schedule.id))
+            self.__arm(schedule)
+            self.__changed()
+        return schedule
+
+    def remove(self, schedule_id):
+        """
+        Remove a schedule.  Returns False if there is no such schedule.
+        Its heap entry is left to be skipped when it comes due.
+        """
+        with self.__condition:
+            if self.__schedules.pop(schedule_id, None) is None:
+                return False
+            self.__changed()
+            return True
+
+    def get(self, schedule_id):
+        return self.__schedules.get(schedule_id)
+
+    def to_list(self):
+        """
+        return all schedules as dictionaries in the order they will run
+        """
+        with self.__condition:
+            schedules = list(self.__schedules.values())
+        schedules.sort(key=lambda schedule: schedule.next_epoch)
+        return [schedule.to_dict() for schedule in schedules]
+
+    def close(self):
+        """
+        Stop the scheduler thread once it has saved any changes.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__thread.join()
+
+    def __due(self):
+        """
+        Pop every current heap entry due now or within the next tick.  Returns
+        a dictionary of pin -> {(address, unit): action}.  Call with the
+        condition held.
+        """
+        limit = time.monotonic() + self.__tick
+        now = datetime.datetime.now()
+        due = {}
+        fired = []
+        while self.__heap and self.__heap[0][0] <= limit:
+            deadline, generation, schedule_id = heapq.heappop(
+                self.__heap)
+            schedule = self.__schedules.get(schedule_id)
+            if schedule is None or generation != schedule.generation:
+                continue
+            if schedule.next_epoch - time.time() > self.__tick:
+                # the wall clock went back, wait for the new deadline
+                fired.append((schedule, now))
+                continue
+            address, unit, action = schedule.item
+            # a later schedule for the same outlet in the batch wins
+            due.setdefault(schedule.pin, {})[(address, unit)] = action
+            # runs missed while the clock jumped forward are skipped
+            fired.append((schedule, max(schedule.next_time, now)))
+        for schedule, after in fired:
+            if not self.__arm(schedule, after):
+                # a one shot schedule is done
+                self.__changed()
+        return due
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__closed and not self.__dirty:
+                    if self.__heap:
+                        timeout = self.__heap[0][0] - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        timeout = min(timeout, MAX_SLEEP_IN_SECONDS)
+                    else:
+                        timeout = MAX_SLEEP_IN_SECONDS
+                    self.__condition.wait(timeout)
+                    self.__check_clock()
+                closed = self.__closed
+                due = {} if closed else self.__due()
+                entries = None
+                if self.__dirty:
+                    self.__dirty = False
+                    entries = self.__entries()
+            if entries is not None:
+                self.__save(entries)
+            if closed:
+                return
+            for pin, actions in due.items():
+                items = [(address, unit, action) 
+                         for (address, unit), action in actions.items()]
+                try:
+                    self.__submit(pin, items)
+                except Exception as e:
+                    print('scheduled command for pin {} failed: {}'.format(
+                        pin, e), file=sys.stderr)
@@ -28,12 +28,34 @@ Exercise a set of relays made by Etekcity using a 433 MHz transmitter connected
 to a Raspberry Pi pin in order to determine the device addr value.
 
 This assumes the 433 MHz transmitter is attached to the Raspberry Pi on pin 18.  
+
+By default every address from start_addr to end_addr is tried in turn.
+
+With --discover the address is found by group testing instead.  Half of
+the remaining addresses are switched on together and the operator (or
+the command given with --feedback_command) says if the watched outlet 
+came on.  The half which holds the outlet is kept and the test repeats
+so about log2(256) = 8 rounds find the address.  The units at that 
+address are then split the same way to find the unit of the outlet.
+
+The rounds together still switch every address about once, as the 
+linear scan does, so what saves airtime is that each command of a round
+is sent with only --group_copies copies (1 by default) rather than 
+RETRY_COUNT.  The outlet found is then checked with the full number of
+copies; if the check fails try again with more --group_copies.
+
+Progress is written to the --checkpoint file after each round so an
+interrupted discovery can be continued with --resume.
 """
 
+import argparse
+import json
+import subprocess
 import sys
 import time
 
 from etekcity_controller import Transmitter
+from etekcity_json_file import save_json
 
 # change  if the transmitter connected to a different board pin
 TRANSMIT_PIN = 18
@@ -48,90 +70,293 @@ FIRST_VALID_ADDR = Transmitter.FIRST_VALID_ADDRESS
 # last valid address is also default end addr
 LAST_VALID_ADDR = Transmitter.LAST_VALID_ADDRESS
 
-if len(sys.argv) > 1:
-    if sys.argv[1] == '-h' or sys.argv[1] == '-?' or sys.argv[1] == '--help':
-        print('usage: etekcity_try_addrs.py [start_addr [end_addr]]', 
-              file=sys.stderr)
-        print('    start and end must be between {} and {}', 
-              FIRST_VALID_ADDR,
-              LAST_VALID_ADDR,
-              file=sys.stderr
-              )
-        print('    start must be <= end', file=sys.stderr)
-        print('    start and end default to {} and {}',
-              FIRST_VALID_ADDR,
-              LAST_VALID_ADDR,
-              file=sys.stderr
-              )
-        print('    setting start addr slows down tests', file=sys.stderr)
-        exit(1)
+ALL_UNITS = [1, 2, 3, 4, 5]
 
-start = FIRST_VALID_ADDR
-end = LAST_VALID_ADDR
-delay = DELAY_TIME_IN_SECONDS
+DEFAULT_CHECKPOINT_FILE = 'etekcity_discovery.json'
+# copies of each command sent in a discovery round
+DEFAULT_GROUP_COPIES = 1
+# time for an outlet to react before an automatic check is made
+DEFAULT_SETTLE_TIME_IN_SECONDS = 1.0
 
-if len(sys.argv) > 1:
-    try:
-        start = int(sys.argv[1])
-        delay = LONG_DELAY_TIME_IN_SECONDS
-    except Exception as e:
-        print('start_addr parameter of "{}" is not between {} to {}',
-              sys.argv[1], 
-              FIRST_VALID_ADDR,
-              LAST_VALID_ADDR,
+
+def is_special(addr, unit):
+    """
+    return True for the address and unit which switch all outlets
+    """
+    return Transmitter.ALL_ADDRESS == addr and Transmitter.ALL_UNIT == unit
+
+
+def linear_scan(ec, start, end, delay):
+    """
+    Turn on then off every unit of each address from start to end.
+    """
+    print('looking for addrs between {} and {}'.format(start, end))
+    
+    for addr in range(start, end+1):
+        print('addr {}'.format(addr))
+        for unit in ALL_UNITS:
+            if is_special(addr, unit):
+                print('skipping address {} and unit {} as they are special'.format(
+                    Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT))
+            else:
+                ec.transmit_on(addr, unit)
+        time.sleep(delay)
+        for unit in ALL_UNITS:
+            if is_special(addr, unit):
+                print('skipping address {} and unit {} as they are special'.format(
+                    Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT))
+            else:
+                ec.transmit_off(addr, unit)
+
+
+class OperatorFeedback:
+    """
+    Ask the person watching the outlet if it came on.
+    """
+    def outlet_on(self, description):
+        while True:
+            answer = input('did the outlet turn on for {}? [y/n] '.format(
+                description))
+            answer = answer.strip().lower()
+            if answer in ['y', 'yes']:
+                return True
+            if answer in ['n', 'no']:
+                return False
+
+
+class CommandFeedback:
+    """
+    Run a command to find if the outlet came on.  An exit status of 0 
+    means the outlet is on.
+    """
+    def __init__(self, command, settle_time=DEFAULT_SETTLE_TIME_IN_SECONDS):
+        self.__command = command
+        self.__settle_time = settle_time
+
+    def outlet_on(self, description):
+        time.sleep(self.__settle_time)
+        result = (0 == subprocess.call(self.__command, shell=True))
+        print('outlet {} for {}'.format('on' if result else 'off', 
+                                        description))
+        return result
+
+
+class Discovery:
+    """
+    Find the address and unit of one outlet by group testing.
+    
+    The search state is a dictionary so it can be written to and read 
+    from a checkpoint file:
+        "low", "high"   the addresses which may still hold the outlet
+        "units"         units which may still be the outlet's unit
+        "address"       the address once it is known
+        "unit"          the unit once it is known
+    
+    Each round sends group_copies copies of its commands, the final check
+    the number the Transmitter ec was made with.
+    """
+    def __init__(self, ec, feedback, state, checkpoint_path=None,
+                 group_copies=DEFAULT_GROUP_COPIES):
+        self.__ec = ec
+        self.__feedback = feedback
+        self.state = state
+        self.__checkpoint_path = checkpoint_path
+        self.__group_copies = group_copies
+
+    @staticmethod
+    def new_state(start, end, units):
+        return {'low': start, 
+                'high': end, 
+                'units': list(units), 
+                'address': None, 
+                'unit': None}
+
+    def __save(self):
+        if self.__checkpoint_path is None:
+            return
+        save_json(self.__checkpoint_path, self.state)
+
+    def __test(self, commands, description, copies=None):
+        """
+        Switch on every (addr, unit) in commands, sending copies of each 
+        (default those of the Transmitter), ask if the outlet came on then
+        switch them all off again.  The off commands are always sent so an
+        outlet that came on without being seen (or a test that was 
+        interrupted) does not stay on.
+        """
+        commands = [(addr, unit) for addr, unit in commands 
+                    if not is_special(addr, unit)]
+        if not commands:
+            return False
+        self.__ec.transmit_many([(addr, unit, True) for addr, unit in commands],
+                                copies=copies)
+        try:
+            return self.__feedback.outlet_on(description)
+        finally:
+            self.__ec.transmit_many([(addr, unit, False) 
+                                     for addr, unit in commands],
+                                    copies=copies)
+
+    def find_address(self):
+        """
+        Narrow the address range until one address is left.
+        """
+        while self.state['low'] < self.state['high']:
+            low = self.state['low']
+            middle = (low + self.state['high']) // 2
+            description = 'addresses {} to {}'.format(low, middle)
+            print('trying {}'.format(description))
+            if self.__test([(addr, unit) 
+                            for addr in range(low, middle + 1)
+                            for unit in self.state['units']],
+                           description, self.__group_copies):
+                self.state['high'] = middle
+            else:
+                self.state['low'] = middle + 1
+            self.__save()
+        self.state['address'] = self.state['low']
+        self.__save()
+        return self.state['address']
+
+    def find_unit(self):
+        """
+        Narrow the possible units at the found address to one.
+        """
+        address = self.state['address']
+        while len(self.state['units']) > 1:
+            units = self.state['units']
+            half = units[:len(units) // 2]
+            description = 'address {} units {}'.format(address, half)
+            print('trying {}'.format(description))
+            if self.__test([(address, unit) for unit in half], description,
+                           self.__group_copies):
+                self.state['units'] = half
+            else:
+                self.state['units'] = units[len(units) // 2:]
+            self.__save()
+        self.state['unit'] = self.state['units'][0]
+        self.__save()
+        return self.state['unit']
+
+    def verify(self):
+        """
+        Switch on just the found outlet and check that it responds.
+        """
+        description = 'address {} unit {}'.format(self.state['address'],
+                                                  self.state['unit'])
+        print('checking {}'.format(description))
+        return self.__test([(self.state['address'], self.state['unit'])],
+                           description)
+
+    def run(self):
+        """
+        Run or continue the discovery.  Returns (address, unit) or None if
+        the final check failed.
+        """
+        if self.state['address'] is None:
+            self.find_address()
+        if self.state['unit'] is None:
+            self.find_unit()
+        if self.verify():
+            return (self.state['address'], self.state['unit'])
+        return None
+
+
+def check_addr(name, value):
+    if value < FIRST_VALID_ADDR or value > LAST_VALID_ADDR:
+        print('{} of {} must be between {} and {} inclusive'.format(
+            name,
+            value,
+            FIRST_VALID_ADDR,
+            LAST_VALID_ADDR),
               file=sys.stderr
               )
         exit(2)
-if len(sys.argv) > 2:
-    try:
-        end = int(sys.argv[2])
-    except Exception as e:
-        print('end_addr parameter of "{}" is not between {} to {}',
-              sys.argv[2],
-              FIRST_VALID_ADDR,
-              LAST_VALID_ADDR,
-              file=sys.stderr
-              )
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(
+        description='find the address of Etekcity outlets')
+    parser.add_argument('start_addr',
+                        nargs='?',
+                        default=None,
+                        help='first address to try, setting this slows '
+                        'down the linear tests',
+                        type=int
+                        )
+    parser.add_argument('end_addr',
+                        nargs='?',
+                        default=LAST_VALID_ADDR,
+                        help='last address to try',
+                        type=int
+                        )
+    parser.add_argument('--discover',
+                        help='find the address and unit by group testing',
+                        action='store_true'
+                        )
+    parser.add_argument('--unit',
+                        default=None,
+                        help='only try this unit when discovering',
+                        type=int,
+                        choices=ALL_UNITS
+                        )
+    parser.add_argument('--feedback_command',
+                        default=None,
+                        help='command which exits with 0 when the outlet is '
+                        'on, default is to ask on the console'
+                        )
+    parser.add_argument('--checkpoint',
+                        default=DEFAULT_CHECKPOINT_FILE,
+                        help='file where discovery progress is kept'
+                        )
+    parser.add_argument('--resume',
+                        help='continue the discovery in the checkpoint file',
+                        action='store_true'
+                        )
+    parser.add_argument('--group_copies',
+                        default=DEFAULT_GROUP_COPIES,
+                        help='copies of each command sent in a discovery '
+                        'round, the final check sends {}'.format(RETRY_COUNT),
+                        type=int
+                        )
+    args = parser.parse_args()
+
+    start = FIRST_VALID_ADDR
+    end = args.end_addr
+    delay = DELAY_TIME_IN_SECONDS
+    if args.start_addr is not None:
+        start = args.start_addr
+        delay = LONG_DELAY_TIME_IN_SECONDS
+    check_addr('start_addr', start)
+    check_addr('end_addr', end)
+    if start > end:
+        print('start_addr must be <= end_addr', file=sys.stderr)
         exit(2)
 
-if start < FIRST_VALID_ADDR or start > LAST_VALID_ADDR:
-    print('start_addr of {} must be between {} and {} inclusive', 
-          start,
-          FIRST_VALID_ADDR,
-          LAST_VALID_ADDR,
-          file=sys.stderr
-          )
-    exit(2)
-
-if end < FIRST_VALID_ADDR or end > LAST_VALID_ADDR:
-    print('end_addr of {} must be between {} and {} inclusive', 
-          end,
-          FIRST_VALID_ADDR,
-          LAST_VALID_ADDR,
-          file=sys.stderr
-          )
-    exit(2)
-
-if start > end:
-    print('start_addr must be <= end_addr', file=sys.stderr)
-    exit(2)
-
-
-print('looking for addrs between {} and {}'.format(start, end))
-
-ec = Transmitter(TRANSMIT_PIN, retries=RETRY_COUNT)
-for addr in range(start, end+1):
-    print('addr {}'.format(addr))
-    for unit in [1, 2, 3, 4, 5]:
-        if Transmitter.ALL_ADDRESS == addr and Transmitter.ALL_UNIT == unit:
-            print('skipping address {} and unit {} as they are special'.format(
-                Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT))
-        else:
-            ec.transmit_on(addr, unit)
-    time.sleep(DELAY_TIME_IN_SECONDS)
-    for unit in [1, 2, 3, 4, 5]:
-        if Transmitter.ALL_ADDRESS == addr and Transmitter.ALL_UNIT == unit:
-            print('skipping address {} and unit {} as they are special'.format(
-                Transmitter.ALL_ADDRESS, Transmitter.ALL_UNIT))
-        else:
-            ec.transmit_off(addr, unit)
+    ec = Transmitter(TRANSMIT_PIN, retries=RETRY_COUNT)
+
+    if not args.discover:
+        linear_scan(ec, start, end, delay)
+        exit(0)
+
+    if args.feedback_command is not None:
+        feedback = CommandFeedback(args.feedback_command)
+    else:
+        feedback = OperatorFeedback()
+        
+    if args.resume:
+        with open(args.checkpoint, 'r') as checkpoint_file:
+            state = json.load(checkpoint_file)
+        print('continuing discovery from {}'.format(args.checkpoint))
+    else:
+        units = ALL_UNITS if args.unit is None else [args.unit]
+        state = Discovery.new_state(start, end, units)
+        print('make sure all outlets are off and watch one of them')
+    
+    found = Discovery(ec, feedback, state, args.checkpoint, 
+                      args.group_copies).run()
+    if found is None:
+        print('the outlet did not respond to the final check, '
+              'please try again', file=sys.stderr)
+        exit(1)
+    print('found address {} unit {}'.format(*found))
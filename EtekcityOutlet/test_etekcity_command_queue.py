@@ -0,0 +1,126 @@
+#!env python3
+"""
+MIT License
+
+Copyright (c) 2026 Paul G Crumley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+@author: pgcrumley@gmail.com
+
+Tests of CommandQueue with a transmitter which only keeps what it sent,
+so no Raspberry Pi is needed:
+  python3 -m unittest test_etekcity_command_queue
+"""
+
+import threading
+import unittest
+
+from etekcity_command_queue import DONE, Command, CommandQueue
+from etekcity_outlet_state import OutletStateTable
+
+PIN = 18
+WAIT_IN_SECONDS = 5.0
+
+
+class FakePlan:
+    def __init__(self, items, family):
+        self.items = list(items)
+        self.family = family
+        self.frames = [None]
+
+
+class FakeTransmitter:
+    """
+    Sends each plan as one frame once gate is set and keeps the items 
+    sent, in order, in sent.
+    """
+    _board_pin = PIN
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.sent = []
+
+    def compile_plan(self, items, family):
+        return FakePlan(items, family)
+
+    def transmit_plan_part(self, plan, first_frame, should_yield=None):
+        self.gate.wait(WAIT_IN_SECONDS)
+        self.sent.extend(plan.items)
+        return 0, len(plan.frames)
+
+    def close(self):
+        pass
+
+
+class SkipTest(unittest.TestCase):
+    def setUp(self):
+        self.transmitter = FakeTransmitter()
+        self.states = OutletStateTable()
+        self.queue = CommandQueue(self.transmitter, 
+                                  done_callback=self.states.record_command,
+                                  dedup_window=0)
+
+    def tearDown(self):
+        self.transmitter.gate.set()
+        self.queue.close()
+        self.states.close()
+
+    def submit(self, address, unit, action):
+        return self.queue.submit(Command(PIN, [(address, unit, action)]),
+                                 skip=self.states.matches)
+
+    def test_skips_action_already_sent(self):
+        self.states.record(PIN, [(21, 1, True)])
+        command = self.submit(21, 1, True)
+        self.assertTrue(command.wait(WAIT_IN_SECONDS))
+        self.assertEqual([(21, 1, True)], command.skipped)
+        self.assertEqual([], self.transmitter.sent)
+
+    def test_flip_flop_ends_in_newest_action(self):
+        # the outlet is on, then "off" and "on" are sent quickly while 
+        # the transmitter is busy with another outlet
+        self.states.record(PIN, [(21, 1, True)])
+        busy = self.submit(21, 2, True)
+        off = self.submit(21, 1, False)
+        on = self.submit(21, 1, True)
+        self.assertEqual([], on.skipped)
+        self.transmitter.gate.set()
+        for command in (busy, off, on):
+            self.assertTrue(command.wait(WAIT_IN_SECONDS))
+            self.assertEqual(DONE, command.state)
+        self.assertTrue(self.states.get(PIN, 21, 1))
+        self.assertEqual((21, 1, True), [item for item in self.transmitter.sent
+                                         if (21, 1) == item[:2]][-1])
+
+    def test_does_not_skip_while_outlet_is_being_sent(self):
+        self.states.record(PIN, [(21, 1, True)])
+        off = self.submit(21, 1, False)
+        # wait until off has been taken by the worker thread
+        while off.started is None:
+            off.wait(0.01)
+        on = self.submit(21, 1, True)
+        self.assertEqual([], on.skipped)
+        self.transmitter.gate.set()
+        self.assertTrue(on.wait(WAIT_IN_SECONDS))
+        self.assertTrue(self.states.get(PIN, 21, 1))
+
+
+if '__main__' == __name__:
+    unittest.main()